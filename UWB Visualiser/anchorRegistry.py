@@ -0,0 +1,109 @@
+import math
+import numpy as np
+from dataclasses import dataclass
+from utils.multilateration import geometry_dop
+
+@dataclass(frozen=True)
+class AnchorLocation:
+    AnchorID: str
+    X: float
+    Y: float
+    Z: float
+
+class AnchorRegistry():
+    # Anchors seen in the samples, one entry per anchor ID and position. Every sample repeats the same few
+    #   anchors, so updating is a dictionary lookup per anchor and the version is only incremented when the
+    #   set changes, which is when the anchor artists, the anchor list and the coverage grid are rebuilt.
+    RESOLUTION = 0.25   # Coverage cell size (m)
+    RANGE = 30.0        # Anchors further than this (m) from a cell don't cover it
+
+    def __init__(self, resolution=RESOLUTION, maxRange=RANGE):
+        self.resolution = resolution
+        self.maxRange = maxRange
+        self.version = 0
+        self.clear()
+
+    def clear(self):
+        self.anchors = {}       # (AnchorID, X, Y, Z) -> AnchorLocation
+        self.locationList = []  # Sorted by ID
+        self.coverageGrid = None
+        self.version += 1
+
+    def update(self, anchorPositions):
+        # Add the anchors of a sample (AnchorPosition or AnchorLocation), True if the set changed
+        changed = False
+        for a in anchorPositions:
+            key = (a.AnchorID, a.X, a.Y, a.Z)
+            if key not in self.anchors:
+                self.anchors[key] = AnchorLocation(*key)
+                changed = True
+        if changed:
+            self.locationList = sorted(self.anchors.values(), key=lambda a: (a.AnchorID, a.X, a.Y, a.Z))
+            self.version += 1
+        return changed
+
+    def positions(self):
+        # (n, 3) positions of the anchors in list order
+        return np.array([(a.X, a.Y, a.Z) for a in self.locationList], dtype=np.float64).reshape(-1, 3)
+
+    def coverage(self, extent):
+        # CoverageGrid of the anchors over the extent, computed once per change of the anchors or extent.
+        #   None without anchors.
+        if not self.anchors:
+            return None
+        grid = self.coverageGrid
+        if grid is None or grid.version != self.version or grid.area != tuple(extent) or grid.resolution != self.resolution:
+            self.coverageGrid = CoverageGrid(self.positions(), extent, self.resolution, self.maxRange, self.version)
+        return self.coverageGrid
+
+    def __len__(self):
+        return len(self.locationList)
+
+    def __iter__(self):
+        return iter(self.locationList)
+
+class CoverageGrid():
+    # Horizontal DOP of the anchor geometry and the number of anchors in range at the centre of every cell
+    #   of a grid over an extent (meters), row 0 at the bottom. Cells with fewer than MIN_ANCHORS in range
+    #   can't be positioned and have a NaN DOP.
+    MIN_ANCHORS = 3
+    POOR_DOP = 3.0  # Positions with a larger DOP are flagged as poorly covered
+
+    def __init__(self, anchors, extent, resolution, maxRange, version=0):
+        left, right, bottom, top = extent
+        self.area = tuple(extent) # Extent requested, the grid extent is rounded up to whole cells
+        self.resolution = resolution
+        self.version = version # Of the AnchorRegistry the grid was computed from
+        self.nx = max(1, math.ceil((right - left) / resolution))
+        self.ny = max(1, math.ceil((top - bottom) / resolution))
+        self.extent = (left, left + (self.nx * resolution), bottom, bottom + (self.ny * resolution))
+
+        # Every cell against every anchor at once
+        xs = left + ((np.arange(self.nx) + 0.5) * resolution)
+        ys = bottom + ((np.arange(self.ny) + 0.5) * resolution)
+        cells = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+        delta = cells[:, None, :] - np.asarray(anchors, dtype=np.float64).reshape(-1, 3)[None, :, :2]
+        distance = np.linalg.norm(delta, axis=2)
+        used = distance <= maxRange
+        count = used.sum(axis=1)
+        dop = geometry_dop(delta, distance, used)
+        dop[count < self.MIN_ANCHORS] = np.nan
+        self.count = count.reshape(self.ny, self.nx)
+        self.dop = dop.reshape(self.ny, self.nx)
+
+    def lookup(self, positions):
+        # (dop, inside) of the cells of the (n, 2) positions, the DOP is NaN outside the grid
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        with np.errstate(invalid="ignore"):
+            ix = np.floor((positions[:, 0] - self.extent[0]) / self.resolution)
+            iy = np.floor((positions[:, 1] - self.extent[2]) / self.resolution)
+        inside = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        dop = np.full(len(positions), np.nan)
+        dop[inside] = self.dop[iy[inside].astype(np.int64), ix[inside].astype(np.int64)]
+        return dop, inside
+
+    def poor(self, positions):
+        # True for the positions on the grid that aren't covered or have a DOP above POOR_DOP
+        dop, inside = self.lookup(positions)
+        with np.errstate(invalid="ignore"):
+            return inside & ~(dop <= self.POOR_DOP)
@@ -0,0 +1,260 @@
+import os, sys, json, time, socket, argparse, platform, tempfile, threading, subprocess
+from datetime import datetime
+
+# Render without a display unless a platform has been chosen explicitly
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import matplotlib
+from PyQt6.QtCore import PYQT_VERSION_STR
+from utils.tagDataUtils import TagDataUtils
+from utils.tagSimulator import TagSimulator
+from utils.logFiles import open_logWriter
+from sampleQueue import SampleQueue
+from csvReader import CsvReader
+from binReader import BinReader
+import parserBenchmark
+import renderBenchmark
+
+# Runs every benchmark with fixed inputs (the sample logs and seeded simulated tags) and saves the results
+#   as JSON, so runs on the same machine can be compared with --compare to catch regressions.
+SECTIONS = ["parse", "replay", "render", "latency"]
+
+class Results():
+    # Metrics by name, with the unit and whether higher or lower is better
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="higher"):
+        self.metrics[name] = {"value": round(float(value), 4), "unit": unit, "better": better}
+        print(f"  {name:<44} {value:14,.2f} {unit}")
+
+    def add_times(self, name, times, unit="ms"):
+        # Median and tail of a list of durations in seconds
+        times = np.asarray(times) * 1000
+        self.add(f"{name}.median", np.median(times), unit, "lower")
+        self.add(f"{name}.p95", np.percentile(times, 95), unit, "lower")
+        self.add(f"{name}.max", np.max(times), unit, "lower")
+
+def best_rate(function, items, repeat):
+    # Items per second of the fastest of repeat runs
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(items)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+def bench_parse(results: Results, args):
+    lines = parserBenchmark.load_lines() * args.copies
+    serialRows = [f"0.123,{line.decode().strip()}".split(',') for line in lines]
+    csvRows = [TagDataUtils.tagData_ToCSV(None, TagDataUtils.serial_toTagData(None, row)).split(',') for row in serialRows]
+    tagDataList = [TagDataUtils.csv_toTagData(None, row) for row in csvRows]
+    print(f"parse: {len(lines)} lines from the sample logs (best of {args.repeat})")
+
+    results.add("parse.serial_toTagData", best_rate(lambda rows: [TagDataUtils.serial_toTagData(None, r) for r in rows], serialRows, args.repeat), "lines/s")
+    results.add("parse.csv_toTagData", best_rate(lambda rows: [TagDataUtils.csv_toTagData(None, r) for r in rows], csvRows, args.repeat), "lines/s")
+    results.add("parse.tagData_ToCSV", best_rate(lambda tds: [TagDataUtils.tagData_ToCSV(None, td) for td in tds], tagDataList, args.repeat), "lines/s")
+    results.add("parse.serial_path", best_rate(parserBenchmark.current_path, lines, args.repeat), "lines/s")
+    results.add("parse.DwmParser.parse", best_rate(parserBenchmark.parser_path, lines, args.repeat), "lines/s")
+    if hasattr(os, "openpty"):
+        serialLines = lines[:200 if args.quick else 2000]
+        results.add("parse.serial_read.readline", parserBenchmark.read_serial(parserBenchmark.readline_reader, serialLines), "lines/s")
+        results.add("parse.serial_read.SerialMultiplexer", parserBenchmark.read_serial(parserBenchmark.multiplexer_reader, serialLines), "lines/s")
+
+def bench_replay(results: Results, args):
+    # Replay as fast as possible into a sample queue, the reader is run on this thread
+    rows = args.replay_rows
+    print(f"replay: {rows} simulated rows (best of {args.repeat})")
+    columns = TagSimulator(1, seed=1).sample(np.arange(rows) / 10.0)[0]
+    with tempfile.TemporaryDirectory() as directory:
+        for name, reader in [("CsvReader", CsvReader), ("BinReader", BinReader)]:
+            path = os.path.join(directory, f"benchmark-1.{'bin' if reader is BinReader else 'csv'}")
+            with open_logWriter(path) as writer:
+                writer.write_columns(columns)
+
+            def replay(_):
+                queue = SampleQueue(rows + 1)
+                reader(1, path, 0, queue).run()
+                if len(queue.samples) != len(columns):
+                    raise RuntimeError(f"{name} replayed {len(queue.samples)} of {len(columns)} rows")
+            results.add(f"replay.{name}", best_rate(replay, columns.TimeStamp, args.repeat), "rows/s")
+
+def bench_render(results: Results, args, window, app):
+    print(f"render: redraw_plot frame times over {args.frames} frames")
+    for mode in ["legacy", "blit", "scene"]:
+        for tags, anchors in args.render_sizes:
+            if mode == "legacy" and tags > 20:
+                continue # Seconds per frame, not worth measuring
+            frameTimes = renderBenchmark.run(window, app, mode, tags, anchors, args.frames)
+            results.add_times(f"render.{mode}.tags{tags}.anchors{anchors}", frameTimes[1:]) # The first frame draws the background
+    window.set_render_mode("blit")
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def feed(port, simulator: TagSimulator, rate, seconds, stop):
+    # Send CSV rows of the simulated tags over TCP in real time, each stamped with the time.monotonic() it was sent
+    socks = [socket.create_connection(("127.0.0.1", port)) for _ in range(simulator.tags)]
+    for tag, sock in enumerate(socks):
+        sock.sendall(f"TAG,BENCH{tag + 1}\n".encode())
+    tagLines = [[line.split(',', 1)[1] for line in TagDataUtils.columns_toCsvLines(None, columns)] for columns in simulator.sample(np.arange(int(seconds * rate)) / rate)]
+    start = time.monotonic()
+    sent = 0
+    while not stop.is_set() and sent < int(seconds * rate):
+        due = min(int((time.monotonic() - start) * rate), int(seconds * rate))
+        if due > sent:
+            for sock, lines in zip(socks, tagLines):
+                now = time.monotonic()
+                sock.sendall("".join(f"{now!r},{line}\n" for line in lines[sent:due] if line).encode())
+            sent = due
+        time.sleep(min(1.0 / rate, 0.005))
+    for sock in socks:
+        sock.close()
+
+def bench_latency(results: Results, args, window, app):
+    # Time from a line arriving on a socket to the frame that shows it being painted, through the network
+    #   receiver, the sample queue, the redraw scheduler, the Kalman filter and redraw_plot
+    from networkReceiver import NetworkReceiver
+    print(f"latency: line sent to frame painted, {args.latency_seconds:g}s per load")
+    for tags, rate in args.latency_loads:
+        window.reset_data()
+        latencies = []
+        drained = []
+        frames = [0]
+        drain = window.SAMPLE_QUEUE.drain
+        redraw = window.redraw_plot
+
+        def drain_samples():
+            samples = drain()
+            drained.extend(samples)
+            return samples
+
+        def redraw_plot():
+            redraw()
+            window.canvas.repaint() # Paint now rather than on the next pass of the event loop
+            now = time.monotonic()
+            latencies.extend(now - float(td.TimeStamp) for _, td in drained)
+            drained.clear()
+            frames[0] += 1
+
+        window.SAMPLE_QUEUE.drain = drain_samples
+        window.redraw_plot = redraw_plot
+        port = free_port()
+        receiver = NetworkReceiver("127.0.0.1", port, window.SAMPLE_QUEUE)
+        receiver.samples_ready.connect(window.REDRAW_SCHEDULER.mark_dirty)
+        receiver.start()
+        window.start_timer()
+        time.sleep(0.2)
+
+        stop = threading.Event()
+        feeder = threading.Thread(target=feed, args=(port, TagSimulator(tags, seed=1), rate, args.latency_seconds, stop))
+        start = time.monotonic()
+        feeder.start()
+        while feeder.is_alive() or (time.monotonic() - start < args.latency_seconds + 0.5 and window.SAMPLE_QUEUE.samples):
+            app.processEvents()
+            time.sleep(0.001)
+        elapsed = time.monotonic() - start
+        app.processEvents()
+
+        stop.set()
+        feeder.join()
+        receiver.stop()
+        receiver.wait()
+        window.stop_timer()
+        del window.SAMPLE_QUEUE.drain
+        del window.redraw_plot
+
+        name = f"latency.tags{tags}.rate{rate:g}"
+        results.add(f"{name}.delivered", len(latencies) / elapsed, "samples/s")
+        results.add(f"{name}.fps", frames[0] / elapsed, "frames/s")
+        if latencies:
+            results.add_times(name, latencies)
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"date": datetime.now().isoformat(timespec="seconds"), "commit": commit, "platform": platform.platform(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "numpy": np.__version__, "matplotlib": matplotlib.__version__, "pyqt": PYQT_VERSION_STR}
+
+def compare(metrics, baselinePath, tolerance):
+    # Print the change of every metric from the baseline run, returns the names of the regressions
+    with open(baselinePath) as f:
+        baseline = json.load(f)["metrics"]
+    regressions = []
+    print(f"\nCompared with {baselinePath} (tolerance {tolerance:.0%})")
+    for name, metric in metrics.items():
+        if name not in baseline or baseline[name]["value"] == 0:
+            continue
+        change = (metric["value"] / baseline[name]["value"]) - 1
+        worse = -change if metric["better"] == "higher" else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:<44} {change:+8.1%}{flag}")
+    return regressions
+
+def size_list(text, parse=int):
+    # "4x8,20x8" -> [(4, 8), (20, 8)]
+    return [tuple(parse(v) for v in item.split('x')) for item in text.split(',')]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark parsing, replay, rendering and end-to-end latency, saving the results as JSON.")
+    parser.add_argument("--only", help=f"Comma separated sections to run ({','.join(SECTIONS)})")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs for a fast check")
+    parser.add_argument("-o", "--output", help="JSON results file (default: benchmark-YYYY-MM-DD-HH-MM-SS.json)")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with, exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change allowed before a metric is a regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--copies", type=int, help="Copies of the sample logs to parse")
+    parser.add_argument("--replay-rows", type=int, help="Rows of the replayed logs")
+    parser.add_argument("--frames", type=int, help="Frames per render measurement")
+    parser.add_argument("--render-sizes", type=size_list, help="Tags x anchors to render, e.g. 4x8,20x8,100x16")
+    parser.add_argument("--latency-loads", type=lambda text: size_list(text, float), help="Tags x samples per second per tag, e.g. 4x10,50x100")
+    parser.add_argument("--latency-seconds", type=float, help="Duration of each latency measurement")
+    args = parser.parse_args()
+
+    quick = args.quick
+    args.copies = args.copies or (5 if quick else 50)
+    args.replay_rows = args.replay_rows or (10000 if quick else 100000)
+    args.frames = args.frames or (30 if quick else 200)
+    args.render_sizes = args.render_sizes or ([(4, 8), (20, 8)] if quick else [(4, 8), (20, 8), (20, 32), (100, 8), (500, 8)])
+    args.latency_loads = [(int(t), r) for t, r in (args.latency_loads or ([(4, 10)] if quick else [(4, 10), (20, 50), (50, 100), (100, 200)]))]
+    args.latency_seconds = args.latency_seconds or (2.0 if quick else 10.0)
+    sections = args.only.split(',') if args.only else SECTIONS
+
+    results = Results()
+    if "parse" in sections:
+        bench_parse(results, args)
+    if "replay" in sections:
+        bench_replay(results, args)
+    if "render" in sections or "latency" in sections:
+        from PyQt6.QtWidgets import QApplication
+        from main import RtlsUwbApplication
+        app = QApplication(sys.argv)
+        window = RtlsUwbApplication()
+        window.show()
+        while not window.startup_finished(): # The plot is created after the first paint
+            app.processEvents()
+        if "render" in sections:
+            bench_render(results, args, window, app)
+        if "latency" in sections:
+            bench_latency(results, args, window, app)
+        window.SERIAL.stop()
+        window.SERIAL.wait()
+
+    output = args.output or f"benchmark-{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.json"
+    settings = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "tolerance")}
+    with open(output, "w") as f:
+        json.dump({"environment": environment(), "settings": settings, "metrics": results.metrics}, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare and compare(results.metrics, args.compare, args.tolerance):
+        sys.exit(1)
+    sys.exit(0)
@@ -0,0 +1,115 @@
+import os, sys, time, glob, select, argparse, threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.tagDataUtils import TagDataUtils
+from utils.dwmParser import DwmParser
+
+LOG_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "logs")
+
+def csv_toSerialLine(row):
+    # Rebuild the DWM1001 line a CSV log row was recorded from
+    anchorCount = int(row[1])
+    fields = ["DIST", row[1]]
+    for i in range(anchorCount):
+        fields += [f"AN{i}"] + row[2 + (5 * i):7 + (5 * i)]
+    fields += ["POS"] + row[-4:]
+    return (",".join(fields) + "\r\n").encode("ascii")
+
+def load_lines():
+    lines = []
+    for path in sorted(glob.glob(os.path.join(LOG_DIRECTORY, "*.csv"))):
+        with open(path) as f:
+            lines += [csv_toSerialLine(line.strip().split(',')) for line in f if line.strip()]
+    return lines
+
+def current_path(lines):
+    # The serial reader hot path before DwmParser
+    for raw in lines:
+        line = raw.decode(errors='ignore').strip()
+        if not line:
+            continue
+        if line.startswith("DIST") == False or "POS" not in line:
+            continue
+        row = f"{0.123},{line}\n"
+        TagDataUtils.serial_toTagData(None, row.split(','))
+
+def parser_path(lines):
+    parser = DwmParser()
+    for raw in lines:
+        parser.parse(raw, 0.123)
+
+def serial_pair():
+    # Serial port on the slave end of a pseudo terminal, the benchmark writes the lines to the master end
+    import tty, serial
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    port = serial.Serial(os.ttyname(slave), 115200, timeout=1)
+    os.close(slave)
+    return master, port
+
+def read_serial(reader, lines):
+    # Lines per second of a reader on a pseudo terminal, written in chunks by another thread like a device would
+    master, port = serial_pair()
+    data = b"".join(lines)
+    writer = threading.Thread(target=lambda: [os.write(master, data[i:i + 4096]) for i in range(0, len(data), 4096)])
+    start = time.perf_counter()
+    writer.start()
+    reader(port, len(lines))
+    elapsed = time.perf_counter() - start
+    writer.join()
+    port.close()
+    os.close(master)
+    return len(lines) / elapsed
+
+def readline_reader(port, count):
+    # The serial reader before SerialMultiplexer, one readline() per line
+    for _ in range(count):
+        line = port.readline().decode(errors='ignore').strip()
+        if line.startswith("DIST") == False or "POS" not in line:
+            continue
+        row = f"{0.123},{line}\n"
+        TagDataUtils.serial_toTagData(None, row.split(','))
+
+def multiplexer_reader(port, count):
+    # SerialMultiplexer.read_port, a read of the waiting bytes framed into lines and parsed by DwmParser
+    from serialMultiplexer import SerialPort
+    serialPort = SerialPort(0, port.port, port.baudrate, False, None)
+    serialPort.serial = port
+    port.timeout = 0
+    while serialPort.parser.lines < count:
+        select.select([port.fileno()], [], [], 1.0)
+        serialPort.read()
+        for line in serialPort.lines():
+            serialPort.parser.parse(line, 0.123)
+
+def lines_per_second(function, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(lines)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the serial line parsing throughput of DwmParser and the previous string path.")
+    parser.add_argument("--copies", type=int, default=50, help="Number of copies of the sample logs to parse")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--serial-lines", type=int, default=2000, help="Number of lines to read through a pseudo terminal")
+    args = parser.parse_args()
+
+    lines = load_lines() * args.copies
+    print(f"Parsing {len(lines)} DWM1001 lines (best of {args.repeat})")
+    current = lines_per_second(current_path, lines, args.repeat)
+    print(f"  current                {current:12,.0f} lines/s")
+    dwm = lines_per_second(parser_path, lines, args.repeat)
+    print(f"  DwmParser.parse        {dwm:12,.0f} lines/s  ({dwm / current:.1f}x)")
+
+    # The readers are bound by how the serial port is read more than by the parsing
+    if hasattr(os, "openpty"):
+        lines = lines[:args.serial_lines]
+        print(f"Reading {len(lines)} DWM1001 lines from a serial port (pseudo terminal)")
+        current = read_serial(readline_reader, lines)
+        print(f"  readline               {current:12,.0f} lines/s")
+        multiplexer = read_serial(multiplexer_reader, lines)
+        print(f"  SerialMultiplexer      {multiplexer:12,.0f} lines/s  ({multiplexer / current:.1f}x)")
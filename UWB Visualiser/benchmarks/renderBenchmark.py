@@ -0,0 +1,73 @@
+import os, sys, time, math, argparse
+
+# Render without a display unless a platform has been chosen explicitly
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtWidgets import QApplication
+from tagData import TagData, TagPosition, AnchorPosition
+from main import RtlsUwbApplication
+from anchorRegistry import AnchorLocation
+from tagRegistry import tag_colour
+
+def create_anchors(numAnchors):
+    # Spread the anchors evenly around the default floorplan
+    anchors = []
+    for i in range(numAnchors):
+        angle = 2 * math.pi * i / numAnchors
+        anchors.append(AnchorLocation(f"A{i:03X}", round(3 + 2.5 * math.cos(angle), 2), round(3 + 2.5 * math.sin(angle), 2), 2.0))
+    return anchors
+
+def create_tagData(frame, tagIndex, anchors):
+    # Tags move around a circle, each using the 4 closest anchors in its position calculation
+    angle = 0.05 * frame + tagIndex
+    x = round(3 + 1.5 * math.cos(angle), 2)
+    y = round(3 + 1.5 * math.sin(angle), 2)
+    closest = sorted(anchors, key=lambda a: (a.X - x) ** 2 + (a.Y - y) ** 2)[:4]
+    t = TagData()
+    t.TimeStamp = frame * 0.1
+    t.AnchorPositions = [AnchorPosition(a.AnchorID, a.X, a.Y, a.Z, round(math.dist((a.X, a.Y), (x, y)), 2)) for a in closest]
+    t.TagPosition = TagPosition(x, y, 0.8, 50)
+    return t
+
+def run(window, app, mode, numTags, numAnchors, frames):
+    # Time of each frame (s), from updating the tags to the frame being painted
+    window.set_render_mode(mode)
+    window.ANCHORS.clear()
+    window.ANCHORS.update(create_anchors(numAnchors))
+    window.TAGS.clear()
+    window.TAG_COLOURS.clear()
+    for i in range(numTags):
+        window.TAG_COLOURS[f"COM{i+1}"] = tag_colour(i, window.COLOURS)
+    window.RENDERER.invalidate()
+
+    anchors = list(window.ANCHORS)
+    frameTimes = []
+    for frame in range(frames):
+        start = time.perf_counter()
+        for i in range(numTags):
+            window.TAGS[f"COM{i+1}"] = create_tagData(frame, i, anchors)
+        window.redraw_plot()
+        app.processEvents() # Paint the frame
+        frameTimes.append(time.perf_counter() - start)
+    return frameTimes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the redraw_plot frame rate of the legacy, blit and scene render modes.")
+    parser.add_argument("--tags", type=int, default=4)
+    parser.add_argument("--anchors", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    window = RtlsUwbApplication()
+    window.show()
+    while not window.startup_finished(): # The plot is created after the first paint
+        app.processEvents()
+
+    print(f"redraw_plot: {args.tags} tags, {args.anchors} anchors, {args.frames} frames")
+    results = {}
+    for mode in ["legacy", "blit", "scene"]:
+        results[mode] = args.frames / sum(run(window, app, mode, args.tags, args.anchors, args.frames))
+        print(f"  {mode:<8} {results[mode]:8.1f} FPS")
+    print(f"  speed-up {results['blit'] / results['legacy']:8.1f}x blit, {results['scene'] / results['legacy']:.1f}x scene")
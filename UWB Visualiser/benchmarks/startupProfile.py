@@ -0,0 +1,98 @@
+import os, sys, time, json, argparse, tempfile, subprocess, statistics
+
+# Render without a display unless a platform has been chosen explicitly
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+APPLICATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Times the start of the visualiser, each run in a new interpreter so the imports are timed cold:
+#   - import:  importing main (PyQt6, NumPy, the application modules and whatever they import up front)
+#   - window:  from the start of the process until the window is first painted
+#   - ready:   until the plot has been drawn and the port scan and log listing have filled the dropdowns
+#   With --logs the log directory is replaced by a temporary one holding that many (empty) logs, and
+#   --profile prints the functions taking the most time during the start.
+PHASES = ["import", "window", "ready"]
+
+def child(args):
+    start = time.perf_counter()
+    sys.path.insert(0, APPLICATION_DIR)
+    if args.profile:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    import main
+    imported = time.perf_counter()
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QObject, QEvent
+    app = QApplication(sys.argv[:1])
+    main.app = app
+    if args.logDirectory:
+        main.RtlsUwbApplication.LOGFILE_DIRECTORY = args.logDirectory
+
+    class FirstPaint(QObject):
+        # Time of the first paint of any widget
+        time = None
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Type.Paint and self.time is None:
+                self.time = time.perf_counter()
+            return False
+    firstPaint = FirstPaint()
+    app.installEventFilter(firstPaint)
+
+    window = main.RtlsUwbApplication()
+    window.show()
+
+    # Versions without background scans have filled the dropdowns before the window was shown
+    startup_finished = getattr(window, "startup_finished", lambda: True)
+    deadline = time.perf_counter() + 60
+    while (firstPaint.time is None or not startup_finished()) and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    app.processEvents()
+    ready = time.perf_counter()
+    shown = firstPaint.time or ready
+    if args.profile:
+        import pstats
+        profile.disable()
+        pstats.Stats(profile, stream=sys.stderr).sort_stats("cumulative").print_stats(args.profile)
+
+    window.close()
+    print(json.dumps({"import": imported - start, "window": shown - start, "ready": ready - start}))
+
+def run(args, logDirectory):
+    command = [sys.executable, os.path.abspath(__file__), "--child"]
+    if logDirectory:
+        command += ["--logDirectory", logDirectory]
+    if args.profile:
+        command += ["--profile", str(args.profile)]
+    output = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the start of the visualiser, from launching main.py to the window being shown and the dropdowns filled.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--logs", type=int, default=0, help="Start with a log directory of this many logs instead of ./logs")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="Print the N functions with the most cumulative time of one start")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--logDirectory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        logDirectory = None
+        if args.logs:
+            logDirectory = directory
+            for i in range(args.logs):
+                open(os.path.join(directory, f"2025-01-01-{i // 3600:02d}-{(i // 60) % 60:02d}-{i % 60:02d}-{i % 8}.csv"), "w").close()
+
+        if args.profile:
+            print(f"Profile of one start ({args.logs or 'default'} logs), top {args.profile} functions:")
+            run(args, logDirectory)
+            sys.exit(0)
+
+        results = [run(args, logDirectory) for _ in range(args.runs)]
+        print(f"Startup: {args.runs} runs, {args.logs or 'default'} logs (median / min)")
+        for phase in PHASES:
+            times = [r[phase] * 1000 for r in results]
+            print(f"  {phase:<8} {statistics.median(times):8.1f} ms {min(times):8.1f} ms")
@@ -0,0 +1,18 @@
+from csvReader import CsvReader
+from utils.binaryLog import BinaryLogFile
+
+class BinReader(CsvReader):
+    # Replays binary logs, the records are memory-mapped so seeking is a binary search of the timestamps
+    def open_log(self):
+        self.position = 0
+        return BinaryLogFile(self.CSV_FILE)
+
+    def read_row(self, log):
+        if self.position >= len(log):
+            return None
+        tagData = log.tagData(self.position)
+        self.position += 1
+        return float(tagData.TimeStamp), tagData
+
+    def seek_log(self, log, seekTime):
+        self.position = log.search(seekTime)
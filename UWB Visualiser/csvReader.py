@@ -1,55 +1,166 @@
-import os, csv
-import time
+import os
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal
 from tagData import TagData
 from utils.tagDataUtils import TagDataUtils
+from utils.logIndex import load_index
+from replayClock import ReplayClock
 
 class CsvReader(QThread):
     tag_data = pyqtSignal(TagData, str)
     replay_stopped = pyqtSignal(int)
+    samples_ready = pyqtSignal()
 
-    def __init__(self, INDEX, CSV_FILE):
+    def __init__(self, INDEX, CSV_FILE, SPEED=1.0, SAMPLE_QUEUE=None):
         super().__init__()
         self.INDEX = INDEX
         self.CSV_FILE = CSV_FILE
+        self.SAMPLE_QUEUE = SAMPLE_QUEUE
+        self.running = True
+        self.clock = ReplayClock(SPEED)
+        self.seekTime = None
+        self.showSeekedRow = False
+        self.condition = threading.Condition()
+        self.index = None # Timestamps and byte offsets of the rows, from the log's index sidecar
 
     def run(self):
-        # Read the logging data and emit it or save to CSV
-        self.running = True
-        
+        # Replay the logging data, emitting each row at its recorded timestamp
+
         # Load CSV file
         if not os.path.exists(self.CSV_FILE):
             print(f"File not found: {self.CSV_FILE}")
             return
-        
+
         # Try and read the COM Port from the filename
-        index = self.CSV_FILE.rfind('-')
-        comPort = self.CSV_FILE[index+1:-4]
+        name = os.path.splitext(self.CSV_FILE)[0]
+        comPort = name[name.rfind('-')+1:]
         if comPort.isdigit() == False:
             print(f"Unknown COM Port: {comPort}")
             return
 
-        with open(self.CSV_FILE, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                if self.running is False:
+        with self.open_log() as log:
+            while self.running:
+                seekTime = self.take_seek()
+                if seekTime is not None:
+                    self.seek_log(log, seekTime)
+                    with self.condition:
+                        self.clock.set(seekTime)
+                        self.showSeekedRow = self.clock.paused
+
+                row = self.read_row(log)
+                if row is None:
+                    break
+                timestamp, tagData = row
+
+                # Wait for the row's timestamp, a seek or stop discards the row
+                if not self.wait_for(timestamp):
                     continue
-                
-                try:
-                    # Send the tag data signal
-                    tagData = TagDataUtils.csv_toTagData(self, row)
-                    self.send_tag_data(tagData, f"COM{comPort}")
-                    
-                    time.sleep(0.1)
-                except ValueError as e:
-                    print(f"Skipping row due to error: {e}")
+
+                # Send the tag data signal
+                self.send_tag_data(tagData, f"COM{comPort}")
+
+        # Signal the end of file has been reached
+        self.replay_stopped.emit(self.INDEX)
+
+    def open_log(self):
+        # The index is built (and saved) the first time a log without an up to date sidecar is replayed
+        self.index = load_index(self.CSV_FILE)
+        return open(self.CSV_FILE, 'rb')
+
+    def read_row(self, csvfile):
+        # Next (timestamp, TagData) in the log, None at the end of the file
+        while True:
+            line = csvfile.readline()
+            if not line:
+                return None
+
+            try:
+                row = line.decode(errors='ignore').strip().split(',')
+                timestamp = float(row[0])
+                tagData = TagDataUtils.csv_toTagData(self, row)
+            except (ValueError, IndexError) as e:
+                print(f"Skipping row due to error: {e}")
+                continue
+            return timestamp, tagData
+
+    def wait_for(self, timestamp):
+        with self.condition:
+            if self.clock.now() is None:
+                self.clock.set(timestamp)
+            while self.running and self.seekTime is None:
+                if self.clock.paused:
+                    # Show the first row after seeking while paused
+                    if self.showSeekedRow:
+                        self.showSeekedRow = False
+                        return True
+                    self.condition.wait()
                     continue
+                if self.clock.speed == 0:
+                    # As fast as possible
+                    self.clock.set(timestamp)
+                    return True
+                delay = self.clock.delay_until(timestamp)
+                if delay <= 0:
+                    return True
+                self.condition.wait(delay)
+            return False
+
+    def take_seek(self):
+        with self.condition:
+            seekTime = self.seekTime
+            self.seekTime = None
+            return seekTime
+
+    def seek_log(self, csvfile, seekTime):
+        # Binary search the index for the first row at or after the seek time
+        row = self.index.search(seekTime)
+        csvfile.seek(self.index.offset(row))
+        if row < len(self.index):
+            return
 
-            # Signal the end of file has been reached
-            self.replay_stopped.emit(self.INDEX)
+        # Past the indexed rows, scan the rows appended since the log was indexed
+        while self.running:
+            offset = csvfile.tell()
+            line = csvfile.readline()
+            if not line:
+                break
+            try:
+                timestamp = float(line.split(b',', 1)[0])
+            except ValueError:
+                continue
+            if timestamp >= seekTime:
+                csvfile.seek(offset)
+                break
 
     def stop(self):
-        self.running = False
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def pause(self):
+        with self.condition:
+            self.clock.pause()
+            self.condition.notify_all()
+
+    def resume(self):
+        with self.condition:
+            self.clock.resume()
+            self.condition.notify_all()
+
+    def seek(self, seekTime):
+        with self.condition:
+            self.seekTime = seekTime
+            self.condition.notify_all()
+
+    def set_speed(self, speed):
+        # Speed multiplier between 0.25x and 100x, or 0 to replay as fast as possible
+        with self.condition:
+            self.clock.set_speed(speed)
+            self.condition.notify_all()
 
     def send_tag_data(self, td: TagData, com_port):
-        self.tag_data.emit(td, com_port)
\ No newline at end of file
+        # Without a sample queue every sample is sent as its own signal
+        if self.SAMPLE_QUEUE is None:
+            self.tag_data.emit(td, com_port)
+        elif self.SAMPLE_QUEUE.put(com_port, td):
+            self.samples_ready.emit()
@@ -0,0 +1,51 @@
+import os
+import numpy as np
+
+class FloorplanCache():
+    # Decodes the floorplan image once and keeps a pyramid of downsampled copies (full, 1/2, 1/4, ...),
+    #   so each redraw uses the smallest image that still covers the displayed pixel density.
+    MIN_LEVEL_SIZE = 64
+
+    def __init__(self):
+        self.key = None
+        self.levels = []
+        self.arrays = {}
+        self.width = 0
+        self.height = 0
+        self.extent = (0, 1, 0, 1)
+
+    def load(self, path, originX, originY, fp10m):
+        # Only decode the image again when the file or its scaling changes
+        key = (os.path.abspath(path), os.path.getmtime(path), originX, originY, fp10m)
+        if key == self.key:
+            return
+        if self.key is None or key[:2] != self.key[:2]:
+            from PIL import Image # Only imported once the floorplan is drawn
+            with Image.open(path) as img:
+                img.load()
+                self.levels = [img.copy() if img.mode in ("RGB", "RGBA") else img.convert("RGBA")]
+            self.arrays = {}
+            self.width, self.height = self.levels[0].size
+        self.key = key
+
+        # Floorplan extent in meters, with the origin at (0, 0)
+        fp_offset_x = (originX * 10) / fp10m
+        fp_offset_y = ((self.height - originY) * 10) / fp10m
+        self.extent = (-fp_offset_x, ((self.width * 10) / fp10m) - fp_offset_x, -fp_offset_y, ((self.height * 10) / fp10m) - fp_offset_y)
+
+    def image(self, displayWidth, displayHeight):
+        # Pick the coarsest pyramid level with at least as many pixels as the floorplan is displayed with
+        #   (the plot's size in screen pixels, or the zoomed size of the floorplan in the scene renderer)
+        level = 0
+        while self.width >> (level + 1) >= displayWidth and self.height >> (level + 1) >= displayHeight and min(self.width, self.height) >> (level + 1) >= self.MIN_LEVEL_SIZE:
+            level += 1
+        return self.levelArray(level)
+
+    def levelArray(self, level):
+        if level not in self.arrays:
+            # Build the missing levels by halving the previous level
+            while len(self.levels) <= level:
+                previous = self.levels[-1]
+                self.levels.append(previous.reduce(2))
+            self.arrays[level] = np.asarray(self.levels[level])
+        return self.arrays[level]
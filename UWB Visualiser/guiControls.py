@@ -1,8 +1,9 @@
-import os
-from PyQt6.QtWidgets import QLabel, QVBoxLayout, QHBoxLayout, QComboBox, QPushButton, QCheckBox, QProgressBar, QLineEdit, QGroupBox
+from PyQt6.QtWidgets import QLabel, QVBoxLayout, QHBoxLayout, QComboBox, QPushButton, QCheckBox, QLineEdit, QGroupBox, QTableView, QHeaderView, QAbstractItemView, QScrollArea, QFrame, QWidget
 from PyQt6.QtCore import Qt
 from PyQt6 import QtGui
 from functools import partial
+from tagRegistry import tag_colour
+from logListing import DirectoryListing
 
 class guiControls():
     def CreateControlsLayout(self):
@@ -29,9 +30,7 @@ class guiControls():
         fp_groupBoxLayout.addLayout(fpLoadConfigLayout)
         cmb_configFile = QComboBox()
         cmb_configFile.setObjectName("cmb_configFile")
-        for f_name in os.listdir(f"{self.CONFIG_DIRECTORY}"):
-            if f_name.endswith(".json"):
-                 cmb_configFile.addItem(f"{f_name}")
+        cmb_configFile.addItems(sorted(DirectoryListing(self.CONFIG_DIRECTORY, [".json"]).names()))
         fpLoadConfigLayout.addWidget(cmb_configFile)
         btn_loadConfig = QPushButton("Load Config")
         btn_loadConfig.clicked.connect(self.LoadConfig)
@@ -84,108 +83,187 @@ class guiControls():
         serial_groupBox.setLayout(serial_groupBoxLayout)
 
         btn_searchComPorts = QPushButton("Search COM Ports")
+        btn_searchComPorts.setObjectName("btn_searchComPorts")
         btn_searchComPorts.clicked.connect(self.search_com_ports)
         serial_groupBoxLayout.addWidget(btn_searchComPorts)
 
-        for index in range(1, 5):
-            comPortLayout = QHBoxLayout()
-            self.cmb_comport_colour = QComboBox(self)
-            for row, colour in enumerate(self.COLOURS):
-                self.cmb_comport_colour.addItem(colour)
-                model = self.cmb_comport_colour.model()
-                model.setData(model.index(row, 0), QtGui.QColor(colour), Qt.ItemDataRole.BackgroundRole)
-            self.cmb_comport_colour.setCurrentText(self.COLOURS[index-1])
-            self.cmb_comport_colour.currentTextChanged.connect(partial(self.UpdateQWidgetColour, QComboBox, f"cmb_comport_colour_{index}"))
-            comPortLayout.addWidget(self.cmb_comport_colour)
-            self.cmb_comport_colour.setObjectName(f"cmb_comport_colour_{index}")
-            self.cmb_comport_colour.setStyleSheet(f"QWidget {{background-color: {self.COLOURS[index-1]};}}")
-
-            comPort = QComboBox(self)
-            comPort.setObjectName(f"comPort_{index}")
-            comPortLayout.addWidget(comPort)
-
-            baudrate = QLineEdit(self)
-            baudrate.setText("115200")
-            baudrate.setObjectName(f"baudrate_{index}")
-            comPortLayout.addWidget(baudrate)
-
-            chk_logging = QCheckBox("Enable Logging")
-            chk_logging.setChecked(True)
-            chk_logging.setObjectName(f"chk_logging_{index}")
-            comPortLayout.addWidget(chk_logging)
-
-            btn_connect = QPushButton("Connect")
-            btn_connect.clicked.connect(partial(self.start_serial_connection, index))
-            btn_connect.setObjectName(f"btn_connect_{index}")
-            comPortLayout.addWidget(btn_connect)
-
-            btn_disconnect = QPushButton("Disconnect")
-            btn_disconnect.clicked.connect(partial(self.stop_serial_connection, index))
-            btn_disconnect.setObjectName(f"btn_disconnect_{index}")
-            btn_disconnect.setHidden(True)
-            comPortLayout.addWidget(btn_disconnect)
-            serial_groupBoxLayout.addLayout(comPortLayout)
+        logFormatLayout = QHBoxLayout()
+        logFormatLayout.addWidget(QLabel("Log Format:"))
+        cmb_logFormat = QComboBox(self)
+        cmb_logFormat.setObjectName("cmb_logFormat")
+        cmb_logFormat.addItems(self.LOG_FORMATS)
+        logFormatLayout.addWidget(cmb_logFormat)
+        logFormatLayout.addStretch()
+        serial_groupBoxLayout.addLayout(logFormatLayout)
+
+        self.serialRowsLayout = guiControls.CreateRowsArea(self, serial_groupBoxLayout)
+        for _ in range(self.TAG_ROWS):
+            guiControls.AddSerialRow(self)
+
+        btn_addSerial = QPushButton("Add Connection")
+        btn_addSerial.clicked.connect(self.add_serial_row)
+        serial_groupBoxLayout.addWidget(btn_addSerial)
         
         controlsLayout.addWidget(serial_groupBox)
 
+        # Tags forwarded by remote gateways over TCP/UDP
+        network_groupBox = QGroupBox("Network Connections: ")
+        networkLayout = QHBoxLayout()
+        network_groupBox.setLayout(networkLayout)
+        networkLayout.addWidget(QLabel("Host:"))
+        networkHost = QLineEdit(self)
+        networkHost.setObjectName("networkHost")
+        networkHost.setText(self.NETWORK_HOST)
+        networkLayout.addWidget(networkHost)
+        networkLayout.addWidget(QLabel("Port:"))
+        networkPort = QLineEdit(self)
+        networkPort.setObjectName("networkPort")
+        networkPort.setText(f"{self.NETWORK_PORT}")
+        networkLayout.addWidget(networkPort)
+
+        lbl_networkSenders = QLabel("")
+        lbl_networkSenders.setObjectName("lbl_networkSenders")
+        networkLayout.addWidget(lbl_networkSenders)
+
+        btn_listen = QPushButton("Listen")
+        btn_listen.clicked.connect(self.start_network_receiver)
+        btn_listen.setObjectName("btn_listen")
+        networkLayout.addWidget(btn_listen)
+
+        btn_stopListening = QPushButton("Stop")
+        btn_stopListening.clicked.connect(self.stop_network_receiver)
+        btn_stopListening.setObjectName("btn_stopListening")
+        btn_stopListening.setHidden(True)
+        networkLayout.addWidget(btn_stopListening)
+        controlsLayout.addWidget(network_groupBox)
+
         # Logging path settings
         csvReplayGroupBox = QGroupBox("CSV Replay: ")
         csvReplayGroupBoxLayout = QVBoxLayout()
         csvReplayGroupBox.setLayout(csvReplayGroupBoxLayout)
         controlsLayout.addWidget(csvReplayGroupBox)
        
-        for index in range(1, 5):
-            csvReplayLayout = QHBoxLayout()
-            self.lbl_comPort = QLabel("")
-            self.lbl_comPort.setObjectName(f"lbl_comPort_{index}")
-            csvReplayLayout.addWidget(self.lbl_comPort)
-
-            self.cmb_colour = QComboBox(self)
-            for row, colour in enumerate(self.COLOURS):
-                self.cmb_colour.addItem(colour)
-                model = self.cmb_colour.model()
-                model.setData(model.index(row, 0), QtGui.QColor(colour), Qt.ItemDataRole.BackgroundRole)
-            self.cmb_colour.setCurrentText(self.COLOURS[index-1])
-            self.cmb_colour.currentTextChanged.connect(partial(self.UpdateQWidgetColour, QComboBox, f"cmb_colour_{index}"))
-            csvReplayLayout.addWidget(self.cmb_colour)
-            self.cmb_colour.setObjectName(f"cmb_colour_{index}")
-            self.cmb_colour.setStyleSheet(f"QWidget {{background-color: {self.COLOURS[index-1]};}}")
-
-            self.cmb_csv = QComboBox(self)
-            self.cmb_csv.setObjectName(f"cmb_csv_{index}")
-            csvReplayLayout.addWidget(self.cmb_csv)
-
-            self.btn_replay = QPushButton("Replay")
-            self.btn_replay.clicked.connect(partial(self.start_csv_replay, index))
-            self.btn_replay.setObjectName(f"btn_replay_{index}")
-            csvReplayLayout.addWidget(self.btn_replay)
-
-            self.btn_stop = QPushButton("Stop")
-            self.btn_stop.clicked.connect(partial(self.stop_csv_replay, index))
-            self.btn_stop.setObjectName(f"btn_stop_{index}")
-            self.btn_stop.setEnabled(False)
-            csvReplayLayout.addWidget(self.btn_stop)
-            csvReplayGroupBoxLayout.addLayout(csvReplayLayout)
+        self.replayRowsLayout = guiControls.CreateRowsArea(self, csvReplayGroupBoxLayout)
+        for _ in range(self.TAG_ROWS):
+            guiControls.AddReplayRow(self)
+
+        btn_addReplay = QPushButton("Add Replay")
+        btn_addReplay.clicked.connect(self.add_replay_row)
+        csvReplayGroupBoxLayout.addWidget(btn_addReplay)
+
+        # Any number of logs replayed together, merged by timestamp on one clock
+        mergedReplayLayout = QHBoxLayout()
+        btn_replayLogs = QPushButton("Replay Logs...")
+        btn_replayLogs.setObjectName("btn_replayLogs")
+        btn_replayLogs.clicked.connect(self.start_merged_replay)
+        mergedReplayLayout.addWidget(btn_replayLogs)
+
+        lbl_replayLogs = QLabel("")
+        lbl_replayLogs.setObjectName("lbl_replayLogs")
+        mergedReplayLayout.addWidget(lbl_replayLogs)
+
+        btn_stopReplayLogs = QPushButton("Stop")
+        btn_stopReplayLogs.setObjectName("btn_stopReplayLogs")
+        btn_stopReplayLogs.clicked.connect(self.stop_merged_replay)
+        btn_stopReplayLogs.setEnabled(False)
+        mergedReplayLayout.addWidget(btn_stopReplayLogs)
+        csvReplayGroupBoxLayout.addLayout(mergedReplayLayout)
+
+        # Replay speed, pause and seek controls shared by all the replays
+        replayControlsLayout = QHBoxLayout()
+        replayControlsLayout.addWidget(QLabel("Speed:"))
+        cmb_replaySpeed = QComboBox(self)
+        cmb_replaySpeed.setObjectName("cmb_replaySpeed")
+        cmb_replaySpeed.addItems(self.REPLAY_SPEEDS)
+        cmb_replaySpeed.setCurrentText("1x")
+        cmb_replaySpeed.currentTextChanged.connect(self.set_replay_speed)
+        replayControlsLayout.addWidget(cmb_replaySpeed)
+
+        btn_replayPause = QPushButton("Pause")
+        btn_replayPause.setObjectName("btn_replayPause")
+        btn_replayPause.setCheckable(True)
+        btn_replayPause.clicked.connect(self.toggle_replay_pause)
+        replayControlsLayout.addWidget(btn_replayPause)
+
+        replayControlsLayout.addWidget(QLabel("Time (s):"))
+        replaySeekTime = QLineEdit(self)
+        replaySeekTime.setObjectName("replaySeekTime")
+        replaySeekTime.setText("0")
+        replayControlsLayout.addWidget(replaySeekTime)
+
+        btn_replaySeek = QPushButton("Seek")
+        btn_replaySeek.clicked.connect(self.seek_replay)
+        replayControlsLayout.addWidget(btn_replaySeek)
+        csvReplayGroupBoxLayout.addLayout(replayControlsLayout)
 
         # Other telemetry
         tag_position_groupBox = QGroupBox("Tag Positions: ")
         tag_position_groupBoxLayout = QVBoxLayout()
         tag_position_groupBox.setLayout(tag_position_groupBoxLayout)
 
-        for index in range(1, 5):
-            tagPosLayout = QHBoxLayout()
-            self.lbl_tag = QLabel(f"Tag {index}:")
-            self.lbl_tag.setObjectName(f"lbl_tag_{index}")
-            self.lbl_tag.setMinimumWidth(200)
-            tagPosLayout.addWidget(self.lbl_tag)
-            self.lbl_tagQf = QLabel("Quality Factor: ")
-            tagPosLayout.addWidget(self.lbl_tagQf)
-            self.prgbar = QProgressBar()
-            self.prgbar.setMaximum(100)
-            self.prgbar.setValue(0)
-            self.prgbar.setObjectName(f"prgbar_{index}")
-            tagPosLayout.addWidget(self.prgbar)
-            tag_position_groupBoxLayout.addLayout(tagPosLayout)
+        tbl_tags = QTableView(self)
+        tbl_tags.setObjectName("tbl_tags")
+        tbl_tags.setModel(self.TAG_TABLE)
+        tbl_tags.verticalHeader().setVisible(False)
+        tbl_tags.verticalHeader().setDefaultSectionSize(20)
+        tbl_tags.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        tbl_tags.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        tbl_tags.setMinimumHeight(130)
+        tag_position_groupBoxLayout.addWidget(tbl_tags)
+
+        chk_trails = QCheckBox("Show Trails")
+        chk_trails.setObjectName("chk_trails")
+        chk_trails.setChecked(self.SHOW_TRAILS)
+        chk_trails.toggled.connect(self.set_trails_enabled)
+        tag_position_groupBoxLayout.addWidget(chk_trails)
+        chk_coverage = QCheckBox("Show Coverage")
+        chk_coverage.setObjectName("chk_coverage")
+        chk_coverage.setChecked(self.SHOW_COVERAGE)
+        chk_coverage.toggled.connect(self.set_coverage_enabled)
+        tag_position_groupBoxLayout.addWidget(chk_coverage)
+        renderLayout = QHBoxLayout()
+        renderLayout.addWidget(QLabel("Renderer:"))
+        cmb_renderMode = QComboBox(self)
+        cmb_renderMode.setObjectName("cmb_renderMode")
+        cmb_renderMode.addItems(self.RENDER_MODES.keys())
+        cmb_renderMode.setCurrentText(next((k for k, v in self.RENDER_MODES.items() if v == self.RENDER_MODE), "Matplotlib"))
+        cmb_renderMode.setToolTip("Qt Scene: scroll to zoom, drag to pan and double click to follow the tags again")
+        cmb_renderMode.currentTextChanged.connect(lambda text: self.set_render_mode(self.RENDER_MODES[text]))
+        renderLayout.addWidget(cmb_renderMode)
+        renderLayout.addStretch()
+        tag_position_groupBoxLayout.addLayout(renderLayout)
+
+        # Dwell time heatmap of the live samples, logs can be added to it
+        heatmapLayout = QHBoxLayout()
+        chk_heatmap = QCheckBox("Show Heatmap")
+        chk_heatmap.setObjectName("chk_heatmap")
+        chk_heatmap.setChecked(self.SHOW_HEATMAP)
+        chk_heatmap.toggled.connect(self.set_heatmap_enabled)
+        heatmapLayout.addWidget(chk_heatmap)
+        heatmapLayout.addWidget(QLabel("Cell:"))
+        cmb_heatmapResolution = QComboBox(self)
+        cmb_heatmapResolution.setObjectName("cmb_heatmapResolution")
+        cmb_heatmapResolution.addItems(self.HEATMAP_RESOLUTIONS.keys())
+        cmb_heatmapResolution.setCurrentText(next((k for k, v in self.HEATMAP_RESOLUTIONS.items() if v == self.HEATMAP_RESOLUTION), "0.25 m"))
+        cmb_heatmapResolution.currentTextChanged.connect(self.set_heatmap_options)
+        heatmapLayout.addWidget(cmb_heatmapResolution)
+        heatmapLayout.addWidget(QLabel("Window:"))
+        cmb_heatmapWindow = QComboBox(self)
+        cmb_heatmapWindow.setObjectName("cmb_heatmapWindow")
+        cmb_heatmapWindow.addItems(self.HEATMAP_WINDOWS.keys())
+        cmb_heatmapWindow.setCurrentText(next((k for k, v in self.HEATMAP_WINDOWS.items() if v == self.HEATMAP_WINDOW), "All"))
+        cmb_heatmapWindow.currentTextChanged.connect(self.set_heatmap_options)
+        heatmapLayout.addWidget(cmb_heatmapWindow)
+        btn_heatmapLogs = QPushButton("Add Logs...")
+        btn_heatmapLogs.setObjectName("btn_heatmapLogs")
+        btn_heatmapLogs.clicked.connect(self.load_heatmap_logs)
+        heatmapLayout.addWidget(btn_heatmapLogs)
+        btn_clearHeatmap = QPushButton("Clear")
+        btn_clearHeatmap.setObjectName("btn_clearHeatmap")
+        btn_clearHeatmap.clicked.connect(self.clear_heatmap)
+        heatmapLayout.addWidget(btn_clearHeatmap)
+        heatmapLayout.addStretch()
+        tag_position_groupBoxLayout.addLayout(heatmapLayout)
         controlsLayout.addWidget(tag_position_groupBox)
 
         anchor_groupBox = QGroupBox("Anchor List: ")
@@ -201,5 +279,117 @@ class guiControls():
         anchor_groupBoxLayout.addWidget(self.lbl_anchors_col4)
         controlsLayout.addWidget(anchor_groupBox)
 
+        # Per stage timing of the samples, rates and drops of each tag
+        stats_groupBox = QGroupBox("Performance: ")
+        stats_groupBoxLayout = QVBoxLayout()
+        stats_groupBox.setLayout(stats_groupBoxLayout)
+        statsControlsLayout = QHBoxLayout()
+        chk_stats = QCheckBox("Show Stats")
+        chk_stats.setObjectName("chk_stats")
+        chk_stats.toggled.connect(self.set_stats_enabled)
+        statsControlsLayout.addWidget(chk_stats)
+        btn_exportStats = QPushButton("Export Stats")
+        btn_exportStats.setObjectName("btn_exportStats")
+        btn_exportStats.clicked.connect(self.export_stats)
+        statsControlsLayout.addWidget(btn_exportStats)
+        statsControlsLayout.addStretch()
+        stats_groupBoxLayout.addLayout(statsControlsLayout)
+        lbl_stats = QLabel("")
+        lbl_stats.setObjectName("lbl_stats")
+        lbl_stats.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont))
+        stats_groupBoxLayout.addWidget(lbl_stats)
+        controlsLayout.addWidget(stats_groupBox)
+
         controlsLayout.addStretch()
-        return controlsLayout
\ No newline at end of file
+        return controlsLayout
+
+    def CreateRowsArea(self, groupBoxLayout):
+        # Rows are added to a scrollable area, so any number of tags can be connected
+        rowsWidget = QWidget()
+        rowsLayout = QVBoxLayout(rowsWidget)
+        rowsLayout.setContentsMargins(0, 0, 0, 0)
+        rowsLayout.addStretch()
+        scrollArea = QScrollArea(self)
+        scrollArea.setWidgetResizable(True)
+        scrollArea.setFrameShape(QFrame.Shape.NoFrame)
+        scrollArea.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        scrollArea.setMinimumHeight(self.ROW_HEIGHT * self.TAG_ROWS)
+        scrollArea.setWidget(rowsWidget)
+        groupBoxLayout.addWidget(scrollArea)
+        return rowsLayout
+
+    def CreateColourDropdown(self, name, index):
+        cmb_colour = QComboBox(self)
+        colours = list(self.COLOURS)
+        colour = tag_colour(index - 1, self.COLOURS)
+        if colour not in colours:
+            colours.append(colour)
+        for row, c in enumerate(colours):
+            cmb_colour.addItem(c)
+            model = cmb_colour.model()
+            model.setData(model.index(row, 0), QtGui.QColor(c), Qt.ItemDataRole.BackgroundRole)
+        cmb_colour.setCurrentText(colour)
+        cmb_colour.currentTextChanged.connect(partial(self.UpdateQWidgetColour, QComboBox, name))
+        cmb_colour.setObjectName(name)
+        cmb_colour.setStyleSheet(f"QWidget {{background-color: {colour};}}")
+        return cmb_colour
+
+    def AddSerialRow(self):
+        self.serialRowCount += 1
+        index = self.serialRowCount
+        comPortLayout = QHBoxLayout()
+        comPortLayout.addWidget(guiControls.CreateColourDropdown(self, f"cmb_comport_colour_{index}", index))
+
+        comPort = QComboBox(self)
+        comPort.setObjectName(f"comPort_{index}")
+        comPortLayout.addWidget(comPort)
+
+        baudrate = QLineEdit(self)
+        baudrate.setText("115200")
+        baudrate.setObjectName(f"baudrate_{index}")
+        comPortLayout.addWidget(baudrate)
+
+        chk_logging = QCheckBox("Enable Logging")
+        chk_logging.setChecked(True)
+        chk_logging.setObjectName(f"chk_logging_{index}")
+        comPortLayout.addWidget(chk_logging)
+
+        btn_connect = QPushButton("Connect")
+        btn_connect.clicked.connect(partial(self.start_serial_connection, index))
+        btn_connect.setObjectName(f"btn_connect_{index}")
+        comPortLayout.addWidget(btn_connect)
+
+        btn_disconnect = QPushButton("Disconnect")
+        btn_disconnect.clicked.connect(partial(self.stop_serial_connection, index))
+        btn_disconnect.setObjectName(f"btn_disconnect_{index}")
+        btn_disconnect.setHidden(True)
+        comPortLayout.addWidget(btn_disconnect)
+        self.serialRowsLayout.insertLayout(self.serialRowsLayout.count() - 1, comPortLayout)
+        return index
+
+    def AddReplayRow(self):
+        self.replayRowCount += 1
+        index = self.replayRowCount
+        csvReplayLayout = QHBoxLayout()
+        lbl_comPort = QLabel("")
+        lbl_comPort.setObjectName(f"lbl_comPort_{index}")
+        csvReplayLayout.addWidget(lbl_comPort)
+        csvReplayLayout.addWidget(guiControls.CreateColourDropdown(self, f"cmb_colour_{index}", index))
+
+        cmb_csv = QComboBox(self)
+        cmb_csv.setObjectName(f"cmb_csv_{index}")
+        cmb_csv.setModel(self.LOGFILE_MODEL)
+        csvReplayLayout.addWidget(cmb_csv)
+
+        btn_replay = QPushButton("Replay")
+        btn_replay.clicked.connect(partial(self.start_csv_replay, index))
+        btn_replay.setObjectName(f"btn_replay_{index}")
+        csvReplayLayout.addWidget(btn_replay)
+
+        btn_stop = QPushButton("Stop")
+        btn_stop.clicked.connect(partial(self.stop_csv_replay, index))
+        btn_stop.setObjectName(f"btn_stop_{index}")
+        btn_stop.setEnabled(False)
+        csvReplayLayout.addWidget(btn_stop)
+        self.replayRowsLayout.insertLayout(self.replayRowsLayout.count() - 1, csvReplayLayout)
+        return index
\ No newline at end of file
@@ -0,0 +1,321 @@
+import os, sys, json, glob, lzma, argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from utils.logFiles import iter_log, iter_columns, open_logWriter, comPort_fromFilename, split_logName, LOG_EXTENSIONS
+from utils.multilateration import Multilateration, load_anchorSurvey
+from utils.tagFilter import TagFilter
+from utils.logIndex import read_index, load_index
+from occupancyGrid import OccupancyGrid, log_occupancy
+
+# Headless log processing, no Qt or display required. Each file is streamed row by row and the files
+#   are processed in parallel by a process pool, e.g.
+#   python "./UWB Visualiser/headless.py" summarise logs/*.csv
+#   python "./UWB Visualiser/headless.py" filter --min-qf 50 --start 10 -o processed logs/*.csv
+#   python "./UWB Visualiser/headless.py" heatmap --resolution 0.5 -o heatmap.png logs/*.csv
+APPLICATION_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def validate_log(path, options):
+    errors = {}
+    rows = 0
+    nonMonotonic = 0
+    anchorCounts = {}
+    previous = None
+    for timestamp, tagData in iter_log(path, errors):
+        rows += 1
+        if previous is not None and timestamp < previous:
+            nonMonotonic += 1
+        previous = timestamp
+        count = len(tagData.AnchorPositions)
+        anchorCounts[count] = anchorCounts.get(count, 0) + 1
+
+    comPort = comPort_fromFilename(path)
+    valid = rows > 0 and not errors and nonMonotonic == 0 and comPort is not None
+    return {"file": path, "valid": valid, "rows": rows, "malformed": errors, "nonMonotonic": nonMonotonic,
+            "anchorCounts": anchorCounts, "comPort": comPort}
+
+def summarise_log(path, options):
+    rows = 0
+    start = end = None
+    qfTotal = 0
+    qfMin = None
+    anchors = set()
+    bounds = [float("inf"), float("-inf"), float("inf"), float("-inf")]
+    for timestamp, tagData in iter_log(path):
+        rows += 1
+        start = timestamp if start is None else start
+        end = timestamp
+        qf = tagData.TagPosition.QF
+        qfTotal += qf
+        qfMin = qf if qfMin is None else min(qfMin, qf)
+        anchors.update(a.AnchorID for a in tagData.AnchorPositions)
+        bounds = [min(bounds[0], tagData.TagPosition.X), max(bounds[1], tagData.TagPosition.X),
+                  min(bounds[2], tagData.TagPosition.Y), max(bounds[3], tagData.TagPosition.Y)]
+
+    duration = (end - start) if rows else 0
+    return {"file": path, "rows": rows, "start": start, "end": end, "duration": round(duration, 3),
+            "rateHz": round((rows - 1) / duration, 2) if duration > 0 else None,
+            "qfMean": round(qfTotal / rows, 1) if rows else None, "qfMin": qfMin, "anchors": sorted(anchors),
+            "xRange": bounds[:2] if rows else None, "yRange": bounds[2:] if rows else None}
+
+def transform_log(path, options):
+    # Convert, filter and/or re-time a log, writing the rows kept to the output directory
+    name, logFormat = split_logName(path)
+    output = os.path.join(options["outputDir"], f"{name}.{options.get('format') or logFormat}")
+    if os.path.abspath(output) == os.path.abspath(path):
+        return {"file": path, "error": "output would overwrite the input"}
+
+    rows = kept = 0
+    first = None
+    try:
+        with open_logWriter(output) as writer:
+            # The rows outside the time range aren't read
+            for timestamp, tagData in iter_log(path, None, options.get("start"), options.get("end")):
+                rows += 1
+                if options.get("minQf") is not None and tagData.TagPosition.QF < options["minQf"]:
+                    continue
+                if options.get("minAnchors") is not None and len(tagData.AnchorPositions) < options["minAnchors"]:
+                    continue
+
+                # Re-time: optionally start at zero, then scale and offset
+                if first is None:
+                    first = timestamp
+                if options.get("rebase"):
+                    timestamp -= first
+                timestamp = (timestamp * options.get("scale", 1.0)) + options.get("offset", 0.0)
+                tagData.TimeStamp = str(round(max(timestamp, 0.0), 3))
+
+                writer.write_tagData(tagData)
+                kept += 1
+    except ValueError as e:
+        return {"file": path, "output": output, "error": str(e)}
+    return {"file": path, "output": output, "rows": rows, "kept": kept}
+
+def multilaterate_log(path, options):
+    # Re-solve the tag positions from the logged ranges and compare them with the device positions. The log is
+    #   solved in chunks, only the per row offsets, residuals and DOPs are kept for the medians.
+    solver = Multilateration(options.get("dimensions", 3), options.get("weighted", False), options.get("robust", False),
+                             anchorOverrides=options.get("anchors"))
+    output = None
+    if options.get("outputDir"):
+        name, logFormat = split_logName(path)
+        output = os.path.join(options["outputDir"], f"{name}.{options.get('format') or logFormat}")
+        if os.path.abspath(output) == os.path.abspath(path):
+            return {"file": path, "error": "output would overwrite the input"}
+
+    rows = 0
+    offsets, rms, dop = [], [], []
+    writer = open_logWriter(output) if output else None
+    try:
+        for columns in iter_columns(path):
+            resolved, result = solver.resolve_columns(columns)
+            rows += len(columns)
+            offsets.append(np.linalg.norm(result.TagPosition[:, :2] - columns.TagPosition[:, :2], axis=1)[result.Valid])
+            rms.append(result.RMS[result.Valid])
+            dop.append(result.DOP)
+            if writer is not None:
+                writer.write_columns(resolved)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    offset, rms, dop = (np.concatenate(values) if values else np.zeros(0) for values in (offsets, rms, dop))
+    summary = {"file": path, "rows": rows, "solved": len(offset),
+               "offsetMedian": round(float(np.median(offset)), 3) if len(offset) else None,
+               "offsetMax": round(float(np.max(offset)), 3) if len(offset) else None,
+               "rmsMedian": round(float(np.nanmedian(rms)), 3) if len(offset) else None,
+               "dopMedian": round(float(np.nanmedian(dop)), 2) if len(offset) else None}
+    if output:
+        summary["output"] = output
+    return summary
+
+def smooth_log(path, options):
+    # Kalman filter the tag positions of the log, a chunk at a time with the filter state carried between chunks
+    name, logFormat = split_logName(path)
+    output = os.path.join(options["outputDir"], f"{name}.{options.get('format') or logFormat}")
+    if os.path.abspath(output) == os.path.abspath(path):
+        return {"file": path, "error": "output would overwrite the input"}
+    rows = 0
+    tagFilter = TagFilter()
+    with open_logWriter(output) as writer:
+        for columns in iter_columns(path):
+            writer.write_columns(tagFilter.filter_log(columns, resume=rows > 0))
+            rows += len(columns)
+    return {"file": path, "output": output, "rows": rows, "kept": rows}
+
+def index_log(path, options):
+    # Build the index sidecar of a CSV log if it is missing or stale
+    if not path.endswith(".csv"):
+        return {"file": path, "rows": None, "built": False} # Binary logs are searched directly, compressed logs are read whole
+    built = read_index(path) is None
+    index = load_index(path)
+    return {"file": path, "rows": len(index), "built": built,
+            "start": float(index.timestamps[0]) if len(index) else None, "end": float(index.lower[-1]) if len(index) else None}
+
+def heatmap_log(path, options):
+    # Dwell grid of the log over the floorplan, run() sums the grids of all the logs
+    grid = log_occupancy(path, options["extent"], options["resolution"], options.get("start"), options.get("end"))
+    return {"file": path, "dwell": round(float(grid.sum()), 3), "grid": grid}
+
+def floorplan_extent(configPath):
+    # Extent (m) of the floorplan of a configuration file, as the visualiser draws it
+    from floorplanCache import FloorplanCache
+    with open(configPath, 'r') as file:
+        data = json.load(file)
+    imagePath = data['FP_IMAGE_PATH']
+    if not os.path.isabs(imagePath):
+        imagePath = os.path.join(APPLICATION_ROOT_DIR, imagePath)
+    floorplan = FloorplanCache()
+    floorplan.load(imagePath, int(data['FP_ORIGIN_X_IN_PIXELS']), int(data['FP_ORIGIN_Y_IN_PIXELS']), int(data['FP_10M_IN_PIXELS']))
+    return floorplan.extent
+
+def save_heatmap(path, grid, extent):
+    # .npy keeps the grid, .csv writes it as text (top row first) and any other extension an image
+    if path.endswith(".npy"):
+        np.save(path, grid)
+    elif path.endswith(".csv"):
+        np.savetxt(path, grid[::-1], delimiter=",", fmt="%.3f")
+    else:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from matplotlib import colors
+        fig, plot = plt.subplots(figsize=(8, 8))
+        image = plot.imshow(np.ma.masked_equal(grid, 0), extent=extent, origin="lower", cmap="inferno", norm=colors.PowerNorm(0.5), interpolation="nearest")
+        fig.colorbar(image, ax=plot, label="Dwell (s)")
+        plot.set_xlabel("X (m)")
+        plot.set_ylabel("Y (m)")
+        fig.savefig(path, dpi=150)
+        plt.close(fig)
+
+COMMANDS = {
+    "validate": validate_log,
+    "summarise": summarise_log,
+    "convert": transform_log,
+    "filter": transform_log,
+    "retime": transform_log,
+    "multilaterate": multilaterate_log,
+    "smooth": smooth_log,
+    "heatmap": heatmap_log,
+    "index": index_log,
+}
+
+def expand_files(patterns):
+    # Accept files, directories (all logs inside) and glob patterns (for shells that don't expand them)
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files += sorted(os.path.join(pattern, f) for f in os.listdir(pattern) if f.endswith(LOG_EXTENSIONS))
+        else:
+            files += sorted(glob.glob(pattern)) or [pattern]
+    return files
+
+def format_result(command, result):
+    if "error" in result:
+        return f"{result['file']}: ERROR {result['error']}"
+    if command == "validate":
+        status = "OK" if result["valid"] else "INVALID"
+        return f"{result['file']}: {status} {result['rows']} rows, malformed {result['malformed']}, out of order {result['nonMonotonic']}, anchors per row {result['anchorCounts']}, COM{result['comPort']}"
+    if command == "summarise":
+        return f"{result['file']}: {result['rows']} rows, {result['duration']} s, {result['rateHz']} Hz, QF mean {result['qfMean']} min {result['qfMin']}, anchors {','.join(result['anchors'])}, X {result['xRange']}, Y {result['yRange']}"
+    if command == "index":
+        if result["rows"] is None:
+            return f"{result['file']}: only uncompressed CSV logs are indexed"
+        return f"{result['file']}: {'indexed' if result['built'] else 'up to date'}, {result['rows']} rows, {result['start']} - {result['end']} s"
+    if command == "heatmap":
+        return f"{result['file']}: {result['dwell']} s dwell"
+    if command == "multilaterate":
+        output = f" -> {result['output']}" if "output" in result else ""
+        return f"{result['file']}{output}: solved {result['solved']}/{result['rows']} rows, offset from device median {result['offsetMedian']} m max {result['offsetMax']} m, residual RMS median {result['rmsMedian']} m, DOP median {result['dopMedian']}"
+    return f"{result['file']} -> {result['output']}: kept {result['kept']}/{result['rows']} rows"
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="Process RTLS UWB logs without the GUI.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of files processed in parallel")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("validate", help="Check logs for malformed or out of order rows").add_argument("files", nargs="+")
+    commands.add_parser("summarise", help="Rows, duration, rate, QF and anchors of each log").add_argument("files", nargs="+")
+    commands.add_parser("index", help="Build the time index sidecars of CSV logs (built on first use otherwise)").add_argument("files", nargs="+")
+
+    for name, description in [("convert", "Convert logs between CSV and binary"), ("filter", "Keep the rows matching the filters"), ("retime", "Shift and scale the timestamps"),
+                              ("smooth", "Kalman filter the tag positions, weighted by QF")]:
+        command = commands.add_parser(name, help=description)
+        command.add_argument("files", nargs="+")
+        command.add_argument("-o", "--output-dir", required=True, help="Directory the processed logs are written to")
+        command.add_argument("--format", choices=["csv", "bin"], required=(name == "convert"), help="Output log format (defaults to the input format)")
+        if name == "filter":
+            command.add_argument("--start", type=float, help="Drop rows before this time (s)")
+            command.add_argument("--end", type=float, help="Drop rows after this time (s)")
+            command.add_argument("--min-qf", type=int, help="Drop rows with a lower quality factor")
+            command.add_argument("--min-anchors", type=int, help="Drop rows using fewer anchors")
+        if name == "retime":
+            command.add_argument("--rebase", action="store_true", help="Start the log at 0 s")
+            command.add_argument("--scale", type=float, default=1.0, help="Multiply the timestamps")
+            command.add_argument("--offset", type=float, default=0.0, help="Add to the timestamps (s)")
+
+    command = commands.add_parser("multilaterate", help="Re-solve the tag positions from the anchor ranges")
+    command.add_argument("files", nargs="+")
+    command.add_argument("-o", "--output-dir", help="Write the logs with the solved positions to this directory")
+    command.add_argument("--format", choices=["csv", "bin"], help="Output log format (defaults to the input format)")
+    command.add_argument("--anchors", help="CSV file of surveyed anchor positions (ID,X,Y,Z) replacing the logged ones")
+    command.add_argument("--2d", dest="dimensions", action="store_const", const=2, default=3, help="Solve X and Y only, keeping the device Z")
+    command.add_argument("--weighted", action="store_true", help="Weight the ranges by 1/range^2")
+    command.add_argument("--robust", action="store_true", help="Downweight outlying ranges (Huber)")
+
+    command = commands.add_parser("heatmap", help="Time spent by the tags in each cell over the floorplan, summed over the logs")
+    command.add_argument("files", nargs="+")
+    command.add_argument("-o", "--output", required=True, help="Grid file (.npy or .csv) or image (.png, .svg, ...)")
+    command.add_argument("--resolution", type=float, default=OccupancyGrid.RESOLUTION, help="Cell size (m)")
+    command.add_argument("--config", default=os.path.join(APPLICATION_ROOT_DIR, "configurations", "default-config.json"),
+                         help="Configuration of the floorplan the grid covers")
+    command.add_argument("--extent", type=float, nargs=4, metavar=("LEFT", "RIGHT", "BOTTOM", "TOP"), help="Area the grid covers (m) instead of the floorplan")
+    command.add_argument("--start", type=float, help="Ignore samples before this time (s)")
+    command.add_argument("--end", type=float, help="Ignore samples after this time (s)")
+    return parser
+
+def run(args):
+    files = expand_files(args.files)
+    options = {key: value for key, value in {
+        "outputDir": getattr(args, "output_dir", None), "format": getattr(args, "format", None),
+        "start": getattr(args, "start", None), "end": getattr(args, "end", None),
+        "minQf": getattr(args, "min_qf", None), "minAnchors": getattr(args, "min_anchors", None),
+        "rebase": getattr(args, "rebase", False), "scale": getattr(args, "scale", 1.0), "offset": getattr(args, "offset", 0.0),
+        "dimensions": getattr(args, "dimensions", None), "weighted": getattr(args, "weighted", None), "robust": getattr(args, "robust", None),
+        "anchors": load_anchorSurvey(args.anchors) if getattr(args, "anchors", None) else None,
+        "resolution": getattr(args, "resolution", None),
+        "extent": (tuple(args.extent) if args.extent else floorplan_extent(args.config)) if args.command == "heatmap" else None,
+    }.items() if value is not None}
+    if options.get("outputDir"):
+        os.makedirs(options["outputDir"], exist_ok=True)
+
+    function = COMMANDS[args.command]
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(files)))) as pool:
+        futures = [pool.submit(function, path, options) for path in files]
+        for path, future in zip(files, futures):
+            try:
+                result = future.result()
+            except (OSError, ValueError, EOFError, lzma.LZMAError) as e:
+                # Unreadable, truncated or not a log (ValueError includes UnicodeDecodeError), the other files are still processed
+                result = {"file": path, "error": f"{type(e).__name__}: {e}"}
+            results.append(result)
+            if not args.json:
+                print(format_result(args.command, result))
+
+    if args.command == "heatmap":
+        # Sum the per file grids
+        grids = [result.pop("grid") for result in results if "grid" in result]
+        if grids:
+            grid = np.sum(grids, axis=0)
+            save_heatmap(args.output, grid, OccupancyGrid(options["extent"], options["resolution"]).extent)
+            if not args.json:
+                print(f"{args.output}: {len(grids)} logs, {grid.sum():.1f} s dwell, {np.count_nonzero(grid)} of {grid.size} cells visited")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    failed = any("error" in r or r.get("valid") is False for r in results)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(run(create_parser().parse_args()))
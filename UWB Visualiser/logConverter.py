@@ -0,0 +1,26 @@
+import os, sys, argparse
+from utils.binaryLog import csv_toBinary, binary_toCsv
+
+# Converts CSV logs to binary logs and back, e.g. python "./UWB Visualiser/logConverter.py" logs/*.csv
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert CSV logs to binary logs (.bin) and binary logs to CSV.")
+    parser.add_argument("files", nargs="+", help="Log files to convert, the output is written next to each file")
+    parser.add_argument("--overwrite", action="store_true", help="Replace existing output files")
+    args = parser.parse_args()
+
+    for path in args.files:
+        name, ext = os.path.splitext(path)
+        if ext == ".csv":
+            output, convert = f"{name}.bin", csv_toBinary
+        elif ext == ".bin":
+            output, convert = f"{name}.csv", binary_toCsv
+        else:
+            print(f"Skipping unknown log type: {path}")
+            continue
+
+        if os.path.exists(output) and not args.overwrite:
+            print(f"Skipping {path}, {output} already exists")
+            continue
+        rows = convert(path, output)
+        print(f"{path} -> {output} ({rows} rows, {os.path.getsize(path)} -> {os.path.getsize(output)} bytes)")
+    sys.exit(0)
@@ -0,0 +1,39 @@
+import os
+import threading
+from PyQt6.QtCore import QThread, pyqtSignal
+
+class DirectoryListing():
+    # Names of the files in a directory with one of the extensions, newest log first (the names start with the
+    #   date and time). The directory is only scanned again when its modification time changes, which adding,
+    #   removing or renaming a file does, so refreshing the dropdowns of a directory of thousands of logs is free.
+    def __init__(self, directory, extensions):
+        self.directory = directory
+        self.extensions = tuple(extensions)
+        self.mtime = None
+        self.nameList = []
+        self.lock = threading.Lock() # Scanned from the loader thread, read from the GUI thread
+
+    def names(self):
+        with self.lock:
+            try:
+                mtime = os.stat(self.directory).st_mtime_ns
+                if mtime != self.mtime:
+                    with os.scandir(self.directory) as entries:
+                        self.nameList = sorted((e.name for e in entries if e.name.endswith(self.extensions) and e.is_file()), reverse=True)
+                    self.mtime = mtime
+            except OSError as e:
+                print(f"Listing Exception: {e}")
+                self.mtime = None
+                self.nameList = []
+            return list(self.nameList)
+
+class ListingLoader(QThread):
+    # Lists a directory off the GUI thread, so the window doesn't wait for a directory of thousands of logs
+    listing_ready = pyqtSignal(list)
+
+    def __init__(self, LISTING: DirectoryListing):
+        super().__init__()
+        self.LISTING = LISTING
+
+    def run(self):
+        self.listing_ready.emit(self.LISTING.names())
@@ -1,27 +1,30 @@
-import sys, json, os
-from PyQt6.QtWidgets import QApplication, QWidget, QLabel, QLineEdit, QHBoxLayout, QComboBox, QPushButton, QCheckBox, QProgressBar, QFileDialog
-from PyQt6.QtCore import Qt, QTimer
-from serialReader import SerialReader
-import serial.tools.list_ports
+import sys, json, os, time
+from datetime import datetime
+from PyQt6.QtWidgets import QApplication, QWidget, QLabel, QLineEdit, QHBoxLayout, QComboBox, QPushButton, QCheckBox, QFileDialog
+from PyQt6.QtCore import Qt, QTimer, QStringListModel
+from serialMultiplexer import SerialMultiplexer
+from networkReceiver import NetworkReceiver
 from csvReader import CsvReader
+from binReader import BinReader
+from mergedReader import MergedReader
 from tagData import TagData
-from dataclasses import dataclass
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
-import matplotlib.pyplot as plt
 from guiControls import guiControls
-
-@dataclass(frozen=True)
-class AnchorLocation:
-    AnchorID: str
-    X: float
-    Y: float
-    Z: float
+from floorplanCache import FloorplanCache
+from portScanner import PortScanner
+from logListing import DirectoryListing, ListingLoader
+from redrawScheduler import RedrawScheduler
+from sampleQueue import SampleQueue
+from utils.tagFilter import TagFilter
+from utils.instrumentation import Instrumentation
+from utils.logWriter import LogPolicy
+from tagRegistry import TagRegistry, tag_colour
+from anchorRegistry import AnchorRegistry
+from tagTableModel import TagTableModel
+from tagTrails import TagTrails
+from occupancyGrid import OccupancyGrid
+from occupancyLoader import OccupancyLoader
 
 class RtlsUwbApplication(QWidget):
-    REDRAW_TIMER = QTimer()
-    ANCHOR_LOCATIONS = set()
-    TAGS = {}
-    TAG_COLOURS = {}
     QTHREADS = {}
 
     # Update the directory prefix to add the correct relative path, so if the script
@@ -38,24 +41,55 @@ class RtlsUwbApplication(QWidget):
     
     # APPLICATION CONFIG
     LOGFILE_DIRECTORY = DIR_PREFIX + "/logs"
+    REPLAY_EXTENSIONS = (".csv", ".bin")
     CONFIG_DIRECTORY = DIR_PREFIX + "/configurations"
-    PLOT_UPDATE_FREQUENCY_MS = 10
+    FIGURE_SIZE = 10 # Plot size (inches at 100 dpi)
+    TARGET_FPS = 30 # Maximum redraw rate, the plot is only redrawn when new tag data has arrived
+    RENDER_MODE = "blit" # "blit" updates persistent artists over a cached background, "legacy" clears and redraws the whole plot,
+                         #   "scene" draws the map with Qt's graphics scene instead of matplotlib (zoom with the wheel, drag to pan)
+    RENDER_MODES = {"Matplotlib": "blit", "Matplotlib (legacy)": "legacy", "Qt Scene": "scene"}
+    FILTER_TAGS = True # Smooth the tag positions with a Kalman filter (weighted by QF) and extrapolate them between samples
+    SHOW_TRAILS = True # Draw the recent path of each tag
+    TRAIL_LENGTH = 500 # Points kept per tag, the oldest are overwritten
+    TRAIL_DECIMATION = "distance" # Store a trail point every TRAIL_STEP meters moved ("distance") or seconds ("time")
+    TRAIL_STEP = 0.05
+    SHOW_HEATMAP = False # Draw the time the tags have spent in each cell over the floorplan
+    HEATMAP_RESOLUTION = 0.25 # Cell size (m)
+    HEATMAP_WINDOW = None # Only show the last HEATMAP_WINDOW seconds of live samples, None keeps every sample
+    HEATMAP_RESOLUTIONS = {"0.1 m": 0.1, "0.25 m": 0.25, "0.5 m": 0.5, "1 m": 1.0}
+    HEATMAP_WINDOWS = {"All": None, "1 min": 60, "10 min": 600, "1 h": 3600}
+    SHOW_COVERAGE = False # Draw the HDOP of the anchor geometry over the floorplan, tags where it is poor are flagged either way
+    COVERAGE_RESOLUTION = 0.25 # Cell size (m)
+    ANCHOR_RANGE = 30.0 # Anchors further than this (m) from a point aren't counted in its coverage
+    SHOW_STATS = False # Time every sample through the read, parse, queue and draw stages and show the stats panel at startup
+    STATS_INTERVAL = 500 # Stats panel refresh interval (ms)
     ORIGIN_COLOUR = "red"
     ANCHOR_COLOUR = "red"
-    COLOURS = ["lime", "cyan", "yellow", "orange", "mediumpurple","dodgerblue","tomato"]
+    LOG_FORMATS = ["csv", "bin"]
+    LOG_FLUSH_INTERVAL = 1.0 # Seconds between flushes of the logs, the rows written since are lost if the application crashes
+    LOG_FSYNC = False # Also fsync at every flush, so the rows survive a power loss
+    LOG_ROTATE_MB = 100 # Start a new log file when the log reaches this size, None never rotates by size
+    LOG_ROTATE_MINUTES = 60 # or has been written for this long, None never rotates by time
+    LOG_COMPRESSION = None # "gzip" or "lzma" to compress the CSV log files once they are closed
+    NETWORK_HOST = "0.0.0.0" # Address the network receiver listens on, 0.0.0.0 accepts gateways on every interface
+    NETWORK_PORT = 5005 # TCP and UDP port
+    REPLAY_SPEEDS = ["0.25x", "0.5x", "1x", "2x", "5x", "10x", "25x", "50x", "100x", "Max"]
+    COLOURS = ["lime", "cyan", "yellow", "orange", "mediumpurple","dodgerblue","tomato"] # Further tags are given generated colours
+    TAG_ROWS = 4 # Serial and replay rows shown at startup, more can be added from the GUI
+    ROW_HEIGHT = 32
 
     def reset_data(self):
         # Stop the visualisation and clear the tag/anchor data
         self.stop_timer()
-        self.ANCHOR_LOCATIONS = set()
-        self.TAGS = {}
-        self.TAG_COLOURS = {}
+        self.ANCHORS.clear()
+        self.TAGS.clear()
+        self.TAG_COLOURS.clear()
         self.QTHREADS = {}
-        self.redraw_plot()
-
-        for index in range(1, 5):
-            self.findChild(QLabel, f"lbl_tag_{index}").setText(f"Tag {index}:")
-            self.findChild(QProgressBar, f"prgbar_{index}").setValue(0)
+        self.SAMPLE_QUEUE.drain() # Discard samples queued before the reset
+        self.TAG_FILTER.reset()
+        self.TRAILS.clear()
+        self.HEATMAP.clear()
+        self.invalidate_plot()
 
     def enable_reset_btn(self):
         self.enableReset = True
@@ -64,25 +98,61 @@ class RtlsUwbApplication(QWidget):
             if thread.isRunning():
                 self.enableReset = False
                 break
+        if self.SERIAL.portCount() > 0:
+            self.enableReset = False
 
         if self.enableReset:
             self.findChild(QPushButton, f"btn_reset").setEnabled(True)
 
     def search_com_ports(self):
+        # Scan the serial COM ports on a background thread, the dropdowns are updated when the scan finishes
+        if self.PORT_SCANNER is not None:
+            return # Still scanning
+        self.findChild(QPushButton, "btn_searchComPorts").setEnabled(False)
+        self.PORT_SCANNER = PortScanner()
+        self.PORT_SCANNER.ports_found.connect(self.on_ports_found)
+        self.PORT_SCANNER.start()
+
+    def on_ports_found(self, ports):
         # Update the serial COM port dropdowns
-        for index in range(1, 5):
+        self.PORT_SCANNER.wait()
+        self.PORT_SCANNER = None
+        self.COM_PORTS = ports
+        for index in range(1, self.serialRowCount + 1):
             comPort = self.findChild(QComboBox, f"comPort_{index}")
             comPort.clear() # Removes all the items in the combobox
-            for port in serial.tools.list_ports.comports():
-                comPort.addItem(f"{port.name}")
+            comPort.addItems(ports)
+        self.findChild(QPushButton, "btn_searchComPorts").setEnabled(True)
 
     def UpdateLogfileDropdownSelection(self):
-        logfiles = [f for f in os.listdir(f"{self.LOGFILE_DIRECTORY}") if f.endswith(".csv")]
-        logfiles.sort(reverse=True)
-        for index in range(1, 5):
-            cmb = self.findChild(QComboBox, f"cmb_csv_{index}")
-            cmb.clear()
-            cmb.addItems(logfiles)
+        # List the logfile directory on a background thread, every replay dropdown shares the listing's model.
+        #   The directory is only scanned again if a log has been added or removed since the last listing.
+        if self.LISTING_LOADER is not None:
+            self.listingPending = True
+            return
+        self.listingPending = False
+        self.LISTING_LOADER = ListingLoader(self.LOGFILE_LISTING)
+        self.LISTING_LOADER.listing_ready.connect(self.on_listing_ready)
+        self.LISTING_LOADER.start()
+
+    def on_listing_ready(self, logfiles):
+        self.LISTING_LOADER.wait()
+        self.LISTING_LOADER = None
+        if logfiles != self.LOGFILE_MODEL.stringList():
+            self.LOGFILE_MODEL.setStringList(logfiles)
+        if self.listingPending:
+            self.UpdateLogfileDropdownSelection()
+
+    def startup_finished(self):
+        # True once the plot has been created and the first port scan and log listing have filled the dropdowns
+        return self.RENDERER is not None and self.PORT_SCANNER is None and self.LISTING_LOADER is None
+
+    def add_serial_row(self):
+        index = guiControls.AddSerialRow(self)
+        self.findChild(QComboBox, f"comPort_{index}").addItems(self.COM_PORTS)
+
+    def add_replay_row(self):
+        guiControls.AddReplayRow(self)
     
     def LoadConfig(self):
         config_file = self.findChild(QComboBox, f"cmb_configFile").currentText()
@@ -117,14 +187,18 @@ class RtlsUwbApplication(QWidget):
         if not os.path.isabs(self.FP_IMAGE_PATH):
             self.FP_IMAGE_PATH = os.path.join(self.APPLICATION_ROOT_DIR, self.FP_IMAGE_PATH)
 
-        self.redraw_plot()
+        self.FLOORPLAN.load(self.FP_IMAGE_PATH, self.FP_ORIGIN_X_IN_PIXELS, self.FP_ORIGIN_Y_IN_PIXELS, self.FP_10M_IN_PIXELS)
+        if self.HEATMAP.area != self.FLOORPLAN.extent:
+            self.create_heatmap()
+        self.invalidate_plot()
 
     def drawPlot(self):
-        img = plt.imread(self.FP_IMAGE_PATH)
-        height, width, channels = img.shape
-        fp_offset_x = (self.FP_ORIGIN_X_IN_PIXELS * 10) / self.FP_10M_IN_PIXELS
-        fp_offset_y = ((height-self.FP_ORIGIN_Y_IN_PIXELS) * 10) / self.FP_10M_IN_PIXELS
-        self.plot.imshow(img, extent=(-fp_offset_x, ((width * 10) / self.FP_10M_IN_PIXELS)-fp_offset_x, -fp_offset_y, ((height * 10) / self.FP_10M_IN_PIXELS)-fp_offset_y), alpha=0.6, zorder=-1)
+        # The floorplan is decoded once by the cache and downsampled to the size of the plot on screen. The view
+        #   is autoscaled to the floorplan and anything outside it, so the floorplan is at most the plot's size.
+        #   The window extent is in screen pixels of the canvas, redrawn at the new size when it is resized.
+        bbox = self.plot.get_window_extent()
+        img = self.FLOORPLAN.image(bbox.width, bbox.height)
+        self.plot.imshow(img, extent=self.FLOORPLAN.extent, alpha=0.6, zorder=-1)
         self.plot.minorticks_on()
         self.plot.grid(True, "both")
         self.plot.set_xlabel("X (m)")
@@ -135,15 +209,53 @@ class RtlsUwbApplication(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("RTLS UWB Visualiser")
+        self.REDRAW_SCHEDULER = RedrawScheduler(self.render_tick, self.TARGET_FPS)
+        self.SAMPLE_QUEUE = SampleQueue()
+        self.TAG_FILTER = TagFilter()
+        self.TAGS = TagRegistry()
+        self.ANCHORS = AnchorRegistry(self.COVERAGE_RESOLUTION, self.ANCHOR_RANGE)
+        self.anchorListVersion = None
+        self.TAG_COLOURS = {}
+        self.TAG_TABLE = TagTableModel(self.TAGS, self.TAG_COLOURS, self)
+        self.TRAILS = TagTrails(self.TRAIL_LENGTH, self.TRAIL_DECIMATION, self.TRAIL_STEP)
+        self.STATS = Instrumentation()
+        self.STATS_TIMER = QTimer(self)
+        self.STATS_TIMER.timeout.connect(self.update_stats_panel)
+
+        # All the serial ports are read by one I/O thread, connecting and disconnecting doesn't block the GUI
+        self.SERIAL = SerialMultiplexer(self.SAMPLE_QUEUE, LogPolicy(
+            flushInterval=self.LOG_FLUSH_INTERVAL,
+            fsync=self.LOG_FSYNC,
+            rotateSize=int(self.LOG_ROTATE_MB * 1024 * 1024) if self.LOG_ROTATE_MB else None,
+            rotateInterval=self.LOG_ROTATE_MINUTES * 60 if self.LOG_ROTATE_MINUTES else None,
+            compression=self.LOG_COMPRESSION))
+        self.SERIAL.samples_ready.connect(self.REDRAW_SCHEDULER.mark_dirty)
+        self.SERIAL.serial_connected.connect(self.on_serial_connected)
+        self.SERIAL.serial_disconnected.connect(self.on_serial_disconnected)
+        self.SERIAL.start()
+        self.serialRowCount = 0
+        self.replayRowCount = 0
+        self.COM_PORTS = [] # Names from the last port scan, shared by the serial dropdowns
+        self.PORT_SCANNER = None
+        self.LOGFILE_LISTING = DirectoryListing(self.LOGFILE_DIRECTORY, self.REPLAY_EXTENSIONS)
+        self.LOGFILE_MODEL = QStringListModel(self) # Shared by the replay dropdowns
+        self.LISTING_LOADER = None
+        self.listingPending = False
         mainLayout = QHBoxLayout()
-   
-        # Create figure plot
-        fig = plt.figure(figsize=(10,10))
-        self.plot = fig.add_subplot()
 
-        self.drawPlot()
-        canvas = FigureCanvasQTAgg(fig)
-        mainLayout.addWidget(canvas)
+        # The plot is created once the window has been painted, importing matplotlib and decoding the
+        #   floorplan are the slowest part of the start. The placeholder keeps the window at the plot's size.
+        self.FLOORPLAN = FloorplanCache()
+        self.create_heatmap()
+        self.HEATMAP_LOADER = None
+        self.RENDERER = None # The renderer of the RENDER_MODE, the matplotlib and scene renderers are created when first used
+        self.MAP_RENDERER = None
+        self.SCENE_RENDERER = None
+        self.plotScheduled = False
+        self.MAP_WIDGET = QLabel("Loading floorplan...")
+        self.MAP_WIDGET.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.MAP_WIDGET.setMinimumSize(self.FIGURE_SIZE * 100, self.FIGURE_SIZE * 100)
+        mainLayout.addWidget(self.MAP_WIDGET)
 
         # Add the GUI components
         controlsLayout = guiControls.CreateControlsLayout(self)
@@ -153,27 +265,85 @@ class RtlsUwbApplication(QWidget):
         # Update the GUI dropdown selection values
         self.search_com_ports() # Scans for available COM Ports
         self.UpdateLogfileDropdownSelection() # Scans the logfile directory
+        self.set_stats_enabled(self.SHOW_STATS)
+
+    def paintEvent(self, event):
+        # A timer started before the first paint runs before it, so the plot is only scheduled once painted
+        super().paintEvent(event)
+        if not self.plotScheduled:
+            self.plotScheduled = True
+            QTimer.singleShot(0, self.create_plot)
+
+    def create_plot(self):
+        self.FLOORPLAN.load(self.FP_IMAGE_PATH, self.FP_ORIGIN_X_IN_PIXELS, self.FP_ORIGIN_Y_IN_PIXELS, self.FP_10M_IN_PIXELS)
+        if self.HEATMAP.area != self.FLOORPLAN.extent:
+            self.create_heatmap()
+        self.show_renderer()
+
+    def create_figure(self):
+        # Create figure plot
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        from mapRenderer import MapRenderer
+        fig = Figure(figsize=(self.FIGURE_SIZE, self.FIGURE_SIZE))
+        self.plot = fig.add_subplot()
+        self.drawPlot()
+        self.canvas = FigureCanvasQTAgg(fig)
+        self.MAP_RENDERER = MapRenderer(self.canvas, self.plot, self.drawStaticLayers)
+
+        # Rescale the floorplan to the new plot size when the window is resized
+        self.canvas.mpl_connect("resize_event", lambda event: self.MAP_RENDERER.invalidate())
+
+    def create_scene(self):
+        from sceneRenderer import MapView, SceneRenderer
+        self.SCENE_RENDERER = SceneRenderer(MapView(self.FIGURE_SIZE * 100), self.drawSceneLayers)
+
+    def set_render_mode(self, mode):
+        self.RENDER_MODE = mode
+        if self.RENDERER is not None:
+            self.show_renderer()
+
+    def show_renderer(self):
+        # Put the widget of the RENDER_MODE's renderer in place of the current map widget. The other renderer is
+        #   kept, hidden, so switching back doesn't create it again.
+        if self.RENDER_MODE == "scene":
+            if self.SCENE_RENDERER is None:
+                self.create_scene()
+            self.RENDERER = self.SCENE_RENDERER
+            widget = self.SCENE_RENDERER.view
+        else:
+            if self.MAP_RENDERER is None:
+                self.create_figure()
+            self.RENDERER = self.MAP_RENDERER
+            widget = self.canvas
+        if widget is not self.MAP_WIDGET:
+            self.layout().replaceWidget(self.MAP_WIDGET, widget)
+            self.MAP_WIDGET.hide()
+            widget.show()
+            self.MAP_WIDGET = widget
+        self.invalidate_plot()
 
     def start_timer(self):
-        if self.REDRAW_TIMER.isActive():
-            return
-        self.REDRAW_TIMER.timeout.connect(self.redraw_plot)
-        self.REDRAW_TIMER.start(self.PLOT_UPDATE_FREQUENCY_MS)
+        self.REDRAW_SCHEDULER.start()
     
     def stop_timer(self):
-        self.REDRAW_TIMER.stop()
+        self.REDRAW_SCHEDULER.stop()
 
     def start_csv_replay(self, index):
         self.start_timer()
 
         # Read CSV Log
         fName = self.findChild(QComboBox, f"cmb_csv_{index}").currentText()       
-        self.QTHREADS.update({f"csv-{index}": CsvReader(index, f"{self.LOGFILE_DIRECTORY}/{fName}")})
-        self.QTHREADS[f"csv-{index}"].tag_data.connect(self.on_tag_data)
+        reader = BinReader if fName.endswith(".bin") else CsvReader
+        self.QTHREADS.update({f"csv-{index}": reader(index, f"{self.LOGFILE_DIRECTORY}/{fName}", self.replay_speed(), self.SAMPLE_QUEUE)})
+        if self.findChild(QPushButton, "btn_replayPause").isChecked():
+            self.QTHREADS[f"csv-{index}"].pause()
+        self.QTHREADS[f"csv-{index}"].samples_ready.connect(self.REDRAW_SCHEDULER.mark_dirty)
         self.QTHREADS[f"csv-{index}"].replay_stopped.connect(self.stop_csv_replay)
         self.QTHREADS[f"csv-{index}"].start()
 
-        comPort = fName[fName.rfind('-')+1:-4]
+        comPort = os.path.splitext(fName)[0]
+        comPort = comPort[comPort.rfind('-')+1:]
         self.findChild(QLabel, f"lbl_comPort_{index}").setText(f"COM{comPort}")
         tagColour = self.findChild(QComboBox, f"cmb_colour_{index}").currentText()
         self.TAG_COLOURS.update({f"COM{comPort}": tagColour})
@@ -197,6 +367,71 @@ class RtlsUwbApplication(QWidget):
 
         self.enable_reset_btn()
 
+    def start_merged_replay(self):
+        # Replay the selected logs merged by timestamp, all their tags driven by one clock
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select Logs", self.LOGFILE_DIRECTORY, "Logs (*.csv *.bin *.csv.gz *.csv.xz)")
+        if not paths:
+            return
+        self.start_timer()
+        self.QTHREADS.update({"csv-merged": MergedReader(0, paths, self.replay_speed(), self.SAMPLE_QUEUE)})
+        if self.findChild(QPushButton, "btn_replayPause").isChecked():
+            self.QTHREADS["csv-merged"].pause()
+        self.QTHREADS["csv-merged"].samples_ready.connect(self.REDRAW_SCHEDULER.mark_dirty)
+        self.QTHREADS["csv-merged"].replay_stopped.connect(self.stop_merged_replay)
+        self.QTHREADS["csv-merged"].start()
+
+        self.findChild(QLabel, "lbl_replayLogs").setText(f"{len(paths)} log{'' if len(paths) == 1 else 's'}")
+        self.findChild(QPushButton, "btn_replayLogs").setEnabled(False)
+        self.findChild(QPushButton, "btn_stopReplayLogs").setEnabled(True)
+        self.findChild(QPushButton, f"btn_reset").setEnabled(False)
+
+    def stop_merged_replay(self, index=0):
+        self.findChild(QLabel, "lbl_replayLogs").setText("")
+        self.findChild(QPushButton, "btn_replayLogs").setEnabled(True)
+        self.findChild(QPushButton, "btn_stopReplayLogs").setEnabled(False)
+
+        if "csv-merged" not in self.QTHREADS:
+            return
+
+        self.QTHREADS["csv-merged"].stop()
+        self.QTHREADS["csv-merged"].wait()
+
+        self.enable_reset_btn()
+
+    def replay_speed(self):
+        # Selected replay speed multiplier, 0 replays as fast as possible
+        speed = self.findChild(QComboBox, "cmb_replaySpeed").currentText()
+        if speed == "Max":
+            return 0
+        return float(speed[:-1])
+
+    def replay_threads(self):
+        return [thread for name, thread in self.QTHREADS.items() if name.startswith("csv-")]
+
+    def set_replay_speed(self):
+        speed = self.replay_speed()
+        for thread in self.replay_threads():
+            thread.set_speed(speed)
+
+    def toggle_replay_pause(self):
+        btn_replayPause = self.findChild(QPushButton, "btn_replayPause")
+        paused = btn_replayPause.isChecked()
+        btn_replayPause.setText("Resume" if paused else "Pause")
+        for thread in self.replay_threads():
+            if paused:
+                thread.pause()
+            else:
+                thread.resume()
+
+    def seek_replay(self):
+        try:
+            seekTime = float(self.findChild(QLineEdit, "replaySeekTime").text())
+        except ValueError:
+            print("Invalid seek time")
+            return
+        for thread in self.replay_threads():
+            thread.seek(seekTime)
+
     def start_serial_connection(self, index):
         self.start_timer()
         self.findChild(QComboBox, f"cmb_comport_colour_{index}").setEnabled(False)
@@ -216,19 +451,16 @@ class RtlsUwbApplication(QWidget):
         tagColour = self.findChild(QComboBox, f"cmb_comport_colour_{index}").currentText()
         self.TAG_COLOURS.update({f"{com_port.currentText()}": tagColour})
 
-        self.QTHREADS.update({f"serial-{index}": SerialReader(index, com_port.currentText(), baudrate.text(), (chk_logging.checkState() == Qt.CheckState.Checked), self.LOGFILE_DIRECTORY)})
-        self.QTHREADS[f"serial-{index}"].tag_data.connect(self.on_tag_data)
-        self.QTHREADS[f"serial-{index}"].serial_connected.connect(self.on_serial_connected)
-        self.QTHREADS[f"serial-{index}"].serial_disconnected.connect(self.on_serial_disconnected)
-        self.QTHREADS[f"serial-{index}"].start()
+        self.SERIAL.connect_port(index, com_port.currentText(), baudrate.text(), (chk_logging.checkState() == Qt.CheckState.Checked), self.LOGFILE_DIRECTORY, self.findChild(QComboBox, "cmb_logFormat").currentText())
         
     def stop_serial_connection(self, index):
-        if f"serial-{index}" not in self.QTHREADS:
-            return
-        
-        self.QTHREADS[f"serial-{index}"].stop()
+        # The port is closed by the serial thread, the controls are re-enabled when it has disconnected
+        self.findChild(QPushButton, f"btn_disconnect_{index}").setHidden(True)
+        self.SERIAL.disconnect_port(index)
+
+    def on_serial_disconnected(self, index):
+        # The port has been closed (disconnected, lost or failed to open), clean up the connection.
         self.findChild(QPushButton, f"btn_disconnect_{index}").setHidden(True)
-        self.QTHREADS[f"serial-{index}"].wait()
         self.findChild(QComboBox, f"cmb_comport_colour_{index}").setEnabled(True)
         self.findChild(QPushButton, f"btn_connect_{index}").setHidden(False)
         self.findChild(QLineEdit, f"baudrate_{index}").setEnabled(True)
@@ -240,39 +472,225 @@ class RtlsUwbApplication(QWidget):
         if self.findChild(QCheckBox, f"chk_logging_{index}").isChecked():
             self.UpdateLogfileDropdownSelection()
 
+    def start_network_receiver(self):
+        host = self.findChild(QLineEdit, "networkHost").text()
+        try:
+            port = int(self.findChild(QLineEdit, "networkPort").text())
+        except ValueError:
+            print("Invalid network port")
+            return
+        self.start_timer()
+
+        # The tags of remote gateways are given colours as they are first seen
+        self.QTHREADS.update({"network": NetworkReceiver(host, port, self.SAMPLE_QUEUE)})
+        self.QTHREADS["network"].samples_ready.connect(self.REDRAW_SCHEDULER.mark_dirty)
+        self.QTHREADS["network"].senders_changed.connect(self.on_network_senders_changed)
+        self.QTHREADS["network"].receiver_stopped.connect(self.on_network_stopped)
+        self.QTHREADS["network"].start()
+
+        self.findChild(QLineEdit, "networkHost").setEnabled(False)
+        self.findChild(QLineEdit, "networkPort").setEnabled(False)
+        self.findChild(QPushButton, "btn_listen").setHidden(True)
+        self.findChild(QPushButton, "btn_stopListening").setHidden(False)
+        self.findChild(QPushButton, f"btn_reset").setEnabled(False)
+
+    def stop_network_receiver(self):
+        # The sockets are closed by the receiver thread, the controls are re-enabled when it has stopped
+        self.findChild(QPushButton, "btn_stopListening").setHidden(True)
+        if "network" in self.QTHREADS:
+            self.QTHREADS["network"].stop()
+
+    def on_network_senders_changed(self, count):
+        self.findChild(QLabel, "lbl_networkSenders").setText(f"{count} sender{'' if count == 1 else 's'}")
+
+    def on_network_stopped(self):
+        # The receiver has stopped (or the port couldn't be opened)
+        self.QTHREADS["network"].wait()
+        self.findChild(QLineEdit, "networkHost").setEnabled(True)
+        self.findChild(QLineEdit, "networkPort").setEnabled(True)
+        self.findChild(QPushButton, "btn_listen").setHidden(False)
+        self.findChild(QPushButton, "btn_stopListening").setHidden(True)
+        self.findChild(QLabel, "lbl_networkSenders").setText("")
+        self.enable_reset_btn()
+
     def on_tag_data(self, value: TagData, comPort):
+        self.updateTagData(value, comPort)
+        if self.FILTER_TAGS:
+            self.TAG_FILTER.update_samples([(comPort, value)])
+        self.REDRAW_SCHEDULER.mark_dirty()
+
+    def updateTagData(self, value: TagData, comPort):
         # Update the GUI Data
+        if comPort not in self.TAG_COLOURS:
+            self.TAG_COLOURS[comPort] = tag_colour(len(self.TAG_COLOURS), self.COLOURS)
         self.TAGS[comPort] = value
         self.updateAnchors(value.AnchorPositions)
 
+    def render_tick(self):
+        # Apply every sample the readers queued since the last frame, then draw the latest state
+        timed = self.SAMPLE_QUEUE.timed
+        samples = self.SAMPLE_QUEUE.drain()
+        drained = time.perf_counter() if timed else 0.0
+        for comPort, value in samples:
+            self.updateTagData(value, comPort)
+        updated = time.perf_counter() if timed else 0.0
+
+        if self.FILTER_TAGS:
+            self.TAG_FILTER.update_samples(samples)
+            self.applyTagFilter()
+        if self.SHOW_TRAILS and samples:
+            # The displayed position of each tag that received samples, at the time of its latest sample
+            latest = {comPort: float(value.TimeStamp) for comPort, value in samples}
+            slots = [self.TAGS.slot(comPort) for comPort in latest]
+            self.TRAILS.update(slots, self.TAGS.positions()[slots, :2], list(latest.values()))
+        self.HEATMAP.add_samples(samples, time.monotonic())
+        filtered = time.perf_counter() if timed else 0.0
+        self.redraw_plot()
+        if timed:
+            self.STATS.record_frame(samples, drained, updated, filtered, time.perf_counter())
+
+        # Keep drawing frames while the tag positions are being extrapolated between samples
+        if self.FILTER_TAGS and self.TAG_FILTER.extrapolating():
+            self.REDRAW_SCHEDULER.mark_dirty()
+
+    def applyTagFilter(self):
+        # Replace the displayed tag positions with the filtered positions, carried forward to the current frame
+        positions = self.TAG_FILTER.positions()
+        for comPort, value in self.TAGS.items():
+            if comPort in positions:
+                self.TAGS[comPort] = self.TAG_FILTER.filtered_tagData(value, positions[comPort])
+
+    def set_trails_enabled(self, enabled):
+        # Trails restart when they are shown again
+        self.SHOW_TRAILS = enabled
+        self.TRAILS.clear()
+        self.redraw_plot()
+
+    def create_heatmap(self):
+        # The grid covers the floorplan, so it starts again when the floorplan, cell size or window changes
+        self.HEATMAP = OccupancyGrid(self.FLOORPLAN.extent, self.HEATMAP_RESOLUTION, self.HEATMAP_WINDOW)
+
+    def set_coverage_enabled(self, enabled):
+        # The coverage overlay is part of the static layers
+        self.SHOW_COVERAGE = enabled
+        self.invalidate_plot()
+
+    def set_heatmap_enabled(self, enabled):
+        # The samples are binned while the heatmap is hidden, so it shows the whole session when enabled
+        self.SHOW_HEATMAP = enabled
+        self.redraw_plot()
+
+    def set_heatmap_options(self):
+        self.HEATMAP_RESOLUTION = self.HEATMAP_RESOLUTIONS[self.findChild(QComboBox, "cmb_heatmapResolution").currentText()]
+        self.HEATMAP_WINDOW = self.HEATMAP_WINDOWS[self.findChild(QComboBox, "cmb_heatmapWindow").currentText()]
+        self.create_heatmap()
+        self.redraw_plot()
+
+    def clear_heatmap(self):
+        # Changes that aren't from samples are drawn straight away, rather than with the next heatmap update
+        self.HEATMAP.clear()
+        self.invalidate_plot()
+
+    def load_heatmap_logs(self):
+        # Add the dwell time of the selected logs to the heatmap, the logs are binned in the background
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select Logs", self.LOGFILE_DIRECTORY, "Logs (*.csv *.bin)")
+        if not paths:
+            return
+        self.findChild(QPushButton, "btn_heatmapLogs").setEnabled(False)
+        self.HEATMAP_LOADER = OccupancyLoader(paths, self.HEATMAP.area, self.HEATMAP.resolution)
+        self.HEATMAP_LOADER.grid_loaded.connect(self.on_heatmap_loaded)
+        self.HEATMAP_LOADER.start()
+
+    def on_heatmap_loaded(self, grid, count):
+        self.HEATMAP_LOADER.wait()
+        self.findChild(QPushButton, "btn_heatmapLogs").setEnabled(True)
+        if grid.shape != self.HEATMAP.total.shape:
+            print("Heatmap options changed while loading, the logs weren't added")
+            return
+        self.HEATMAP.add_grid(grid)
+        print(f"Added {count} logs ({grid.sum():.0f} s) to the heatmap")
+        self.findChild(QCheckBox, "chk_heatmap").setChecked(True)
+        self.invalidate_plot()
+
+    def set_stats_enabled(self, enabled):
+        # The readers only time the samples while the stats are shown
+        self.STATS.reset()
+        self.SAMPLE_QUEUE.timed = enabled
+        self.findChild(QCheckBox, "chk_stats").setChecked(enabled)
+        self.findChild(QLabel, "lbl_stats").setHidden(not enabled)
+        self.findChild(QPushButton, "btn_exportStats").setEnabled(enabled)
+        if enabled:
+            self.STATS_TIMER.start(self.STATS_INTERVAL)
+            self.update_stats_panel()
+        else:
+            self.STATS_TIMER.stop()
+
+    def update_stats_panel(self):
+        self.findChild(QLabel, "lbl_stats").setText(self.STATS.summary(self.SAMPLE_QUEUE.droppedTags))
+
+    def export_stats(self):
+        # Stats filename format (stats-YYYY-MM-DD-HH-MM-SS.json) in the log directory
+        path = os.path.join(self.LOGFILE_DIRECTORY, f"stats-{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.json")
+        try:
+            self.STATS.export(path, self.SAMPLE_QUEUE.droppedTags)
+            print(f"Stats exported to {path}")
+        except OSError as e:
+            print(f"Export Exception: {e}")
+
     def on_serial_connected(self, index):
         # Enable the disconnect button when serial is connected
         self.findChild(QPushButton, f"btn_disconnect_{index}").setEnabled(True)
 
-    def on_serial_disconnected(self, index):
-        # If the serial device loses connection, stop the thread and clean up the connection.
-        self.stop_serial_connection(index)
-        
+    def invalidate_plot(self):
+        # Redraw the static layers as well as the tags, e.g. after the floorplan or overlays change
+        if self.RENDERER is not None:
+            self.RENDERER.invalidate()
+        self.redraw_plot()
+
     def redraw_plot(self):
+        if self.RENDERER is None:
+            return # The plot hasn't been created yet
+        if self.RENDER_MODE != "legacy":
+            # Only the tag artists are updated, the anchor list only changes with the anchors
+            self.updateAnchorList()
+            coverage = self.ANCHORS.coverage(self.FLOORPLAN.extent)
+            self.RENDERER.render(self.TAGS, self.TAG_COLOURS, self.ANCHORS, self.TRAILS if self.SHOW_TRAILS else None,
+                                 self.HEATMAP if self.SHOW_HEATMAP else None, coverage)
+            self.TAG_TABLE.refresh(coverage)
+            return
+
         # Clear Plot
+        from mapRenderer import heatmap_image, coverage_image
         self.plot.cla()
         self.drawPlot()
+        if self.SHOW_HEATMAP:
+            heatmap_image(self.plot, self.HEATMAP)
+        coverage = self.ANCHORS.coverage(self.FLOORPLAN.extent)
+        if self.SHOW_COVERAGE and coverage is not None:
+            coverage_image(self.plot, coverage)
     
         # Add plot graphics
         self.drawAnchors()
         for comPort in self.TAGS.keys():
+            if self.SHOW_TRAILS:
+                self.drawTrail(comPort, self.TAG_COLOURS[comPort])
             self.updateTagLocation(comPort, self.TAG_COLOURS[comPort])
+        self.TAG_TABLE.refresh(coverage)
 
         # Redraw Plot
-        plt.draw()
+        self.canvas.draw()
 
     def updateAnchors(self, anchorPositions: TagData.AnchorPositions):
-        # Update list of anchor locations
-        for a in anchorPositions:
-            self.ANCHOR_LOCATIONS.add(AnchorLocation(a.AnchorID, a.X, a.Y, a.Z))
+        # Update list of anchor locations, the anchor artists are only rebuilt when the set changes
+        self.ANCHORS.update(anchorPositions)
 
     def closeEvent(self, event):
         # On window closing, disconnect all the tags (Closes all the COM ports and threads in use)
+        self.SERIAL.stop()
+        self.SERIAL.wait()
+        for loader in (self.HEATMAP_LOADER, self.PORT_SCANNER, self.LISTING_LOADER):
+            if loader is not None:
+                loader.wait()
         for thread in self.QTHREADS.values():
             try:
                 thread.stop() # Signal the QThread to stop reading serial data and close the COM port
@@ -285,24 +703,60 @@ class RtlsUwbApplication(QWidget):
     def updateTagLocation(self, comPort, colour):
         if comPort in self.TAGS:
             value = self.TAGS[comPort]
-            index = list(self.TAGS.keys()).index(comPort)
             self.drawTag(comPort, value.TagPosition.X, value.TagPosition.Y, f"TAG-{comPort}", colour)
-            self.findChild(QLabel, f"lbl_tag_{index+1}").setText(f"TAG_{comPort}: ({value.TagPosition.X}, {value.TagPosition.Y}, {value.TagPosition.Z})")
-            self.findChild(QProgressBar, f"prgbar_{index+1}").setValue(value.TagPosition.QF)
+
+    def drawTrail(self, comPort, colour):
+        points = self.TRAILS.trail(self.TAGS.slot(comPort))
+        if len(points):
+            value = self.TAGS[comPort]
+            self.plot.plot(list(points[:, 0]) + [value.TagPosition.X], list(points[:, 1]) + [value.TagPosition.Y], color=colour, linewidth=1.5, alpha=0.5)
 
     def drawTag(self, comPort, x, y, name, colour):
         self.drawTagLines(comPort, x, y)
-        circle = plt.Circle((x, y), radius=0.05, color=colour, alpha=0.6)
+        from matplotlib.patches import Circle
+        circle = Circle((x, y), radius=0.05, color=colour, alpha=0.6)
         self.plot.add_patch(circle)
         self.plot.text(x, y, f"{name}", horizontalalignment="center", verticalalignment="bottom", fontsize=6, fontweight="bold", color="black")
         self.plot.text(x, y, f"({x}, {y})", horizontalalignment="center", verticalalignment="top", fontsize=8, color="gray")
 
+    def drawStaticLayers(self):
+        # Layers that only change with the floorplan configuration or the anchor set
+        from mapRenderer import coverage_image
+        self.drawPlot()
+        coverage = self.ANCHORS.coverage(self.FLOORPLAN.extent)
+        if self.SHOW_COVERAGE and coverage is not None:
+            coverage_image(self.plot, coverage)
+        for a in self.ANCHORS:
+            self.drawAnchor(a)
+
+    def drawSceneLayers(self):
+        # The static layers of the scene renderer, the same as drawStaticLayers
+        self.SCENE_RENDERER.drawFloorplan(self.FLOORPLAN, 0.6)
+        self.SCENE_RENDERER.drawSquare(0, 0, 0.1, self.ORIGIN_COLOUR)
+        coverage = self.ANCHORS.coverage(self.FLOORPLAN.extent)
+        if self.SHOW_COVERAGE and coverage is not None:
+            self.SCENE_RENDERER.drawCoverage(coverage)
+        for a in self.ANCHORS:
+            self.SCENE_RENDERER.drawTriangle(a.X, a.Y, 0.1, self.ANCHOR_COLOUR)
+            self.SCENE_RENDERER.drawText(a.X, a.Y, f"({a.AnchorID})", 8, "black", "bottom")
+
     def drawAnchors(self):
+        for a in self.ANCHORS:
+            self.drawAnchor(a)
+        self.updateAnchorList()
+
+    def drawAnchor(self, a):
+        self.drawTriangle(a.X, a.Y, 0.1, self.ANCHOR_COLOUR)
+        self.plot.text(a.X, a.Y, f"({a.AnchorID})", horizontalalignment="center", verticalalignment="bottom", fontsize=8, color="black")
+
+    def updateAnchorList(self):
+        # The labels are only rebuilt when the anchor set has changed
+        if self.anchorListVersion == self.ANCHORS.version:
+            return
+        self.anchorListVersion = self.ANCHORS.version
         anchor_list_text = []
         numPerColumn = 3
-        for a in self.ANCHOR_LOCATIONS:
-            self.drawTriangle(a.X, a.Y, 0.1, self.ANCHOR_COLOUR)
-            self.plot.text(a.X, a.Y, f"({a.AnchorID})", horizontalalignment="center", verticalalignment="bottom", fontsize=8, color="black")
+        for a in self.ANCHORS:
             anchor_list_text.append(f"[{a.AnchorID}]({a.X}, {a.Y}, {a.Z})\n")
         self.lbl_anchors_col1.setText(''.join(anchor_list_text[:numPerColumn]))
         self.lbl_anchors_col2.setText(''.join(anchor_list_text[numPerColumn:numPerColumn*2]))
@@ -316,12 +770,14 @@ class RtlsUwbApplication(QWidget):
 
     def drawTriangle(self, x, y, size, colour: str):
         size = size / 2
-        triangle = plt.Polygon([[x + size, y - size],[x, y + size],[x - size, y - size]], color=colour)
+        from matplotlib.patches import Polygon
+        triangle = Polygon([[x + size, y - size],[x, y + size],[x - size, y - size]], color=colour)
         self.plot.add_patch(triangle)
 
     def drawSquare(self, x, y, size, colour: str):
         offset = size / 2
-        square = plt.Rectangle([x - offset, y - offset], size, size, color=colour)
+        from matplotlib.patches import Rectangle
+        square = Rectangle([x - offset, y - offset], size, size, color=colour)
         self.plot.add_patch(square)
         
 if __name__ == '__main__':
@@ -0,0 +1,257 @@
+import time
+import numpy as np
+from matplotlib import colors, colormaps
+from matplotlib.collections import LineCollection, EllipseCollection
+
+class MapRenderer():
+    # Persistent-artist renderer: the floorplan, origin and anchors are drawn once into a cached
+    #   background and only the tag artists are updated and blitted on top of it each frame.
+    #   The tags are drawn from the TagRegistry arrays, all the markers with a single collection.
+    MARGIN_M = 0.5
+    # Text is by far the slowest artist to blit, so with many tags the labels are left to the tag table.
+    #   Above DETAIL_TAG_LIMIT tags the coordinates and ranges aren't labelled, above NAME_TAG_LIMIT neither are the names.
+    DETAIL_TAG_LIMIT = 8
+    NAME_TAG_LIMIT = 16
+    HEATMAP_CMAP = "inferno"
+    HEATMAP_ALPHA = 0.5
+    HEATMAP_INTERVAL = 1.0 # Minimum time (s) between heatmap updates, drawing the image is as slow as many tags
+    COVERAGE_CMAP = "RdYlGn_r"
+    COVERAGE_ALPHA = 0.35
+    COVERAGE_MAX_DOP = 5.0
+    POOR_COVERAGE_COLOUR = "red" # Outline of the tags in poorly covered areas
+
+    def __init__(self, canvas, plot, drawStatic):
+        self.canvas = canvas
+        self.plot = plot
+        self.drawStatic = drawStatic # Callback drawing the static layers (floorplan, origin, anchors)
+        self.background = None
+        self.anchorVersion = None
+        self.tagKey = None
+        self.tagMarkers = None
+        self.rangeLines = None
+        self.trailLines = []
+        self.trails = None
+        self.heatmap = None
+        self.coverage = None
+        self.heatmapImage = None
+        self.heatmapVersion = None
+        self.heatmapBackground = None # The background with the heatmap drawn over it
+        self.heatmapTime = 0.0
+        self.nameTexts = []
+        self.coordTexts = []
+        self.rangeTexts = []
+        self.detailed = True
+        self.named = True
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+    def invalidate(self):
+        # Force the static layers to be rebuilt on the next frame (config change, reset, etc.)
+        self.background = None
+        self.anchorVersion = None
+
+    def render(self, tags, tagColours, anchors, trails=None, heatmap=None, coverage=None):
+        # trails is the TagTrails to draw behind the tags and heatmap the OccupancyGrid to draw over the floorplan,
+        #   None to hide them. The tags in the cells of the CoverageGrid that are poorly covered are outlined.
+        #   The static layers are only rebuilt when the AnchorRegistry version changes.
+        self.trails = trails
+        self.heatmap = heatmap
+        self.coverage = coverage
+        if self.background is None or anchors.version != self.anchorVersion or self.outsideView(tags) or self.heatmapMissing():
+            self.anchorVersion = anchors.version
+            self.rebuild(tags, tagColours)
+            return
+
+        # Restore the cached background and draw only the tag artists over it
+        self.restoreBackground()
+        self.updateTagArtists(tags, tagColours)
+        self.drawTagArtists()
+        self.canvas.blit(self.plot.figure.bbox)
+
+    def rebuild(self, tags, tagColours):
+        # Clear the axes and redraw the static layers, a full draw recaptures the background
+        self.removeTagArtists()
+        self.plot.cla()
+        self.heatmapImage = None
+        self.drawStatic()
+        self.updateHeatmap()
+        self.updateTagArtists(tags, tagColours)
+        self.fitView(tags)
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        # Called after every full draw (including window resizes), cache the background without the tags
+        self.background = self.canvas.copy_from_bbox(self.plot.figure.bbox)
+        self.heatmapBackground = None
+        self.drawHeatmap()
+        self.drawTagArtists()
+
+    def fitView(self, tags):
+        # Blitted artists don't autoscale the axes, so include the tag positions in the view limits
+        if len(tags):
+            positions = tags.positions()[:, :2]
+            self.plot.update_datalim(np.concatenate([positions - self.MARGIN_M, positions + self.MARGIN_M]))
+        self.plot.autoscale_view()
+
+    def outsideView(self, tags):
+        if not len(tags):
+            return False
+        x0, x1 = self.plot.get_xlim()
+        y0, y1 = self.plot.get_ylim()
+        positions = tags.positions()
+        return bool(np.any((positions[:, 0] < x0) | (positions[:, 0] > x1) | (positions[:, 1] < y0) | (positions[:, 1] > y1)))
+
+    def heatmapMissing(self):
+        # The heatmap image is created with the static layers, as it extends the data limits of the axes
+        if self.heatmap is None:
+            return False
+        return self.heatmapImage is None or self.heatmapImage.axes is None or tuple(self.heatmapImage.get_extent()) != tuple(self.heatmap.extent)
+
+    def heatmapShown(self):
+        return self.heatmap is not None and self.heatmapImage is not None and self.heatmapImage.axes is not None
+
+    def restoreBackground(self):
+        # The heatmap is animated, but only redrawn over the background when the grid has changed and at most
+        #   every HEATMAP_INTERVAL, in between the background with the heatmap drawn over it is restored
+        if not self.heatmapShown():
+            self.heatmapBackground = None
+        elif self.heatmapBackground is not None and (self.heatmapVersion == self.heatmap.version or time.monotonic() - self.heatmapTime < self.HEATMAP_INTERVAL):
+            self.canvas.restore_region(self.heatmapBackground)
+            return
+        self.canvas.restore_region(self.background)
+        self.drawHeatmap()
+
+    def drawHeatmap(self):
+        if not self.heatmapShown():
+            return
+        self.updateHeatmap()
+        self.plot.draw_artist(self.heatmapImage)
+        self.heatmapBackground = self.canvas.copy_from_bbox(self.plot.figure.bbox)
+        self.heatmapTime = time.monotonic()
+
+    def updateHeatmap(self):
+        # Replace the image data when the grid has changed
+        if self.heatmap is None:
+            if self.heatmapImage is not None:
+                self.heatmapImage.set_visible(False)
+            return
+        if self.heatmapMissing():
+            self.heatmapImage = heatmap_image(self.plot, self.heatmap, animated=True)
+            self.heatmapVersion = self.heatmap.version
+        elif self.heatmapVersion != self.heatmap.version:
+            set_heatmap_data(self.heatmapImage, self.heatmap.grid())
+            self.heatmapVersion = self.heatmap.version
+        self.heatmapImage.set_visible(True)
+
+    def artistKey(self, tags, tagColours):
+        # The tag artists are recreated when the tags, their colours or the trail visibility change
+        return (tuple(tags.comPorts), tuple(tagColours.get(c) for c in tags.comPorts), self.trails is not None)
+
+    def createTagArtists(self, tags, tagColours):
+        # One collection holds the markers of every tag and one the range lines, only the labels and trails are per tag
+        self.removeTagArtists()
+        n = len(tags)
+        self.tagKey = self.artistKey(tags, tagColours)
+        if self.trails is not None:
+            self.trailLines = [LineCollection([], colors=tagColours.get(c, "gray"), linewidths=1.5, alpha=0.5, animated=True) for c in tags.comPorts]
+            for line in self.trailLines:
+                self.plot.add_collection(line, autolim=False)
+        self.tagMarkers = EllipseCollection(np.full(n, 0.1), np.full(n, 0.1), np.zeros(n), units="xy", offsets=np.zeros((n, 2)),
+                                            offset_transform=self.plot.transData, facecolors=[tagColours.get(c, "gray") for c in tags.comPorts], linewidths=2, alpha=0.6, animated=True)
+        self.rangeLines = LineCollection([], colors="green", linestyles="--", linewidths=1, alpha=0.2, animated=True)
+        self.plot.add_collection(self.rangeLines, autolim=False)
+        self.plot.add_collection(self.tagMarkers, autolim=False)
+        self.nameTexts = [self.plot.text(0, 0, f"TAG-{comPort}", horizontalalignment="center", verticalalignment="bottom", fontsize=6, fontweight="bold", color="black", animated=True) for comPort in tags.comPorts]
+        self.coordTexts = [self.plot.text(0, 0, "", horizontalalignment="center", verticalalignment="top", fontsize=8, color="gray", animated=True) for comPort in tags.comPorts]
+
+    def updateTagArtists(self, tags, tagColours):
+        if self.tagKey != self.artistKey(tags, tagColours):
+            self.createTagArtists(tags, tagColours)
+
+        positions = tags.positions()
+        self.tagMarkers.set_offsets(positions[:, :2])
+        poor = self.coverage.poor(positions[:, :2]) if self.coverage is not None else np.zeros(len(positions), dtype=bool)
+        self.tagMarkers.set_edgecolors(np.where(poor[:, None], colors.to_rgba(self.POOR_COVERAGE_COLOUR), (0.0, 0.0, 0.0, 0.0)))
+        for slot, line in enumerate(self.trailLines):
+            # The trail ends at the marker, which may have moved less than a step from the last stored point
+            points = self.trails.trail(slot)
+            line.set_segments([np.vstack([points, positions[slot, :2]])] if len(points) else [])
+        self.named = len(tags) <= self.NAME_TAG_LIMIT
+        self.detailed = len(tags) <= self.DETAIL_TAG_LIMIT
+        if self.named:
+            for text, (x, y) in zip(self.nameTexts, positions[:, :2].tolist()):
+                text.set_position((x, y))
+
+        segments = []
+        rangeLabels = []
+        for slot, value in enumerate(tags.tagData):
+            x, y = positions[slot, 0], positions[slot, 1]
+            for a in value.AnchorPositions:
+                segments.append([(a.X, a.Y), (x, y)])
+                if self.detailed:
+                    rangeLabels.append(((a.X + x) / 2, (a.Y + y) / 2, f"{a.MetersFromTag}"))
+            if self.detailed:
+                self.coordTexts[slot].set_position((x, y))
+                self.coordTexts[slot].set_text(f"({value.TagPosition.X}, {value.TagPosition.Y})")
+        self.rangeLines.set_segments(segments)
+
+        while len(self.rangeTexts) < len(rangeLabels):
+            self.rangeTexts.append(self.plot.text(0, 0, "", fontsize=8, color="gray", animated=True))
+        for index, text in enumerate(self.rangeTexts):
+            if index < len(rangeLabels):
+                x, y, label = rangeLabels[index]
+                text.set_position((x, y))
+                text.set_text(label)
+                text.set_visible(True)
+            else:
+                text.set_visible(False)
+
+    def removeTagArtists(self):
+        for artist in [self.tagMarkers, self.rangeLines] + self.trailLines + self.nameTexts + self.coordTexts + self.rangeTexts:
+            if artist is not None and artist.axes is not None:
+                artist.remove()
+        self.tagKey = None
+        self.tagMarkers = None
+        self.rangeLines = None
+        self.trailLines = []
+        self.nameTexts = []
+        self.coordTexts = []
+        self.rangeTexts = []
+
+    def drawTagArtists(self):
+        # Nothing to draw before the first frame, or once the legacy mode has cleared the axes
+        if self.tagMarkers is None or self.tagMarkers.axes is None:
+            return
+        for line in self.trailLines:
+            self.plot.draw_artist(line)
+        self.plot.draw_artist(self.rangeLines)
+        for text in self.rangeTexts:
+            if text.get_visible():
+                self.plot.draw_artist(text)
+        self.plot.draw_artist(self.tagMarkers)
+        if self.named:
+            for text in self.nameTexts:
+                self.plot.draw_artist(text)
+        if self.detailed:
+            for text in self.coordTexts:
+                self.plot.draw_artist(text)
+
+def heatmap_image(plot, heatmap, animated=False):
+    # Dwell grid drawn over its extent with empty cells transparent. The square root scale keeps the cells
+    #   a tag has passed through visible next to the cells it has stood in.
+    cmap = colormaps[MapRenderer.HEATMAP_CMAP].with_extremes(bad=(0, 0, 0, 0))
+    image = plot.imshow(np.zeros((1, 1)), extent=heatmap.extent, origin="lower", cmap=cmap, norm=colors.PowerNorm(0.5),
+                        alpha=MapRenderer.HEATMAP_ALPHA, interpolation="nearest", zorder=0, animated=animated)
+    set_heatmap_data(image, heatmap.grid())
+    return image
+
+def coverage_image(plot, coverage):
+    # HDOP of the anchor geometry from green (1) to red (COVERAGE_MAX_DOP and above), the cells with too few
+    #   anchors in range are grey. Drawn once with the static layers.
+    cmap = colormaps[MapRenderer.COVERAGE_CMAP].with_extremes(bad=(0.5, 0.5, 0.5, 0.5))
+    return plot.imshow(np.ma.masked_invalid(coverage.dop), extent=coverage.extent, origin="lower", cmap=cmap,
+                       norm=colors.Normalize(1.0, MapRenderer.COVERAGE_MAX_DOP, clip=True), alpha=MapRenderer.COVERAGE_ALPHA,
+                       interpolation="nearest", zorder=0)
+
+def set_heatmap_data(image, grid):
+    image.set_data(np.ma.masked_equal(grid, 0))
+    image.set_clim(0, max(float(grid.max()), 1e-9))
@@ -0,0 +1,91 @@
+import os
+import heapq
+from csvReader import CsvReader
+from utils.logFiles import iter_log, comPort_fromFilename, split_logName
+
+class MergedReader(CsvReader):
+    # Replays any number of logs (CSV, binary or compressed) as one stream, merging their rows by timestamp
+    #   so every tag is driven by the same clock and the shared speed, pause and seek controls. The logs are
+    #   read lazily with iter_log and the merge only holds the next row of each log, so the memory used
+    #   doesn't grow with the number or length of the logs.
+    def __init__(self, INDEX, LOG_FILES, SPEED=1.0, SAMPLE_QUEUE=None):
+        super().__init__(INDEX, None, SPEED, SAMPLE_QUEUE)
+        self.LOG_FILES = LOG_FILES
+        self.tagNames = {} # Log file -> name of its tag
+        self.logs = [] # Row iterators of the open logs
+        self.errors = {}
+
+    def run(self):
+        paths = []
+        for path in self.LOG_FILES:
+            if not os.path.exists(path):
+                print(f"File not found: {path}")
+                continue
+            paths.append(path)
+        self.tagNames = tag_names(paths)
+
+        rows = self.open_log()
+        try:
+            while self.running:
+                seekTime = self.take_seek()
+                if seekTime is not None:
+                    rows = self.open_log(seekTime)
+                    with self.condition:
+                        self.clock.set(seekTime)
+                        self.showSeekedRow = self.clock.paused
+
+                row = next(rows, None)
+                if row is None:
+                    break
+                timestamp, tagName, tagData = row
+
+                # Wait for the row's timestamp, a seek or stop discards the row
+                if not self.wait_for(timestamp):
+                    continue
+
+                self.send_tag_data(tagData, tagName)
+        except (OSError, ValueError) as e:
+            print(f"Replay Exception: {e}")
+        finally:
+            self.close_logs()
+
+        if self.errors:
+            print(f"Skipped malformed rows: {', '.join(f'{error} x{count}' for error, count in self.errors.items())}")
+
+        # Signal the end of the logs has been reached
+        self.replay_stopped.emit(self.INDEX)
+
+    def open_log(self, seekTime=None):
+        # Rows of every log from the seek time, merged by timestamp. Rows with the same timestamp keep the
+        #   order of the logs.
+        self.close_logs()
+        self.logs = [iter_log(path, self.errors, start=seekTime) for path in self.tagNames]
+        return heapq.merge(*[tagged_rows(log, tagName) for log, tagName in zip(self.logs, self.tagNames.values())], key=lambda row: row[0])
+
+    def close_logs(self):
+        # Closing the row generators closes their files
+        for log in self.logs:
+            log.close()
+        self.logs = []
+
+def tagged_rows(log, tagName):
+    # (timestamp, tag name, TagData) of the (timestamp, TagData) rows of a log
+    for timestamp, tagData in log:
+        yield timestamp, tagName, tagData
+
+def tag_names(paths):
+    # Name of the tag of each log, COM<port> from the filename like a single log replay. Logs of the same port
+    #   (e.g. two sessions) are numbered so their tags are drawn separately.
+    names = {}
+    used = set()
+    for path in paths:
+        comPort = comPort_fromFilename(path)
+        name = f"COM{comPort}" if comPort is not None else split_logName(path)[0]
+        unique = name
+        count = 1
+        while unique in used:
+            count += 1
+            unique = f"{name} ({count})"
+        used.add(unique)
+        names[path] = unique
+    return names
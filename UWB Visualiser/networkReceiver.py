@@ -0,0 +1,241 @@
+import time
+import socket
+import selectors
+from PyQt6.QtCore import QThread, pyqtSignal
+from tagData import TagData
+from utils.tagDataUtils import TagDataUtils
+from utils.dwmParser import DwmParser, take_lines
+
+class NetworkSender():
+    # One TCP connection or UDP source address. Senders name their tag with a "TAG,<name>" line,
+    #   until then the lines are attributed to the address of the sender.
+    MAX_LINE = 65536 # A sender that goes this long without a newline isn't sending lines
+
+    def __init__(self, address, sock=None):
+        self.address = address
+        self.sock = sock # None for UDP, the datagrams are read from the shared socket
+        self.name = f"{address[0]}:{address[1]}"
+        self.parser = DwmParser()
+        self.buffer = bytearray()
+
+    def lines(self):
+        return take_lines(self.buffer)
+
+    def parse(self, line: bytes, timestamp):
+        # TagData of a DWM1001 location line or a CSV log row, None for anything else
+        if line.startswith(b"TAG,"):
+            self.name = line[4:].strip().decode("utf-8", errors="replace") or self.name
+            return None
+        if not line[:1].isdigit():
+            return self.parser.parse(line, timestamp)
+
+        # CSV rows carry their own timestamp
+        self.parser.lines += 1
+        try:
+            tagData = TagDataUtils.csv_toTagData(self, line.decode("ascii").strip().split(','))
+        except (ValueError, IndexError, UnicodeDecodeError):
+            return self.parser.reject("csv row")
+        self.parser.parsed += 1
+        return tagData
+
+class NetworkReceiver(QThread):
+    # Receives the tag lines of remote gateways over TCP and UDP on the same port, from any number of
+    #   senders at once. Lines are either the DWM1001 "DIST...POS" lines (e.g. from serialForwarder.py)
+    #   or CSV log rows. While the GUI has a backlog of samples the sockets aren't read, so TCP senders
+    #   are slowed down by their send buffers filling and excess UDP datagrams are dropped by the OS.
+    tag_data = pyqtSignal(TagData, str)
+    senders_changed = pyqtSignal(int)
+    receiver_stopped = pyqtSignal()
+    samples_ready = pyqtSignal()
+    READ_SIZE = 65536
+    IDLE_TIMEOUT = 0.5
+    PAUSE_TIME = 0.01   # Wait between checks of the backlog while paused (s)
+    HIGH_WATER = 0.5    # Pause reading while the sample queue is fuller than this
+    UDP_TIMEOUT = 30.0  # Forget UDP senders that have been silent this long (s)
+
+    def __init__(self, HOST, PORT, SAMPLE_QUEUE=None):
+        super().__init__()
+        self.HOST = HOST
+        self.PORT = PORT
+        self.SAMPLE_QUEUE = SAMPLE_QUEUE
+        self.running = False
+        self.paused = False
+        self.listener = None
+        self.udp = None
+        self.senders = {}    # TCP socket -> NetworkSender
+        self.udpSenders = {} # address -> NetworkSender
+        self.lastSeen = {}   # address -> time.monotonic() of the last UDP datagram
+        self.startTimes = {} # Tag name -> time.monotonic() of its first line, kept across reconnects
+
+        # Writing to the socket pair wakes the selector when the receiver is stopped
+        self.selector = selectors.DefaultSelector()
+        self.wakeReader, self.wakeWriter = socket.socketpair()
+        self.wakeReader.setblocking(False)
+        self.wakeWriter.setblocking(False)
+        self.selector.register(self.wakeReader, selectors.EVENT_READ, None)
+
+    def stop(self):
+        self.running = False
+        try:
+            self.wakeWriter.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass # Already woken
+
+    def senderCount(self):
+        return len(self.senders) + len(self.udpSenders)
+
+    def run(self):
+        self.running = True
+        try:
+            self.open_sockets()
+            print(f"Listening on {self.HOST}:{self.PORT} (TCP and UDP)")
+        except OSError as e:
+            # The port is in use or the address isn't local
+            print(f"Network Exception: {e}")
+            self.running = False
+
+        while self.running:
+            # Stop reading while the GUI catches up
+            backlogged = self.backlogged()
+            if backlogged != self.paused:
+                self.set_paused(backlogged)
+
+            for key, _ in self.selector.select(self.PAUSE_TIME if self.paused else self.IDLE_TIMEOUT):
+                now = time.monotonic()
+                if key.data is None:
+                    continue # Woken by stop()
+                elif key.data == "accept":
+                    self.accept(now)
+                elif key.data == "udp":
+                    self.read_udp(now)
+                else:
+                    self.read_tcp(key.data, now)
+            self.forget_udp_senders(time.monotonic())
+
+        self.close_sockets()
+        self.receiver_stopped.emit()
+
+    def open_sockets(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.HOST, self.PORT))
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ, "accept")
+
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.bind((self.HOST, self.PORT))
+        self.udp.setblocking(False)
+        self.selector.register(self.udp, selectors.EVENT_READ, "udp")
+
+    def close_sockets(self):
+        for sender in list(self.senders.values()):
+            self.close_sender(sender)
+        for sender in self.udpSenders.values():
+            print(f"UDP sender {sender.name} ({sender.address[0]}:{sender.address[1]}) stopped... {sender.parser.summary()}")
+        self.udpSenders = {}
+        for sock in (self.listener, self.udp):
+            if sock is not None:
+                sock.close()
+        self.selector.close()
+        self.wakeReader.close()
+        self.wakeWriter.close()
+
+    def backlogged(self):
+        if self.SAMPLE_QUEUE is None:
+            return False
+        return len(self.SAMPLE_QUEUE.samples) > self.SAMPLE_QUEUE.samples.maxlen * self.HIGH_WATER
+
+    def set_paused(self, paused):
+        # The data sockets are removed from the selector while paused, new connections are still accepted
+        self.paused = paused
+        socks = list(self.senders.keys()) + ([self.udp] if self.udp is not None else [])
+        for sock in socks:
+            if paused:
+                self.selector.unregister(sock)
+            else:
+                self.selector.register(sock, selectors.EVENT_READ, "udp" if sock is self.udp else self.senders[sock])
+
+    def accept(self, now):
+        try:
+            sock, address = self.listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        sender = NetworkSender(address, sock)
+        self.senders[sock] = sender
+        if not self.paused:
+            self.selector.register(sock, selectors.EVENT_READ, sender)
+        print(f"TCP sender connected from {address[0]}:{address[1]}")
+        self.senders_changed.emit(self.senderCount())
+
+    def read_tcp(self, sender: NetworkSender, now):
+        try:
+            data = sender.sock.recv(self.READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            print(f"Network Exception: {e}")
+            data = b""
+        if not data:
+            # The sender disconnected, a partial last line is dropped
+            self.close_sender(sender)
+            return
+        sender.buffer += data
+        self.handle_lines(sender, now)
+
+    def read_udp(self, now):
+        # Each datagram holds whole lines, the last newline is optional
+        while not self.backlogged():
+            try:
+                data, address = self.udp.recvfrom(self.READ_SIZE)
+            except (BlockingIOError, OSError):
+                return
+            sender = self.udpSenders.get(address)
+            if sender is None:
+                sender = self.udpSenders[address] = NetworkSender(address)
+                self.senders_changed.emit(self.senderCount())
+            self.lastSeen[address] = now
+            sender.buffer += data
+            if not data.endswith(b'\n'):
+                sender.buffer += b'\n'
+            self.handle_lines(sender, now)
+
+    def handle_lines(self, sender: NetworkSender, now):
+        timed = self.SAMPLE_QUEUE is not None and self.SAMPLE_QUEUE.timed
+        readTime = time.perf_counter() if timed else 0.0
+        for line in sender.lines():
+            tagData = sender.parse(line, round(now - self.startTimes.setdefault(sender.name, now), 3))
+            if tagData is None:
+                continue
+            if timed:
+                tagData.Timing = (readTime, time.perf_counter())
+            self.send_tag_data(tagData, sender.name)
+        if len(sender.buffer) > sender.MAX_LINE:
+            sender.parser.reject("line length")
+            sender.buffer.clear()
+
+    def forget_udp_senders(self, now):
+        silent = [address for address, seen in self.lastSeen.items() if now - seen > self.UDP_TIMEOUT]
+        for address in silent:
+            sender = self.udpSenders.pop(address)
+            del self.lastSeen[address]
+            print(f"UDP sender {sender.name} ({address[0]}:{address[1]}) stopped... {sender.parser.summary()}")
+        if silent:
+            self.senders_changed.emit(self.senderCount())
+
+    def close_sender(self, sender: NetworkSender):
+        if self.senders.pop(sender.sock, None) is None:
+            return
+        if not self.paused:
+            self.selector.unregister(sender.sock)
+        sender.sock.close()
+        print(f"TCP sender {sender.name} ({sender.address[0]}:{sender.address[1]}) disconnected... {sender.parser.summary()}")
+        self.senders_changed.emit(self.senderCount())
+
+    def send_tag_data(self, td: TagData, name):
+        # Without a sample queue every sample is sent as its own signal
+        if self.SAMPLE_QUEUE is None:
+            self.tag_data.emit(td, name)
+        elif self.SAMPLE_QUEUE.put(name, td):
+            self.samples_ready.emit()
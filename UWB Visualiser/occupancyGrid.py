@@ -0,0 +1,122 @@
+import os
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from utils.logFiles import load_columns
+
+class OccupancyGrid():
+    # Time spent by the tags in each cell of a grid over the floorplan extent (meters). Each sample adds the
+    #   time since the previous sample of its tag (up to MAX_DWELL, so gaps in the data don't count as dwell)
+    #   to the cell its TagPosition falls in, which is O(1) per sample however long the session runs.
+    #   With a window (s) only the last window of wall clock time is kept: the samples are added to one of
+    #   BUCKETS sub-grids and the oldest sub-grid is subtracted from the total as the window rolls.
+    #   Grids built from logs are added to a separate base grid, which the window doesn't apply to.
+    RESOLUTION = 0.25   # Cell size (m)
+    MAX_DWELL = 1.0     # (s)
+    BUCKETS = 10
+
+    def __init__(self, extent, resolution=RESOLUTION, window=None):
+        left, right, bottom, top = extent
+        self.area = tuple(extent) # Extent requested, the grid extent is rounded up to whole cells
+        self.resolution = resolution
+        self.window = window
+        self.nx = max(1, math.ceil((right - left) / resolution))
+        self.ny = max(1, math.ceil((top - bottom) / resolution))
+        self.extent = (left, left + (self.nx * resolution), bottom, bottom + (self.ny * resolution))
+        self.buckets = np.zeros((self.BUCKETS if window else 1, self.ny, self.nx))
+        self.clear()
+
+    def clear(self):
+        self.buckets[:] = 0
+        self.total = np.zeros((self.ny, self.nx))   # Sum of the buckets
+        self.base = np.zeros((self.ny, self.nx))    # Dwell added from logs
+        self.bucket = 0
+        self.bucketStart = None
+        self.lastTimes = {}                         # Tag -> timestamp of its last sample
+        self.version = 0                            # Incremented on every change, so the display only updates when needed
+
+    def roll(self, now):
+        if self.window is None:
+            return
+        if self.bucketStart is None:
+            self.bucketStart = now
+            return
+        bucketLength = self.window / len(self.buckets)
+        if now - self.bucketStart >= self.window + bucketLength:
+            # Nothing has been added for longer than the window
+            self.clearLive()
+            self.bucketStart = now
+            return
+        while now - self.bucketStart >= bucketLength:
+            self.bucket = (self.bucket + 1) % len(self.buckets)
+            self.total -= self.buckets[self.bucket]
+            self.buckets[self.bucket] = 0
+            self.bucketStart += bucketLength
+            self.version += 1
+
+    def clearLive(self):
+        self.buckets[:] = 0
+        self.total[:] = 0
+        self.version += 1
+
+    def cells(self, x, y):
+        # Flat cell index of each position, -1 outside the grid
+        ix = np.floor((np.asarray(x, dtype=np.float64) - self.extent[0]) / self.resolution)
+        iy = np.floor((np.asarray(y, dtype=np.float64) - self.extent[2]) / self.resolution)
+        inside = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        return np.where(inside, (iy * self.nx) + ix, -1).astype(np.int64)
+
+    def add_samples(self, samples, now):
+        # Add the (tag, TagData) samples drained by a frame, now is the wall clock time (s) for the window
+        self.roll(now)
+        if not samples:
+            return
+        dwell = np.zeros(len(samples))
+        for i, (tag, td) in enumerate(samples):
+            timestamp = float(td.TimeStamp)
+            last = self.lastTimes.get(tag)
+            self.lastTimes[tag] = timestamp
+            if last is not None and timestamp > last:
+                dwell[i] = min(timestamp - last, self.MAX_DWELL)
+        cells = self.cells([td.TagPosition.X for _, td in samples], [td.TagPosition.Y for _, td in samples])
+        keep = (cells >= 0) & (dwell > 0)
+        if not keep.any():
+            return
+        np.add.at(self.buckets[self.bucket].reshape(-1), cells[keep], dwell[keep])
+        np.add.at(self.total.reshape(-1), cells[keep], dwell[keep])
+        self.version += 1
+
+    def add_grid(self, grid):
+        # Add a grid of the same shape (from the logs) to the base
+        self.base += grid
+        self.version += 1
+
+    def grid(self):
+        # (ny, nx) dwell time (s) of every cell, row 0 at the bottom of the extent
+        return self.base + self.total
+
+def log_occupancy(path, extent, resolution=OccupancyGrid.RESOLUTION, start=None, end=None):
+    # Dwell grid of one log, only counting the samples from start to end (s) if given
+    columns = load_columns(path, start, end)
+    occupancy = OccupancyGrid(extent, resolution)
+    timestamps = columns.TimeStamp.astype(np.float64)
+    dwell = np.minimum(np.maximum(np.diff(timestamps, prepend=timestamps[:1]), 0.0), occupancy.MAX_DWELL)
+    cells = occupancy.cells(columns.TagPosition[:, 0], columns.TagPosition[:, 1])
+    keep = (cells >= 0) & (dwell > 0)
+    grid = np.bincount(cells[keep], weights=dwell[keep], minlength=occupancy.nx * occupancy.ny)
+    return grid.reshape(occupancy.ny, occupancy.nx)
+
+def logs_occupancy(paths, extent, resolution=OccupancyGrid.RESOLUTION, start=None, end=None, jobs=None):
+    # Dwell grid of a set of logs, built per file in parallel and summed
+    occupancy = OccupancyGrid(extent, resolution)
+    grid = np.zeros((occupancy.ny, occupancy.nx))
+    if not paths:
+        return grid
+    with ProcessPoolExecutor(max_workers=max(1, min(jobs or os.cpu_count(), len(paths)))) as pool:
+        futures = [pool.submit(log_occupancy, path, extent, resolution, start, end) for path in paths]
+        for path, future in zip(paths, futures):
+            try:
+                grid += future.result()
+            except (OSError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+    return grid
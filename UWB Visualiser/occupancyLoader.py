@@ -0,0 +1,19 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+from occupancyGrid import logs_occupancy
+
+class OccupancyLoader(QThread):
+    # Builds the dwell grid of a set of logs off the GUI thread, the logs are binned in parallel processes
+    grid_loaded = pyqtSignal(object, int)
+
+    def __init__(self, PATHS, EXTENT, RESOLUTION, START=None, END=None):
+        super().__init__()
+        self.PATHS = PATHS
+        self.EXTENT = EXTENT
+        self.RESOLUTION = RESOLUTION
+        self.START = START
+        self.END = END
+
+    def run(self):
+        grid = logs_occupancy(self.PATHS, self.EXTENT, self.RESOLUTION, self.START, self.END)
+        self.grid_loaded.emit(grid, len(self.PATHS))
+
@@ -0,0 +1,15 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+class PortScanner(QThread):
+    # Enumerates the serial ports once off the GUI thread, listing the ports can take seconds on Windows.
+    #   The names are shared by every serial row's dropdown.
+    ports_found = pyqtSignal(list)
+
+    def run(self):
+        import serial.tools.list_ports # Only needed once the ports are scanned
+        try:
+            ports = [port.name for port in serial.tools.list_ports.comports()]
+        except OSError as e:
+            print(f"Serial Exeption: {e}")
+            ports = []
+        self.ports_found.emit(ports)
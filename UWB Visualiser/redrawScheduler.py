@@ -0,0 +1,51 @@
+import time
+from PyQt6.QtCore import QObject, QTimer
+
+class RedrawScheduler(QObject):
+    # Redraws the plot only after the scene has been marked dirty. Bursts of updates between frames are
+    #   merged into a single redraw and redraws are capped at the target FPS, when nothing changes it idles.
+
+    def __init__(self, redraw, targetFps):
+        super().__init__()
+        self.redraw = redraw
+        self.interval = 1 / targetFps
+        self.dirty = False
+        self.active = False
+        self.lastFrame = 0.0
+
+        # Single shot timer, connected once and only started while there is something to draw
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def set_target_fps(self, targetFps):
+        self.interval = 1 / targetFps
+
+    def start(self):
+        self.active = True
+        if self.dirty:
+            self.schedule()
+
+    def stop(self):
+        self.active = False
+        self.timer.stop()
+
+    def isActive(self):
+        return self.active
+
+    def mark_dirty(self):
+        self.dirty = True
+        if self.active and not self.timer.isActive():
+            self.schedule()
+
+    def schedule(self):
+        # Wait until a full frame interval has passed since the last redraw
+        delay = max(0.0, self.lastFrame + self.interval - time.perf_counter())
+        self.timer.start(int(delay * 1000))
+
+    def on_timeout(self):
+        if not self.active or not self.dirty:
+            return
+        self.dirty = False
+        self.lastFrame = time.perf_counter()
+        self.redraw()
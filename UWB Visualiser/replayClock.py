@@ -0,0 +1,49 @@
+import time
+
+class ReplayClock():
+    # Maps wall-clock time to log time for replays, supporting a speed multiplier and pausing.
+    #   A speed of 0 replays as fast as possible (the clock jumps to each row's timestamp).
+    MIN_SPEED = 0.25
+    MAX_SPEED = 100
+
+    def __init__(self, speed=1.0):
+        self.speed = self.clamp_speed(speed)
+        self.paused = False
+        self.logTime = None
+        self.wallTime = 0.0
+
+    def clamp_speed(self, speed):
+        if speed <= 0:
+            return 0
+        return min(max(speed, self.MIN_SPEED), self.MAX_SPEED)
+
+    def now(self):
+        # Current log time, None until the clock has been set
+        if self.logTime is None or self.paused or self.speed == 0:
+            return self.logTime
+        return self.logTime + (time.perf_counter() - self.wallTime) * self.speed
+
+    def set(self, logTime):
+        self.logTime = logTime
+        self.wallTime = time.perf_counter()
+
+    def set_speed(self, speed):
+        # Continue from the current log time at the new speed
+        if self.logTime is not None:
+            self.set(self.now())
+        self.speed = self.clamp_speed(speed)
+
+    def pause(self):
+        if self.logTime is not None:
+            self.set(self.now())
+        self.paused = True
+
+    def resume(self):
+        self.wallTime = time.perf_counter()
+        self.paused = False
+
+    def delay_until(self, logTime):
+        # Seconds of wall-clock time until the given log time is reached
+        if self.logTime is None or self.speed == 0:
+            return 0.0
+        return (logTime - self.now()) / self.speed
@@ -0,0 +1,43 @@
+import time
+from collections import deque
+from utils.instrumentation import stamp_queued
+
+class SampleQueue():
+    # Hands tag samples from the reader threads to the GUI thread in batches. Readers append to a deque
+    #   (thread-safe without a lock) and only ask for a wake-up when the GUI has drained the queue since
+    #   their last request, so there is at most one queued signal per frame instead of one per sample.
+    MAX_SAMPLES = 65536
+
+    def __init__(self, maxSamples=MAX_SAMPLES):
+        self.samples = deque(maxlen=maxSamples)
+        self.wakeRequested = False
+        self.dropped = 0
+        self.droppedTags = {} # comPort -> samples discarded
+        self.timed = False # Readers stamp the samples with the times of their stages (utils/instrumentation.py)
+
+    def put(self, comPort, td):
+        # Returns True when the consumer needs to be signalled
+        if len(self.samples) == self.samples.maxlen:
+            # The oldest sample is discarded by the deque, unless the GUI thread drains it first
+            try:
+                oldest = self.samples[0][0]
+                self.dropped += 1
+                self.droppedTags[oldest] = self.droppedTags.get(oldest, 0) + 1
+            except IndexError:
+                pass # Drained since the length was checked, nothing is dropped
+        if self.timed:
+            stamp_queued(td, time.perf_counter())
+        self.samples.append((comPort, td))
+        if self.wakeRequested:
+            return False
+        self.wakeRequested = True
+        return True
+
+    def drain(self):
+        # All the queued samples, oldest first. The wake-up flag is cleared before draining so a sample
+        #   appended while draining either gets drained now or requests a new wake-up.
+        self.wakeRequested = False
+        samples = []
+        while self.samples:
+            samples.append(self.samples.popleft())
+        return samples
@@ -0,0 +1,396 @@
+import time
+import numpy as np
+from PyQt6.QtCore import Qt, QRectF, QPointF, QSize, pyqtSignal
+from PyQt6.QtGui import QColor, QPen, QBrush, QFont, QImage, QPixmap, QPainter, QPainterPath, QPolygonF, QTransform
+from PyQt6.QtWidgets import (QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsSimpleTextItem, QGraphicsEllipseItem,
+                             QGraphicsPathItem, QGraphicsPixmapItem, QGraphicsRectItem, QGraphicsPolygonItem)
+
+class MapView(QGraphicsView):
+    # Map widget of the scene renderer, the scene is in meters with Y up. The view follows the map and tags until
+    #   it is zoomed (mouse wheel, about the cursor) or panned (dragged), a double click follows them again.
+    ZOOM_STEP = 1.25
+    MIN_SCALE = 2.0     # Pixels per meter
+    MAX_SCALE = 5000.0
+    view_changed = pyqtSignal() # The zoom or the size of the view has changed
+
+    def __init__(self, size):
+        super().__init__()
+        self.preferredSize = size
+        scene = QGraphicsScene(self)
+        scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex) # Most items move every frame
+        self.setScene(scene)
+        self.setRenderHints(QPainter.RenderHint.Antialiasing | QPainter.RenderHint.SmoothPixmapTransform)
+        self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setResizeAnchor(QGraphicsView.ViewportAnchor.AnchorViewCenter)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setBackgroundBrush(QColor("white"))
+        self.scale(1, -1)
+        self.fitRect = None
+        self.following = True
+
+    def sizeHint(self):
+        return QSize(self.preferredSize, self.preferredSize)
+
+    def pixelsPerMeter(self):
+        return abs(self.transform().m11())
+
+    def fit(self, rect):
+        # Show the rect (meters) unless the user has zoomed or panned
+        self.fitRect = rect
+        if self.following:
+            self.fitInView(rect, Qt.AspectRatioMode.KeepAspectRatio)
+            self.view_changed.emit()
+
+    def wheelEvent(self, event):
+        factor = self.ZOOM_STEP ** (event.angleDelta().y() / 120)
+        if not self.MIN_SCALE <= self.pixelsPerMeter() * factor <= self.MAX_SCALE:
+            return
+        self.following = False
+        self.scale(factor, factor)
+        self.view_changed.emit()
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.MouseButton.LeftButton:
+            self.following = False
+        super().mouseMoveEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        self.following = True
+        if self.fitRect is not None:
+            self.fit(self.fitRect)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.following and self.fitRect is not None:
+            self.fitInView(self.fitRect, Qt.AspectRatioMode.KeepAspectRatio)
+        self.view_changed.emit()
+
+class Label(QGraphicsSimpleTextItem):
+    # Text at a constant size whatever the zoom, centred above ("bottom") or below ("top") its position like
+    #   the matplotlib labels, or to the right of it ("baseline")
+    def __init__(self, text, size, colour, align, bold=False):
+        super().__init__()
+        font = QFont()
+        font.setPointSizeF(size)
+        font.setBold(bold)
+        self.setFont(font)
+        self.setBrush(QColor(colour))
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIgnoresTransformations)
+        self.align = align
+        self.setText(text)
+
+    def setText(self, text):
+        super().setText(text)
+        rect = self.boundingRect()
+        dx = 0 if self.align == "baseline" else -rect.width() / 2
+        dy = 0 if self.align == "top" else -rect.height()
+        self.setTransform(QTransform.fromTranslate(dx, dy))
+
+class SceneRenderer():
+    # Qt scene graph renderer, an alternative to the matplotlib MapRenderer drawing the same layers. The static
+    #   items (floorplan, origin, coverage and anchors) are only recreated when the anchors or the configuration
+    #   change and the tag items are moved in place each frame, Qt then only repaints the parts of the view that
+    #   changed. The floorplan is a pixmap scaled once to the zoom, so drawing it is a copy of its pixels.
+    MARGIN_M = 0.5
+    PIXMAP_VIEWS = 2
+    PAN_MARGIN_M = 100.0 # The view can be panned this far past the map
+    # Labels are cheap compared with matplotlib, but the map is unreadable with every tag labelled
+    DETAIL_TAG_LIMIT = 8
+    NAME_TAG_LIMIT = 16
+    HEATMAP_INTERVAL = 1.0 # Minimum time (s) between heatmap updates
+    TAG_RADIUS = 0.05
+    TAG_ALPHA = 0.6
+    TRAIL_ALPHA = 0.5
+    RANGE_COLOUR = QColor(0, 128, 0, 51) # Green, 0.2 alpha
+    POOR_COVERAGE_COLOUR = "red"
+    # Stacking of the layers
+    Z_FLOORPLAN, Z_OVERLAY, Z_MARKERS, Z_TRAILS, Z_RANGES, Z_TAGS, Z_LABELS = range(7)
+
+    def __init__(self, view: MapView, drawStatic):
+        self.view = view
+        self.scene = view.scene()
+        self.drawStatic = drawStatic # Callback drawing the static layers with the draw* methods
+        self.staticItems = []
+        self.bounds = QRectF() # Of the static layers (meters)
+        self.anchorVersion = None
+        self.floorplan = None
+        self.floorplanItem = None
+        self.floorplanSize = None
+        self.trails = None
+        self.heatmap = None
+        self.coverage = None
+        self.heatmapItem = None
+        self.heatmapGrid = None
+        self.heatmapVersion = None
+        self.heatmapTime = 0.0
+        self.tagKey = None
+        self.markers = []
+        self.poorFlags = []
+        self.nameLabels = []
+        self.coordLabels = []
+        self.trailItems = []
+        self.rangeItem = None
+        self.rangeLabels = []
+        self.view.view_changed.connect(self.updateFloorplan)
+
+    def invalidate(self):
+        # Recreate the static layers on the next frame (config change, reset, etc.)
+        self.anchorVersion = None
+
+    def render(self, tags, tagColours, anchors, trails=None, heatmap=None, coverage=None):
+        # The same arguments as MapRenderer.render. The items are updated and Qt paints them with the next
+        #   pass of the event loop.
+        self.trails = trails
+        self.heatmap = heatmap
+        self.coverage = coverage
+        rebuilt = anchors.version != self.anchorVersion
+        if rebuilt:
+            self.anchorVersion = anchors.version
+            self.rebuild()
+        self.updateHeatmap()
+        self.updateTagItems(tags, tagColours)
+        self.fitView(tags, rebuilt)
+
+    def rebuild(self):
+        for item in self.staticItems:
+            self.scene.removeItem(item)
+        self.staticItems = []
+        self.bounds = QRectF()
+        self.floorplanItem = None
+        self.floorplanSize = None
+        self.drawStatic()
+        self.view.setSceneRect(self.bounds.adjusted(-self.PAN_MARGIN_M, -self.PAN_MARGIN_M, self.PAN_MARGIN_M, self.PAN_MARGIN_M))
+
+    def fitView(self, tags, refit):
+        # Follow the tags that leave the view, with the floorplan and anchors always in the fitted area
+        rect = QRectF(self.bounds)
+        if len(tags):
+            positions = tags.positions()
+            x0, y0 = positions[:, :2].min(axis=0) - self.MARGIN_M
+            x1, y1 = positions[:, :2].max(axis=0) + self.MARGIN_M
+            rect = rect.united(QRectF(float(x0), float(y0), float(x1 - x0), float(y1 - y0)))
+        if refit or self.view.fitRect is None or not self.view.fitRect.contains(rect):
+            self.view.fit(rect)
+
+    def addStatic(self, item, z, extent=None):
+        item.setZValue(z)
+        self.scene.addItem(item)
+        self.staticItems.append(item)
+        if extent is not None:
+            left, right, bottom, top = extent
+            self.bounds = self.bounds.united(QRectF(left, bottom, right - left, top - bottom))
+        return item
+
+    def drawFloorplan(self, floorplan, alpha):
+        # The FloorplanCache image, rescaled when the zoom changes
+        self.floorplan = floorplan
+        self.floorplanItem = self.addStatic(QGraphicsPixmapItem(), self.Z_FLOORPLAN, floorplan.extent)
+        self.floorplanItem.setOpacity(alpha)
+        self.floorplanItem.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
+        self.updateFloorplan()
+
+    def updateFloorplan(self):
+        # Scale the smallest pyramid level covering the displayed size to exactly that size, so the pixmap is
+        #   drawn without scaling. Zoomed in until the floorplan is more than PIXMAP_VIEWS times the size of
+        #   the view, the pixmap stops growing and is scaled by Qt.
+        if self.floorplanItem is None:
+            return
+        left, right, bottom, top = self.floorplan.extent
+        viewport = self.view.viewport()
+        scale = min(self.view.pixelsPerMeter(), self.PIXMAP_VIEWS * max(viewport.width(), viewport.height()) / max(right - left, top - bottom))
+        width = max(1, round((right - left) * scale))
+        height = max(1, round((top - bottom) * scale))
+        if (width, height) == self.floorplanSize:
+            return
+        self.floorplanSize = (width, height)
+        image = array_image(self.floorplan.image(width, height))
+        if image.width() != width or image.height() != height:
+            image = image.scaled(width, height, Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        self.floorplanItem.setPixmap(QPixmap.fromImage(image))
+        # Pixel (0, 0) is the top left of the extent
+        self.floorplanItem.setTransform(QTransform((right - left) / width, 0, 0, -(top - bottom) / height, left, top))
+
+    def drawCoverage(self, coverage):
+        item = self.addStatic(grid_item(coverage_rgba(coverage), coverage.extent), self.Z_OVERLAY, coverage.extent)
+        from mapRenderer import MapRenderer
+        item.setOpacity(MapRenderer.COVERAGE_ALPHA)
+
+    def drawSquare(self, x, y, size, colour):
+        offset = size / 2
+        item = self.addStatic(QGraphicsRectItem(x - offset, y - offset, size, size), self.Z_MARKERS, (x - offset, x + offset, y - offset, y + offset))
+        item.setBrush(QColor(colour))
+        item.setPen(QPen(Qt.PenStyle.NoPen))
+
+    def drawTriangle(self, x, y, size, colour):
+        size = size / 2
+        item = self.addStatic(QGraphicsPolygonItem(QPolygonF([QPointF(x + size, y - size), QPointF(x, y + size), QPointF(x - size, y - size)])),
+                              self.Z_MARKERS, (x - size, x + size, y - size, y + size))
+        item.setBrush(QColor(colour))
+        item.setPen(QPen(Qt.PenStyle.NoPen))
+
+    def drawText(self, x, y, text, size, colour, align="baseline", bold=False):
+        label = self.addStatic(Label(text, size, colour, align, bold), self.Z_LABELS)
+        label.setPos(x, y)
+
+    def updateHeatmap(self):
+        # Recolour the heatmap when the grid has changed, at most every HEATMAP_INTERVAL
+        if self.heatmap is None:
+            if self.heatmapItem is not None:
+                self.heatmapItem.setVisible(False)
+            return
+        if self.heatmapItem is None or self.heatmapGrid is not self.heatmap:
+            if self.heatmapItem is not None:
+                self.scene.removeItem(self.heatmapItem)
+            from mapRenderer import MapRenderer
+            self.heatmapItem = grid_item(heatmap_rgba(self.heatmap.grid()), self.heatmap.extent)
+            self.heatmapItem.setOpacity(MapRenderer.HEATMAP_ALPHA)
+            self.heatmapItem.setZValue(self.Z_OVERLAY)
+            self.scene.addItem(self.heatmapItem)
+            self.heatmapGrid = self.heatmap
+            self.heatmapVersion = self.heatmap.version
+            self.heatmapTime = time.monotonic()
+        elif self.heatmapVersion != self.heatmap.version and time.monotonic() - self.heatmapTime >= self.HEATMAP_INTERVAL:
+            self.heatmapItem.setPixmap(QPixmap.fromImage(array_image(heatmap_rgba(self.heatmap.grid()))))
+            self.heatmapVersion = self.heatmap.version
+            self.heatmapTime = time.monotonic()
+        self.heatmapItem.setVisible(True)
+
+    def itemKey(self, tags, tagColours):
+        # The tag items are recreated when the tags, their colours or the trail visibility change
+        return (tuple(tags.comPorts), tuple(tagColours.get(c) for c in tags.comPorts), self.trails is not None)
+
+    def createTagItems(self, tags, tagColours):
+        self.removeTagItems()
+        self.tagKey = self.itemKey(tags, tagColours)
+        self.poorPen = cosmetic_pen(self.POOR_COVERAGE_COLOUR, 2, self.TAG_ALPHA)
+        for comPort in tags.comPorts:
+            colour = tagColours.get(comPort, "gray")
+            if self.trails is not None:
+                trail = self.addTag(QGraphicsPathItem(), self.Z_TRAILS)
+                trail.setPen(cosmetic_pen(colour, 1.5, self.TRAIL_ALPHA))
+                self.trailItems.append(trail)
+            marker = self.addTag(QGraphicsEllipseItem(-self.TAG_RADIUS, -self.TAG_RADIUS, 2 * self.TAG_RADIUS, 2 * self.TAG_RADIUS), self.Z_TAGS)
+            fill = QColor(colour)
+            fill.setAlphaF(self.TAG_ALPHA)
+            marker.setBrush(fill)
+            marker.setPen(QPen(Qt.PenStyle.NoPen))
+            self.markers.append(marker)
+            self.poorFlags.append(False)
+            self.nameLabels.append(self.addTag(Label(f"TAG-{comPort}", 6, "black", "bottom", bold=True), self.Z_LABELS))
+            self.coordLabels.append(self.addTag(Label("", 8, "gray", "top"), self.Z_LABELS))
+        self.rangeItem = self.addTag(QGraphicsPathItem(), self.Z_RANGES)
+        pen = cosmetic_pen(self.RANGE_COLOUR, 1)
+        pen.setStyle(Qt.PenStyle.DashLine)
+        self.rangeItem.setPen(pen)
+
+    def addTag(self, item, z):
+        item.setZValue(z)
+        self.scene.addItem(item)
+        return item
+
+    def updateTagItems(self, tags, tagColours):
+        if self.tagKey != self.itemKey(tags, tagColours):
+            self.createTagItems(tags, tagColours)
+
+        positions = tags.positions()
+        poor = self.coverage.poor(positions[:, :2]) if self.coverage is not None else np.zeros(len(positions), dtype=bool)
+        named = len(tags) <= self.NAME_TAG_LIMIT
+        detailed = len(tags) <= self.DETAIL_TAG_LIMIT
+        rangePath = QPainterPath()
+        rangeLabels = []
+        for slot, value in enumerate(tags.tagData):
+            x, y = float(positions[slot, 0]), float(positions[slot, 1])
+            self.markers[slot].setPos(x, y)
+            if poor[slot] != self.poorFlags[slot]:
+                self.poorFlags[slot] = bool(poor[slot])
+                self.markers[slot].setPen(self.poorPen if poor[slot] else QPen(Qt.PenStyle.NoPen))
+            if self.trailItems:
+                # The trail ends at the marker, which may have moved less than a step from the last stored point
+                points = self.trails.trail(slot)
+                path = QPainterPath()
+                if len(points):
+                    path.addPolygon(QPolygonF([QPointF(px, py) for px, py in points[:, :2].tolist()] + [QPointF(x, y)]))
+                self.trailItems[slot].setPath(path)
+
+            self.nameLabels[slot].setVisible(named)
+            self.nameLabels[slot].setPos(x, y)
+            label = self.coordLabels[slot]
+            label.setVisible(detailed)
+            if detailed:
+                label.setPos(x, y)
+                text = f"({value.TagPosition.X}, {value.TagPosition.Y})"
+                if label.text() != text:
+                    label.setText(text)
+
+            for a in value.AnchorPositions:
+                rangePath.moveTo(a.X, a.Y)
+                rangePath.lineTo(x, y)
+                if detailed:
+                    rangeLabels.append(((a.X + x) / 2, (a.Y + y) / 2, f"{a.MetersFromTag}"))
+        self.rangeItem.setPath(rangePath)
+
+        while len(self.rangeLabels) < len(rangeLabels):
+            self.rangeLabels.append(self.addTag(Label("", 8, "gray", "baseline"), self.Z_LABELS))
+        for index, label in enumerate(self.rangeLabels):
+            if index < len(rangeLabels):
+                x, y, text = rangeLabels[index]
+                label.setPos(x, y)
+                if label.text() != text:
+                    label.setText(text)
+                label.setVisible(True)
+            else:
+                label.setVisible(False)
+
+    def removeTagItems(self):
+        for item in [self.rangeItem] + self.markers + self.nameLabels + self.coordLabels + self.trailItems + self.rangeLabels:
+            if item is not None:
+                self.scene.removeItem(item)
+        self.tagKey = None
+        self.markers = []
+        self.poorFlags = []
+        self.nameLabels = []
+        self.coordLabels = []
+        self.trailItems = []
+        self.rangeItem = None
+        self.rangeLabels = []
+
+def cosmetic_pen(colour, width, alpha=None):
+    # A pen of the same width in pixels whatever the zoom
+    colour = QColor(colour)
+    if alpha is not None:
+        colour.setAlphaF(alpha)
+    pen = QPen(QBrush(colour), width)
+    pen.setCosmetic(True)
+    return pen
+
+def array_image(array):
+    # QImage copy of an (h, w, 3) or (h, w, 4) uint8 array
+    array = np.ascontiguousarray(array, dtype=np.uint8)
+    imageFormat = QImage.Format.Format_RGBA8888 if array.shape[2] == 4 else QImage.Format.Format_RGB888
+    return QImage(array.data, array.shape[1], array.shape[0], array.strides[0], imageFormat).copy()
+
+def grid_item(rgba, extent):
+    # Pixmap item of a grid over its extent, row 0 at the bottom, the cells drawn without smoothing
+    left, right, bottom, top = extent
+    item = QGraphicsPixmapItem(QPixmap.fromImage(array_image(rgba)))
+    item.setTransformationMode(Qt.TransformationMode.FastTransformation)
+    item.setTransform(QTransform((right - left) / rgba.shape[1], 0, 0, (top - bottom) / rgba.shape[0], left, bottom))
+    return item
+
+def heatmap_rgba(grid):
+    # The colours of mapRenderer.heatmap_image, empty cells transparent
+    from matplotlib import colors, colormaps
+    from mapRenderer import MapRenderer
+    cmap = colormaps[MapRenderer.HEATMAP_CMAP].with_extremes(bad=(0, 0, 0, 0))
+    norm = colors.PowerNorm(0.5, 0, max(float(grid.max()), 1e-9))
+    return cmap(norm(np.ma.masked_equal(grid, 0)), bytes=True)
+
+def coverage_rgba(coverage):
+    # The colours of mapRenderer.coverage_image, cells with too few anchors in range grey
+    from matplotlib import colors, colormaps
+    from mapRenderer import MapRenderer
+    cmap = colormaps[MapRenderer.COVERAGE_CMAP].with_extremes(bad=(0.5, 0.5, 0.5, 0.5))
+    norm = colors.Normalize(1.0, MapRenderer.COVERAGE_MAX_DOP, clip=True)
+    return cmap(norm(np.ma.masked_invalid(coverage.dop)), bytes=True)
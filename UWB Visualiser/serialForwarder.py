@@ -0,0 +1,212 @@
+import os, sys, time, errno, select, socket, argparse
+import serial
+from collections import deque
+from serial.serialutil import SerialException
+
+class SerialForwarder():
+    # Reads the location lines of a DWM1001 on a local serial port and sends them to the network
+    #   receiver of a visualiser. The serial port and the connection are reopened whenever they fail,
+    #   and lines are queued (oldest dropped first) while the receiver isn't keeping up, so the serial
+    #   port is always read.
+    SETTLE_TIME = 2.0
+    PROBE_TIME = 1.0
+    ENTER_TIME = 0.5
+    COMMAND_TIME = 0.1
+    RECONNECT_TIME = 1.0    # First wait before reconnecting, doubled after every failure (s)
+    MAX_RECONNECT_TIME = 30.0
+    CONNECT_TIMEOUT = 5.0   # A TCP connection is given up after this long, it is made without blocking the serial reads (s)
+    MAX_PENDING = 1000      # Lines queued while the receiver isn't keeping up
+    DATAGRAM_SIZE = 1400    # Lines are packed into UDP datagrams up to this size
+    NAME_INTERVAL = 5.0     # UDP senders repeat their name, so a restarted receiver learns it (s)
+
+    def __init__(self, PORT, BAUDRATE, HOST, NETWORK_PORT, PROTOCOL="tcp", NAME=None):
+        self.PORT = PORT
+        self.BAUDRATE = BAUDRATE
+        self.HOST = HOST
+        self.NETWORK_PORT = NETWORK_PORT
+        self.PROTOCOL = PROTOCOL
+        self.NAME = NAME or f"{socket.gethostname()}-{PORT.replace('/', '')}"
+        self.serial = None
+        self.sock = None
+        self.connecting = False # The TCP connection is in progress
+        self.connectDeadline = 0.0
+        self.pending = deque()
+        self.outgoing = bytearray()
+        self.line = bytearray() # A line cut off by the read timeout is completed by the next read
+        self.dropped = 0
+        self.reconnectTime = self.RECONNECT_TIME
+        self.nextConnect = 0.0
+        self.nextName = 0.0
+
+    def open_serial(self):
+        self.serial = serial.Serial(self.PORT, self.BAUDRATE, timeout=0.1)
+        time.sleep(self.SETTLE_TIME)
+        self.serial.reset_input_buffer()
+
+        # Check if the device is already sending location data, otherwise activate it
+        end = time.monotonic() + self.PROBE_TIME
+        while time.monotonic() < end:
+            line = self.serial.readline()
+            if line.startswith(b"DIST") and b"POS" in line:
+                break
+        else:
+            self.serial.write(b'\r')
+            time.sleep(self.ENTER_TIME)
+            self.serial.write(b'\r')
+            time.sleep(self.ENTER_TIME)
+            self.serial.write(b'lec\r')
+            time.sleep(self.COMMAND_TIME)
+        print(f"Forwarding {self.PORT} - {self.BAUDRATE} to {self.PROTOCOL}://{self.HOST}:{self.NETWORK_PORT} as {self.NAME}")
+
+    def close_serial(self):
+        # Stop the location data and reboot the device
+        try:
+            self.serial.write(b'lec\r')
+            time.sleep(self.COMMAND_TIME)
+            self.serial.write(b'reset\r')
+            time.sleep(self.COMMAND_TIME)
+        except SerialException:
+            pass
+        self.serial.close()
+        self.serial = None
+
+    def connect(self, now):
+        try:
+            if self.PROTOCOL == "udp":
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.sock.connect((self.HOST, self.NETWORK_PORT))
+                self.sock.setblocking(False)
+            else:
+                # Non-blocking connect, it is finished by check_connection while the serial port is read
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self.sock.setblocking(False)
+                error = self.sock.connect_ex((self.HOST, self.NETWORK_PORT))
+                if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, 10035): # 10035: WSAEWOULDBLOCK on Windows
+                    raise OSError(error, os.strerror(error))
+                self.connecting = True
+                self.connectDeadline = now + self.CONNECT_TIMEOUT
+                return
+        except OSError as e:
+            print(f"Network Exception: {e}, retrying in {self.reconnectTime:.0f}s")
+            self.disconnect(now)
+            return
+        self.connected(now)
+
+    def check_connection(self, now):
+        # Whether the TCP connection has been made, failed connections are retried after the backoff
+        _, writable, failed = select.select([], [self.sock], [self.sock], 0)
+        if writable or failed:
+            error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error == 0 and not failed:
+                self.connecting = False
+                self.connected(now)
+                return True
+            print(f"Network Exception: {os.strerror(error) if error else 'connection failed'}, retrying in {self.reconnectTime:.0f}s")
+            self.disconnect(now)
+        elif now >= self.connectDeadline:
+            print(f"Network Exception: connection timed out, retrying in {self.reconnectTime:.0f}s")
+            self.disconnect(now)
+        return False
+
+    def connected(self, now):
+        print(f"Connected to {self.HOST}:{self.NETWORK_PORT}")
+        self.reconnectTime = self.RECONNECT_TIME
+        self.outgoing = bytearray(f"TAG,{self.NAME}\n".encode())
+        self.nextName = now + self.NAME_INTERVAL
+
+    def disconnect(self, now):
+        # A partly sent line is dropped, the new connection starts with the name line
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        self.connecting = False
+        self.outgoing = bytearray()
+        self.nextConnect = now + self.reconnectTime
+        self.reconnectTime = min(self.reconnectTime * 2, self.MAX_RECONNECT_TIME)
+
+    def queue(self, line: bytes):
+        if len(self.pending) == self.MAX_PENDING:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(line)
+
+    def send(self, now):
+        if self.PROTOCOL == "udp" and now >= self.nextName:
+            self.outgoing += f"TAG,{self.NAME}\n".encode()
+            self.nextName = now + self.NAME_INTERVAL
+        try:
+            while self.pending or self.outgoing:
+                if self.PROTOCOL == "udp":
+                    # Whole lines per datagram, a lost datagram only loses its own lines
+                    while self.pending and len(self.outgoing) + len(self.pending[0]) <= self.DATAGRAM_SIZE:
+                        self.outgoing += self.pending.popleft()
+                    if not self.outgoing:
+                        self.outgoing += self.pending.popleft()
+                    self.sock.send(self.outgoing)
+                    self.outgoing = bytearray()
+                else:
+                    if not self.outgoing:
+                        self.outgoing += b"".join(self.pending)
+                        self.pending.clear()
+                    del self.outgoing[:self.sock.send(self.outgoing)]
+        except BlockingIOError:
+            pass # The receiver isn't keeping up, the lines stay queued
+        except OSError as e:
+            print(f"Network Exception: {e}, retrying in {self.reconnectTime:.0f}s")
+            self.disconnect(now)
+
+    def run(self):
+        try:
+            while True:
+                now = time.monotonic()
+                if self.serial is None:
+                    try:
+                        self.open_serial()
+                    except SerialException as e:
+                        print(f"Serial Exeption: {e}")
+                        self.serial = None
+                        time.sleep(self.RECONNECT_TIME)
+                        continue
+                if self.sock is None and now >= self.nextConnect:
+                    self.connect(now)
+
+                try:
+                    self.line += self.serial.readline()
+                except SerialException as e:
+                    # The device has been unplugged
+                    print(f"Serial Exeption: {e}")
+                    self.serial.close()
+                    self.serial = None
+                    self.line.clear()
+                    continue
+                if self.line.endswith(b'\n'):
+                    if self.line.startswith(b"DIST"):
+                        self.queue(bytes(self.line))
+                    self.line.clear()
+                if self.connecting:
+                    self.check_connection(time.monotonic())
+                if self.sock is not None and not self.connecting:
+                    self.send(time.monotonic())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.serial is not None:
+                self.close_serial()
+            if self.sock is not None:
+                self.sock.close()
+            print(f"Stopped forwarding {self.PORT}... {self.dropped} lines dropped")
+
+# Forwards a DWM1001 on a gateway's serial port to a visualiser listening for network tags, e.g.
+#   python "./UWB Visualiser/serialForwarder.py" /dev/ttyACM0 --host 192.168.1.20 --name gateway-3
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Forward the location data of a DWM1001 on a serial port to the visualiser over TCP or UDP.")
+    parser.add_argument("port", help="Serial port of the tag, e.g. COM5 or /dev/ttyACM0")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--host", default="127.0.0.1", help="Address of the visualiser")
+    parser.add_argument("--network-port", type=int, default=5005, help="Port the visualiser is listening on")
+    parser.add_argument("--udp", action="store_true", help="Send datagrams instead of a TCP stream")
+    parser.add_argument("--name", help="Tag name shown by the visualiser (default: <hostname>-<port>)")
+    args = parser.parse_args()
+
+    SerialForwarder(args.port, args.baudrate, args.host, args.network_port, "udp" if args.udp else "tcp", args.name).run()
+    sys.exit(0)
@@ -0,0 +1,330 @@
+import os
+import re
+import time
+import queue
+import socket
+import selectors
+import serial
+from PyQt6.QtCore import QThread, pyqtSignal
+from tagData import TagData
+from utils.logWriter import LogWriter, LogPolicy
+from utils.dwmParser import DwmParser, take_lines
+from serial.serialutil import SerialException
+
+class SerialPort():
+    # State of one connected DWM1001. The lec handshake and the shutdown are steps of a state machine
+    #   with deadlines instead of sleeps, so one thread can drive any number of ports.
+    #   OPENING -> SETTLING (device boot) -> PROBING (already streaming?) -> ENTER1 -> ENTER2 -> LEC -> STREAMING
+    #   STREAMING -> RESETTING (lec sent) -> CLOSING (reset sent) -> closed
+    SETTLE_TIME = 2.0
+    PROBE_TIME = 1.0
+    ENTER_TIME = 0.5
+    COMMAND_TIME = 0.1
+    READ_SIZE = 4096
+
+    def __init__(self, INDEX, PORT, BAUDRATE, ENABLE_LOGGING, LOGFILE_DIRECTORY, LOG_FORMAT="csv"):
+        self.INDEX = INDEX
+        self.PORT = PORT
+        self.BAUDRATE = BAUDRATE
+        self.ENABLE_LOGGING = ENABLE_LOGGING
+        self.LOGFILE_DIRECTORY = LOGFILE_DIRECTORY
+        self.LOG_FORMAT = LOG_FORMAT # "csv" text rows or "bin" fixed-width binary records
+        self.parser = DwmParser()
+        self.serial = None
+        self.logfile = None # RotatingLog written by the log writer thread
+        self.logWriter = None
+        self.state = "OPENING"
+        self.deadline = 0.0
+        self.buffer = bytearray() # Reused for every read, complete lines are removed from the front
+        self.skipLine = False
+        self.start_time = 0.0
+
+    def open(self, now):
+        # Non-blocking reads, the port is only read when it has data
+        self.serial = serial.Serial(self.PORT, self.BAUDRATE, timeout=0)
+        self.state = "SETTLING"
+        self.deadline = now + self.SETTLE_TIME
+
+    def fileno(self):
+        try:
+            return self.serial.fileno()
+        except (AttributeError, OSError):
+            return None # Not selectable (Windows), the port is polled
+
+    def read(self):
+        # Append the waiting bytes to the buffer, returns False if nothing was read
+        data = self.serial.read(max(self.serial.in_waiting, 1) if self.fileno() is None else self.READ_SIZE)
+        if not data:
+            return False
+        self.buffer += data
+        return True
+
+    def lines(self):
+        return take_lines(self.buffer)
+
+    def skip_partial_line(self):
+        # Drop what was received while the device booted. If a line was cut off part way, its end
+        #   isn't a complete line, so it is skipped rather than mistaken for a non-telemetry line.
+        del self.buffer[:self.buffer.rfind(b'\n') + 1]
+        self.skipLine = len(self.buffer) > 0
+
+    def write(self, command, state, delay, now):
+        self.serial.write(command)
+        self.state = state
+        self.deadline = now + delay
+
+    def start_streaming(self, now, logWriter: LogWriter):
+        # log data to CSV or binary - Filename format (YYYY-MM-DD-HH-MM-SS-ComPort.csv/.bin)
+        if self.ENABLE_LOGGING:
+            self.logWriter = logWriter
+            self.logfile = logWriter.open_log(self.LOGFILE_DIRECTORY, self.port_number(), self.LOG_FORMAT)
+        print(f"Running... {self.PORT} - {self.BAUDRATE} - {self.ENABLE_LOGGING}")
+        self.state = "STREAMING"
+        self.start_time = now
+
+    def port_number(self):
+        # Number at the end of the port name (COM5 -> 5, /dev/ttyUSB0 -> 0) used in the log filename
+        match = re.search(r"(\d+)$", self.PORT)
+        return match.group(1) if match else os.path.basename(self.PORT)
+
+    def log(self, tagData: TagData):
+        # Queued to the log writer thread, the row is dropped if the writer is too far behind
+        self.logWriter.write(self.logfile, tagData)
+
+    def close(self):
+        # The log is closed even if closing the port fails
+        try:
+            if self.serial is not None:
+                self.serial.close()
+        except (SerialException, OSError) as e:
+            print(f"Serial Exeption: {e}")
+        finally:
+            if self.logfile is not None:
+                self.logWriter.close_log(self.logfile)
+                self.logfile = None
+        print(f"Closing serial connection on {self.PORT}... {self.parser.summary()}")
+
+class SerialMultiplexer(QThread):
+    # Reads every connected serial port from a single thread. Ports are registered with a selector
+    #   (or polled where serial ports can't be selected, e.g. Windows) and connect/disconnect requests
+    #   are queued to the thread, so the GUI never blocks on a port.
+    tag_data = pyqtSignal(TagData, str)
+    serial_connected = pyqtSignal(int)
+    serial_disconnected = pyqtSignal(int)
+    samples_ready = pyqtSignal()
+    POLL_INTERVAL = 0.005 # Wait between polls of unselectable ports (s)
+    IDLE_TIMEOUT = 0.5
+
+    def __init__(self, SAMPLE_QUEUE=None, LOG_POLICY=None):
+        super().__init__()
+        self.SAMPLE_QUEUE = SAMPLE_QUEUE
+        self.logWriter = LogWriter(LOG_POLICY or LogPolicy()) # Writes the logs of every port on its own thread
+        self.commands = queue.SimpleQueue()
+        self.ports = {} # INDEX -> SerialPort
+        self.running = False
+
+        # Writing to the socket pair wakes the selector when a command is queued
+        self.selector = selectors.DefaultSelector()
+        self.wakeReader, self.wakeWriter = socket.socketpair()
+        self.wakeReader.setblocking(False)
+        self.wakeWriter.setblocking(False)
+        self.selector.register(self.wakeReader, selectors.EVENT_READ, None)
+
+    def connect_port(self, INDEX, PORT, BAUDRATE, ENABLE_LOGGING, LOGFILE_DIRECTORY, LOG_FORMAT="csv"):
+        self.send_command(("connect", SerialPort(INDEX, PORT, BAUDRATE, ENABLE_LOGGING, LOGFILE_DIRECTORY, LOG_FORMAT)))
+
+    def disconnect_port(self, INDEX):
+        self.send_command(("disconnect", INDEX))
+
+    def portCount(self):
+        return len(self.ports)
+
+    def send_command(self, command):
+        self.commands.put(command)
+        try:
+            self.wakeWriter.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass # Already woken
+
+    def stop(self):
+        # Disconnect every port and exit once they are closed
+        self.send_command(("stop", None))
+
+    def run(self):
+        self.running = True
+        self.logWriter.start()
+        try:
+            self.multiplex()
+        finally:
+            # Close the ports and their logs even if the loop failed, the log writer then writes what is queued
+            try:
+                for port in list(self.ports.values()):
+                    self.close_port(port)
+            finally:
+                self.logWriter.stop()
+            self.selector.close()
+            self.wakeReader.close()
+            self.wakeWriter.close()
+
+    def multiplex(self):
+        stopping = False
+        while self.running:
+            now = time.monotonic()
+            polled = [p for p in self.ports.values() if p.serial is not None and p.fileno() is None]
+            timeout = self.IDLE_TIMEOUT
+            deadlines = [p.deadline for p in self.ports.values() if p.state not in ("OPENING", "STREAMING")]
+            if deadlines:
+                timeout = min(timeout, max(0.0, min(deadlines) - now))
+            if polled:
+                timeout = min(timeout, self.POLL_INTERVAL)
+
+            ready = [key.data for key, _ in self.selector.select(timeout)]
+            now = time.monotonic()
+            if None in ready:
+                stopping |= self.handle_commands(now)
+            for port in [p for p in ready if p is not None] + polled:
+                if port.INDEX in self.ports:
+                    self.read_port(port, now)
+
+            for port in list(self.ports.values()):
+                if port.state not in ("OPENING", "STREAMING") and now >= port.deadline:
+                    self.advance(port, now)
+
+            if stopping and not self.ports:
+                self.running = False
+
+    def handle_commands(self, now):
+        # Returns True when the thread has been asked to stop
+        try:
+            while self.wakeReader.recv(1024):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+        stopping = False
+        while True:
+            try:
+                command, value = self.commands.get_nowait()
+            except queue.Empty:
+                return stopping
+            if command == "connect":
+                self.open_port(value, now)
+            elif command == "disconnect":
+                if value in self.ports:
+                    self.begin_close(self.ports[value], now)
+            elif command == "stop":
+                stopping = True
+                for port in list(self.ports.values()):
+                    self.begin_close(port, now)
+
+    def open_port(self, port: SerialPort, now):
+        try:
+            # Create listener on serial COM port
+            port.open(now)
+        except SerialException as e:
+            # Catch any serial errors opening port
+            print(f"Serial Exeption: {e}")
+            self.serial_disconnected.emit(port.INDEX)
+            return
+        self.ports[port.INDEX] = port
+        if port.fileno() is not None:
+            self.selector.register(port.fileno(), selectors.EVENT_READ, port)
+
+    def read_port(self, port: SerialPort, now):
+        try:
+            if not port.read():
+                return
+        except (SerialException, OSError) as e:
+            # The device has been unplugged
+            print(f"Serial Exeption: {e}")
+            self.close_port(port)
+            return
+
+        timed = self.SAMPLE_QUEUE is not None and self.SAMPLE_QUEUE.timed
+        readTime = time.perf_counter() if timed else 0.0
+        for line in port.lines():
+            if port.state == "PROBING":
+                if port.skipLine:
+                    port.skipLine = False
+                    continue
+                # Check if the device is already sending location data, otherwise activate it
+                if line.startswith(b"DIST") and b"POS" in line:
+                    self.start_streaming(port, now)
+                else:
+                    self.advance(port, now)
+            if port.state != "STREAMING":
+                continue
+
+            # parse serial data and add timestamp, lines without telemetry are counted and ignored
+            tagData = port.parser.parse(line, round(now - port.start_time, 3))
+            if tagData is None:
+                continue
+            if timed:
+                tagData.Timing = (readTime, time.perf_counter())
+
+            # log parsed data to CSV or binary
+            if port.logfile is not None:
+                port.log(tagData)
+
+            # Send the tag data signal
+            self.send_tag_data(tagData, port.PORT)
+
+    def advance(self, port: SerialPort, now):
+        # Next step of the handshake or shutdown, once the deadline of the current step has passed
+        try:
+            if port.state == "SETTLING":
+                port.state = "PROBING"
+                port.deadline = now + port.PROBE_TIME
+                port.skip_partial_line()
+            elif port.state == "PROBING":
+                # Activate the location data logging with two enters and the lec command
+                port.write(b'\r', "ENTER1", port.ENTER_TIME, now)
+            elif port.state == "ENTER1":
+                port.write(b'\r', "ENTER2", port.ENTER_TIME, now)
+            elif port.state == "ENTER2":
+                port.write(b'lec\r', "LEC", port.COMMAND_TIME, now)
+            elif port.state == "LEC":
+                self.start_streaming(port, now)
+            elif port.state == "RESETTING":
+                port.write(b'reset\r', "CLOSING", port.COMMAND_TIME, now)
+            elif port.state == "CLOSING":
+                self.close_port(port)
+        except SerialException as e:
+            print(f"Serial Exeption: {e}")
+            self.close_port(port)
+
+    def start_streaming(self, port: SerialPort, now):
+        try:
+            port.start_streaming(now, self.logWriter)
+        except OSError as e:
+            # The log file couldn't be created
+            print(f"Logging Exception: {e}")
+            self.begin_close(port, now)
+            return
+        # Send a signal to GUI indicating the COM Port connected
+        self.serial_connected.emit(port.INDEX)
+
+    def begin_close(self, port: SerialPort, now):
+        # Send the command to stop the location data and reboot the device
+        if port.state in ("RESETTING", "CLOSING"):
+            return
+        try:
+            port.write(b'lec\r', "RESETTING", port.COMMAND_TIME, now)
+        except SerialException as e:
+            print(f"Serial Exeption: {e}")
+            self.close_port(port)
+
+    def close_port(self, port: SerialPort):
+        if self.ports.pop(port.INDEX, None) is None:
+            return
+        if port.fileno() is not None:
+            self.selector.unregister(port.fileno())
+        port.close()
+        self.serial_disconnected.emit(port.INDEX)
+
+    def send_tag_data(self, td: TagData, com_port):
+        # Without a sample queue every sample is sent as its own signal
+        if self.SAMPLE_QUEUE is None:
+            self.tag_data.emit(td, com_port)
+        elif self.SAMPLE_QUEUE.put(com_port, td):
+            self.samples_ready.emit()
@@ -0,0 +1,192 @@
+import os, sys, time, socket, argparse
+from datetime import datetime
+import numpy as np
+from utils.tagSimulator import TagSimulator, TRAJECTORIES, dist_lines
+from utils.multilateration import load_anchorSurvey
+from utils.logFiles import open_logWriter
+
+class PtyOutput():
+    # Pseudo-terminal that behaves like a DWM1001 on a serial port: it starts in shell mode, "lec" toggles
+    #   the location data and "reset" stops it. Lines written while the reader isn't keeping up are dropped,
+    #   as a real serial port would.
+    def __init__(self, name):
+        import pty, tty # POSIX only
+        self.name = name
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.path = os.ttyname(self.slave)
+        self.streaming = False
+        self.input = bytearray()
+        self.dropped = 0
+
+    def poll(self):
+        try:
+            self.input += os.read(self.master, 1024)
+        except (BlockingIOError, OSError):
+            return
+        while b'\r' in self.input:
+            command, _, rest = bytes(self.input).partition(b'\r')
+            self.input = bytearray(rest)
+            if command.strip() == b"lec":
+                self.streaming = not self.streaming
+            elif command.strip() == b"reset":
+                self.streaming = False
+
+    def write(self, lines):
+        if not self.streaming:
+            return
+        for line in lines:
+            try:
+                os.write(self.master, line)
+            except (BlockingIOError, OSError):
+                self.dropped += 1
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+class SocketOutput():
+    # Sends the lines of one tag to a network receiver, named with a "TAG,<name>" line
+    DATAGRAM_SIZE = 1400
+
+    def __init__(self, name, host, port, protocol):
+        self.name = name
+        self.protocol = protocol
+        if protocol == "udp":
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect((host, port))
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.dropped = 0
+        self.write([f"TAG,{name}\n".encode()])
+
+    def poll(self):
+        pass
+
+    def write(self, lines):
+        if self.protocol != "udp":
+            # Blocks while the receiver is applying back-pressure, which shows up as a lower achieved rate
+            self.sock.sendall(b"".join(lines))
+            return
+        datagram = bytearray()
+        for line in lines:
+            if datagram and len(datagram) + len(line) > self.DATAGRAM_SIZE:
+                self.send_datagram(datagram)
+                datagram = bytearray()
+            datagram += line
+        if datagram:
+            self.send_datagram(datagram)
+
+    def send_datagram(self, datagram):
+        try:
+            self.sock.send(datagram)
+        except OSError:
+            self.dropped += 1 # Nothing listening (yet)
+
+    def close(self):
+        self.sock.close()
+
+def stream(simulator: TagSimulator, outputs, rate, duration=None, statsInterval=5.0):
+    # Send the samples of every tag to its output in real time, at rate samples per second per tag.
+    #   At high rates all the samples that are due are generated and sent as one batch.
+    start = time.monotonic()
+    emitted = 0
+    lines = 0
+    lastStats, lastLines = start, 0
+    while duration is None or emitted < duration * rate:
+        for output in outputs:
+            output.poll()
+        now = time.monotonic()
+        due = int((now - start) * rate)
+        if duration is not None:
+            due = min(due, int(duration * rate))
+        if due > emitted:
+            for output, columns in zip(outputs, simulator.sample(np.arange(emitted, due) / rate)):
+                batch = dist_lines(columns)
+                output.write(batch)
+                lines += len(batch)
+            emitted = due
+        if now - lastStats >= statsInterval:
+            dropped = sum(output.dropped for output in outputs)
+            print(f"{emitted / rate:.0f}s: {(lines - lastLines) / (now - lastStats):.0f} lines/s, {lines} lines, {dropped} dropped")
+            lastStats, lastLines = now, lines
+        time.sleep(max(0.0, min(1.0 / rate, 0.01) - (time.monotonic() - now)))
+    return lines
+
+def write_logs(simulator: TagSimulator, directory, rate, duration, logFormat="csv", chunk=60.0):
+    # Write one log per tag in the log format (YYYY-MM-DD-HH-MM-SS-<tag>.csv/.bin), as fast as possible.
+    #   Long logs are generated a chunk of time at a time to bound the memory used.
+    os.makedirs(directory, exist_ok=True)
+    prefix = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+    paths = [os.path.join(directory, f"{prefix}-{tag + 1}.{logFormat}") for tag in range(simulator.tags)]
+    writers = [open_logWriter(path) for path in paths]
+    try:
+        timestamps = np.arange(int(duration * rate)) / rate
+        step = max(int(chunk * rate), 1)
+        for start in range(0, len(timestamps), step):
+            for writer, columns in zip(writers, simulator.sample(timestamps[start:start + step])):
+                writer.write_columns(columns)
+    finally:
+        for writer in writers:
+            writer.close()
+    return paths
+
+# Generates DWM1001 location data for load and soak testing without hardware, e.g.
+#   python "./UWB Visualiser/simulator.py" pty --tags 4
+#   python "./UWB Visualiser/simulator.py" tcp --tags 50 --rate 100
+#   python "./UWB Visualiser/simulator.py" log --tags 4 --duration 600 -o logs
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate DWM1001 tags moving over an anchor layout.")
+    parser.add_argument("output", choices=["pty", "tcp", "udp", "log"],
+                        help="pty: a pseudo-terminal per tag to connect to, tcp/udp: send to the network receiver, log: write log files")
+    parser.add_argument("--tags", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=10.0, help="Samples per second per tag")
+    parser.add_argument("--duration", type=float, help="Seconds of data (default: until stopped, 60 for log)")
+    parser.add_argument("--trajectory", choices=TRAJECTORIES, default="circle")
+    parser.add_argument("--speed", type=float, default=TagSimulator.SPEED, help="Average tag speed (m/s)")
+    parser.add_argument("--anchors", help="CSV file of ID,X,Y,Z anchor rows (default: the anchors of the sample logs)")
+    parser.add_argument("--range-noise", type=float, default=TagSimulator.RANGE_NOISE, help="Standard deviation of the ranges (m)")
+    parser.add_argument("--dropout", type=float, default=TagSimulator.DROPOUT, help="Probability that a range is missing")
+    parser.add_argument("--sample-dropout", type=float, default=TagSimulator.SAMPLE_DROPOUT, help="Probability that a sample is missing")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--host", default="127.0.0.1", help="Address of the network receiver (tcp/udp)")
+    parser.add_argument("--port", type=int, default=5005, help="Port of the network receiver (tcp/udp)")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory of the logs (log)")
+    parser.add_argument("--format", choices=["csv", "bin"], default="csv", help="Log format (log)")
+    args = parser.parse_args()
+
+    anchors = load_anchorSurvey(args.anchors) if args.anchors else None
+    simulator = TagSimulator(args.tags, anchors, args.trajectory, args.speed, args.range_noise, args.dropout, args.sample_dropout, args.seed)
+
+    if args.output == "log":
+        duration = args.duration or 60.0
+        start = time.perf_counter()
+        paths = write_logs(simulator, args.output_dir, args.rate, duration, args.format)
+        print(f"Wrote {len(paths)} logs of {duration:.0f}s at {args.rate:g} Hz in {time.perf_counter() - start:.1f}s")
+        for path in paths:
+            print(path)
+        sys.exit(0)
+
+    try:
+        if args.output == "pty":
+            outputs = [PtyOutput(f"SIM{tag + 1}") for tag in range(args.tags)]
+            for output in outputs:
+                print(f"{output.name}: {output.path}")
+        else:
+            outputs = [SocketOutput(f"SIM{tag + 1}", args.host, args.port, args.output) for tag in range(args.tags)]
+    except (ImportError, OSError) as e:
+        print(f"Can't open the {args.output} outputs: {e}")
+        sys.exit(1)
+
+    try:
+        lines = stream(simulator, outputs, args.rate, args.duration)
+        print(f"Sent {lines} lines")
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Network Exception: {e}")
+    finally:
+        for output in outputs:
+            output.close()
+    sys.exit(0)
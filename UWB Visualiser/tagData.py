@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime
+import numpy as np
 
 @dataclass
 class TagPosition:
@@ -21,3 +22,24 @@ class TagData:
     TimeStamp = datetime
     TagPosition = TagPosition
     AnchorPositions = list[AnchorPosition]
+
+@dataclass
+class TagLogColumns:
+    # Columnar form of a tag log, one row per sample. Unused anchor slots (rows with fewer
+    #   anchors than the widest row) have an AnchorIndex of -1 and NaN positions/ranges.
+    TimeStamp: np.ndarray       # (n,) seconds
+    TagPosition: np.ndarray     # (n, 3) X, Y, Z in meters
+    QF: np.ndarray              # (n,) quality factor in percent
+    AnchorCount: np.ndarray     # (n,) number of anchors in the position calculation
+    AnchorIDs: np.ndarray       # (m,) anchor ID table
+    AnchorIndex: np.ndarray     # (n, k) index into AnchorIDs
+    AnchorPosition: np.ndarray  # (n, k, 3) X, Y, Z in meters
+    MetersFromTag: np.ndarray   # (n, k) range from the tag in meters
+
+    def __len__(self):
+        return len(self.TimeStamp)
+
+    def select(self, rows):
+        # Columns of the rows selected by an index array or boolean mask, sharing the anchor ID table
+        return TagLogColumns(self.TimeStamp[rows], self.TagPosition[rows], self.QF[rows], self.AnchorCount[rows], self.AnchorIDs,
+                             self.AnchorIndex[rows], self.AnchorPosition[rows], self.MetersFromTag[rows])
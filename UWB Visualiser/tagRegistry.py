@@ -0,0 +1,79 @@
+import colorsys
+import numpy as np
+from tagData import TagData
+
+def tag_colour(index, colours):
+    # The configured colours first, then hues spread by the golden ratio so any number of tags stay distinguishable
+    if index < len(colours):
+        return colours[index]
+    hue = ((index - len(colours)) * 0.618033988749895) % 1.0
+    r, g, b = colorsys.hsv_to_rgb(hue, 0.65, 0.95)
+    return f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}"
+
+class TagRegistry():
+    # Latest sample of every tag, for any number of tags. Each tag keeps the slot it was first seen in,
+    #   and the positions and QF are held in NumPy arrays indexed by slot so they can be drawn in one call.
+    #   It can be used like the {comPort: TagData} dictionary it replaces.
+    CAPACITY = 64
+
+    def __init__(self, capacity=CAPACITY):
+        self.index = {}         # comPort -> slot
+        self.comPorts = []
+        self.tagData = []
+        self.positionArray = np.zeros((capacity, 3))
+        self.qfArray = np.zeros(capacity, dtype=np.int16)
+
+    def clear(self):
+        self.index = {}
+        self.comPorts = []
+        self.tagData = []
+
+    def slot(self, comPort):
+        # Slot of the tag, adding it if it hasn't been seen before
+        slot = self.index.get(comPort)
+        if slot is None:
+            slot = len(self.comPorts)
+            if slot == len(self.positionArray):
+                self.positionArray = np.concatenate([self.positionArray, np.zeros_like(self.positionArray)])
+                self.qfArray = np.concatenate([self.qfArray, np.zeros_like(self.qfArray)])
+            self.index[comPort] = slot
+            self.comPorts.append(comPort)
+            self.tagData.append(None)
+        return slot
+
+    def update(self, comPort, td: TagData):
+        slot = self.slot(comPort)
+        self.tagData[slot] = td
+        self.positionArray[slot] = (td.TagPosition.X, td.TagPosition.Y, td.TagPosition.Z)
+        self.qfArray[slot] = td.TagPosition.QF
+
+    def positions(self):
+        # (n, 3) positions of the tags in slot order
+        return self.positionArray[:len(self.comPorts)]
+
+    def qf(self):
+        return self.qfArray[:len(self.comPorts)]
+
+    def __len__(self):
+        return len(self.comPorts)
+
+    def __contains__(self, comPort):
+        return comPort in self.index
+
+    def __getitem__(self, comPort):
+        return self.tagData[self.index[comPort]]
+
+    def __setitem__(self, comPort, td: TagData):
+        self.update(comPort, td)
+
+    def __iter__(self):
+        return iter(list(self.comPorts))
+
+    def keys(self):
+        return list(self.comPorts)
+
+    def values(self):
+        return list(self.tagData)
+
+    def items(self):
+        return list(zip(self.comPorts, self.tagData))
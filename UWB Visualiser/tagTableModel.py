@@ -0,0 +1,74 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6 import QtGui
+import numpy as np
+from tagRegistry import TagRegistry
+
+class TagTableModel(QAbstractTableModel):
+    # Table of the tag positions and QF read straight from the TagRegistry arrays. The view only asks
+    #   for the rows that are visible, so the cost of a frame doesn't grow with the number of tags.
+    COLUMNS = ["Tag", "X (m)", "Y (m)", "Z (m)", "QF (%)", "DOP"]
+    POOR_COVERAGE_COLOUR = "mistyrose"
+
+    def __init__(self, tags: TagRegistry, tagColours, parent=None):
+        super().__init__(parent)
+        self.tags = tags
+        self.tagColours = tagColours
+        self.rows = 0
+        self.dop = np.zeros(0)
+        self.poor = np.zeros(0, dtype=bool)
+
+    def refresh(self, coverage=None):
+        # Add the rows of new tags and repaint the values, called once per frame. The DOP of each tag's
+        #   position is looked up in the CoverageGrid, the tags in poorly covered areas are highlighted.
+        count = len(self.tags)
+        if coverage is not None:
+            self.dop, _ = coverage.lookup(self.tags.positions()[:, :2])
+            self.poor = coverage.poor(self.tags.positions()[:, :2])
+        else:
+            self.dop = np.full(count, np.nan)
+            self.poor = np.zeros(count, dtype=bool)
+        if count < self.rows:
+            self.beginResetModel()
+            self.rows = count
+            self.endResetModel()
+            return
+        if count > self.rows:
+            self.beginInsertRows(QModelIndex(), self.rows, count - 1)
+            self.rows = count
+            self.endInsertRows()
+        if self.rows:
+            self.dataChanged.emit(self.index(0, 1), self.index(self.rows - 1, len(self.COLUMNS) - 1), [Qt.ItemDataRole.DisplayRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row = index.row()
+        column = index.column()
+        if not index.isValid() or row >= len(self.tags):
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return f"TAG_{self.tags.comPorts[row]}"
+            if column == 4:
+                return int(self.tags.qfArray[row])
+            if column == 5:
+                return f"{self.dop[row]:.1f}" if row < len(self.dop) and np.isfinite(self.dop[row]) else "-"
+            return f"{self.tags.positionArray[row, column - 1]:.2f}"
+        if role == Qt.ItemDataRole.BackgroundRole and column == 0:
+            colour = self.tagColours.get(self.tags.comPorts[row])
+            return QtGui.QColor(colour) if colour else None
+        if role == Qt.ItemDataRole.BackgroundRole and column == 5 and row < len(self.poor) and self.poor[row]:
+            return QtGui.QColor(self.POOR_COVERAGE_COLOUR)
+        if role == Qt.ItemDataRole.TextAlignmentRole and column > 0:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
@@ -0,0 +1,72 @@
+import math
+import numpy as np
+
+class TagTrails():
+    # Recent positions of every tag in fixed size NumPy ring buffers, one per TagRegistry slot, so the memory
+    #   used doesn't grow with the length of a session or replay. Positions are decimated as they are stored:
+    #   a point is only added once the tag has moved STEP meters ("distance") or STEP seconds have passed
+    #   ("time", sample time, so it follows the replay speed) since the last stored point. Only the tags that
+    #   received samples are updated, so a stationary or silent tag doesn't fill its trail.
+    LENGTH = 500            # Points kept per tag
+    STEP = 0.05             # Meters or seconds between stored points
+    RENDER_POINTS = 200     # Longer trails are drawn with every n-th point
+
+    def __init__(self, length=LENGTH, decimation="distance", step=STEP):
+        if decimation not in ("distance", "time"):
+            raise ValueError("Decimation must be distance or time")
+        self.length = length
+        self.decimation = decimation
+        self.step = step
+        self.clear()
+
+    def clear(self):
+        self.points = np.zeros((0, self.length, 2))
+        self.head = np.zeros(0, dtype=np.int64)     # Index the next point is written to
+        self.count = np.zeros(0, dtype=np.int64)    # Points stored, up to length
+        self.lastTime = np.zeros(0)                 # Sample time of the last stored point (s)
+
+    def grow(self, slots):
+        # Add buffers for new tags, doubling so tags can be added one at a time cheaply
+        if slots <= len(self.points):
+            return
+        extra = max(slots - len(self.points), len(self.points))
+        self.points = np.concatenate([self.points, np.zeros((extra, self.length, 2))])
+        self.head = np.concatenate([self.head, np.zeros(extra, dtype=np.int64)])
+        self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+        self.lastTime = np.concatenate([self.lastTime, np.zeros(extra)])
+
+    def update(self, slots, positions, timestamps):
+        # Store the (n, 2) positions of the tags in slots, which received samples with the given sample times (s),
+        #   where they pass the decimation. A sample time before the last stored point (a replay restarted or
+        #   seeked back) is always stored.
+        slots = np.asarray(slots, dtype=np.int64)
+        if len(slots) == 0:
+            return
+        positions = np.asarray(positions, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.grow(int(slots.max()) + 1)
+        head = self.head[slots]
+        count = self.count[slots]
+        if self.decimation == "distance":
+            last = self.points[slots, (head - 1) % self.length]
+            store = (count == 0) | (np.linalg.norm(positions - last, axis=1) >= self.step)
+        else:
+            elapsed = timestamps - self.lastTime[slots]
+            store = (count == 0) | (elapsed >= self.step) | (elapsed < 0)
+        store &= np.isfinite(positions).all(axis=1)
+        slots, head, count = slots[store], head[store], count[store]
+        self.points[slots, head] = positions[store]
+        self.head[slots] = (head + 1) % self.length
+        self.count[slots] = np.minimum(count + 1, self.length)
+        self.lastTime[slots] = timestamps[store]
+
+    def trail(self, slot, maxPoints=RENDER_POINTS):
+        # (m, 2) points of a tag's trail, oldest first, with at most maxPoints (the newest point is always kept)
+        if slot >= len(self.points) or self.count[slot] == 0:
+            return np.zeros((0, 2))
+        count = int(self.count[slot])
+        index = (self.head[slot] - count + np.arange(count)) % self.length
+        stride = math.ceil(count / maxPoints)
+        if stride > 1:
+            index = index[::-1][::stride][::-1]
+        return self.points[slot, index]
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+import pytest
+from utils.binaryLog import BinaryLogWriter, BinaryLogFile, csv_toBinary, binary_toCsv
+from utils.tagDataUtils import TagDataUtils
+
+LOGS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "logs")
+
+# Rows with 3 and 4 anchors, an anchor that moves and one whose ID is reused with a new position
+LINES = ["0.1,3,949C,3.37,3.8,1.99,1.73,4818,0.65,2.49,2.1,2.52,DBA4,0.52,5.3,2.12,2.71,2.22,3.69,0.61,34",
+         "0.25,4,949C,3.37,3.8,1.99,1.75,4818,0.65,2.49,2.1,2.57,DBA4,0.52,5.3,2.12,2.71,870E,5.08,4.68,2.38,3.51,2.22,3.73,0.61,42",
+         "0.4,4,DBA4,0.52,5.3,2.12,2.68,949C,3.4,3.8,1.99,1.72,4818,0.65,2.49,2.1,2.52,870E,5.08,4.68,2.38,3.5,2.25,3.7,0.62,35",
+         "61.003,3,949C,3.4,3.8,1.99,1.7,870E,5.08,4.68,2.38,3.51,4818,0.65,2.49,2.1,2.54,-1.25,0.0,10.5,100"]
+
+@pytest.mark.parametrize("name", sorted(f for f in os.listdir(LOGS) if f.endswith(".csv")))
+def test_sampleLog_roundTrip(name, tmp_path):
+    # CSV -> binary -> CSV gives back the logged lines
+    source = os.path.join(LOGS, name)
+    binPath = str(tmp_path / "log.bin")
+    csvPath = str(tmp_path / "log.csv")
+    rows = csv_toBinary(source, binPath)
+    assert binary_toCsv(binPath, csvPath) == rows
+    with open(source) as f, open(csvPath) as g:
+        assert g.read().splitlines() == f.read().splitlines()
+
+def test_columns_roundTrip(tmp_path):
+    columns = TagDataUtils.lines_toColumns(None, LINES)
+    path = str(tmp_path / "log.bin")
+    with BinaryLogWriter(path) as writer:
+        writer.write_columns(columns.select(slice(0, 2)))
+        writer.write_columns(columns.select(slice(2, None)))
+    with BinaryLogFile(path) as log:
+        assert len(log) == len(LINES)
+        assert list(TagDataUtils.columns_toCsvLines(None, log.to_columns())) == LINES
+        assert list(TagDataUtils.columns_toCsvLines(None, log.to_columns(1, 3))) == LINES[1:3]
+        assert log.search(0.25) == 1 and log.search(1.0) == 3
+
+def test_tagData_roundTrip(tmp_path):
+    # Samples written one at a time read back as the same TagData as the CSV parser gives
+    samples = [TagDataUtils.csv_toTagData(None, line.split(",")) for line in LINES]
+    path = str(tmp_path / "log.bin")
+    with BinaryLogWriter(path) as writer:
+        for td in samples:
+            writer.write_tagData(td)
+    with BinaryLogFile(path) as log:
+        for i, td in enumerate(samples):
+            assert TagDataUtils.tagData_ToCSV(None, log.tagData(i)) == TagDataUtils.tagData_ToCSV(None, td)
+
+def test_partialRecord_ignored(tmp_path):
+    # A record still being written at the end of the log isn't read
+    path = str(tmp_path / "log.bin")
+    with BinaryLogWriter(path) as writer:
+        writer.write_columns(TagDataUtils.lines_toColumns(None, LINES))
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+    with BinaryLogFile(path) as log:
+        assert len(log) == len(LINES)
+        np.testing.assert_allclose(log.to_columns().TimeStamp, [0.1, 0.25, 0.4, 61.003])
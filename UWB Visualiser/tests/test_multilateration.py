@@ -0,0 +1,62 @@
+import numpy as np
+from tagData import TagLogColumns
+from utils.multilateration import Multilateration
+
+ANCHORS = np.array([[0.0, 0.0, 2.5], [6.0, 0.0, 2.0], [6.0, 5.0, 2.6], [0.0, 5.0, 1.8]])
+
+def range_columns(positions, anchors=ANCHORS, tagPosition=None):
+    # Rows of exact ranges from every anchor to the given tag positions
+    n, k = len(positions), len(anchors)
+    ranges = np.linalg.norm(positions[:, None, :] - anchors[None], axis=2)
+    tagPosition = np.full((n, 3), np.nan) if tagPosition is None else tagPosition
+    return TagLogColumns(np.arange(n, dtype=np.float64), tagPosition, np.full(n, 100), np.full(n, k), np.array([f"A{i}" for i in range(k)]),
+                         np.tile(np.arange(k), (n, 1)), np.tile(anchors, (n, 1, 1)), ranges)
+
+def tag_positions(n=50):
+    rng = np.random.default_rng(2)
+    return rng.uniform([0.5, 0.5, 0.0], [5.5, 4.5, 1.5], (n, 3))
+
+def device_positions(positions):
+    # The solve starts from the position reported by the tag, a few tens of cm out
+    rng = np.random.default_rng(3)
+    return positions + rng.normal(0.0, 0.2, positions.shape)
+
+def test_solve_recoversPositions():
+    positions = tag_positions()
+    result = Multilateration().solve(range_columns(positions, tagPosition=device_positions(positions)))
+    assert result.Valid.all()
+    np.testing.assert_allclose(result.TagPosition, positions, atol=1e-3)
+    assert np.nanmax(result.RMS) < 1e-3
+
+def test_solve_weightedAndRobust():
+    positions = tag_positions()
+    result = Multilateration(weighted=True, robust=True).solve(range_columns(positions, tagPosition=device_positions(positions)))
+    np.testing.assert_allclose(result.TagPosition, positions, atol=1e-3)
+
+def test_solve_fromAnchorCentroid():
+    # Without a device position the solve starts at the centroid of the anchors. The anchors are at
+    #   spread heights, with (nearly) coplanar anchors the reflection through their plane fits as well.
+    anchors = np.array([[0.0, 0.0, 0.3], [6.0, 0.0, 2.8], [6.0, 5.0, 0.4], [0.0, 5.0, 2.9]])
+    positions = tag_positions()
+    result = Multilateration().solve(range_columns(positions, anchors))
+    np.testing.assert_allclose(result.TagPosition, positions, atol=1e-3)
+
+def test_solve_2d():
+    # Coplanar anchors, Z is held at the device height
+    anchors = ANCHORS.copy()
+    anchors[:, 2] = 2.0
+    positions = tag_positions()
+    start = positions + [0.3, -0.3, 0.0]
+    result = Multilateration(dimensions=2).solve(range_columns(positions, anchors, start))
+    np.testing.assert_allclose(result.TagPosition, positions, atol=1e-3)
+
+def test_solve_unusedSlots():
+    # Missing ranges are skipped, rows with fewer anchors than dimensions are invalid
+    positions = tag_positions(3)
+    columns = range_columns(positions, np.vstack([ANCHORS, [[3.0, 2.5, 3.0]]]), device_positions(positions))
+    columns.MetersFromTag[1, 0] = np.nan
+    columns.AnchorIndex[2, :3] = -1
+    result = Multilateration().solve(columns)
+    assert result.Valid.tolist() == [True, True, False]
+    np.testing.assert_allclose(result.TagPosition[:2], positions[:2], atol=1e-3)
+    assert np.isnan(result.TagPosition[2]).all()
@@ -0,0 +1,58 @@
+import numpy as np
+from tagData import TagLogColumns
+from utils.tagFilter import TagFilter
+
+def track_columns(timestamps, positions, qf):
+    # Tag only columns, the filter doesn't look at the anchors
+    n = len(timestamps)
+    return TagLogColumns(np.array(timestamps, dtype=np.float64), np.array(positions, dtype=np.float64), np.array(qf), np.zeros(n, dtype=np.int64),
+                         np.array([], dtype="U4"), np.full((n, 0), -1), np.zeros((n, 0, 3)), np.zeros((n, 0)))
+
+def random_track():
+    # A walk sampled at 10 Hz with jitter, a gap longer than RESET_GAP and a jump back in time
+    rng = np.random.default_rng(1)
+    dt = rng.uniform(0.05, 0.15, 120)
+    dt[40] = TagFilter.RESET_GAP + 1.0
+    dt[80] = -0.5
+    timestamps = np.cumsum(dt)
+    positions = np.cumsum(rng.normal(0.0, 0.05, (120, 3)), axis=0)
+    qf = rng.integers(0, 101, 120)
+    return track_columns(timestamps, positions, qf)
+
+def stepped(columns):
+    # Reference: the live filter, one sample at a time
+    tagFilter = TagFilter()
+    slot = tagFilter.slot(0)
+    positions = []
+    for i in range(len(columns)):
+        tagFilter.step(np.array([slot]), columns.TimeStamp[i:i + 1], columns.TagPosition[i:i + 1], columns.QF[i:i + 1].astype(np.float64))
+        positions.append(tagFilter.position[slot].copy())
+    return np.array(positions), tagFilter
+
+def test_filterColumns_matchesStep():
+    columns = random_track()
+    expected, stepFilter = stepped(columns)
+    tagFilter = TagFilter()
+    filtered = tagFilter.filter_columns([columns])[0]
+    np.testing.assert_allclose(filtered, expected, atol=1e-9)
+    np.testing.assert_allclose(tagFilter.velocity, stepFilter.velocity, atol=1e-9)
+    np.testing.assert_allclose(tagFilter.covariance, stepFilter.covariance, atol=1e-12)
+
+def test_filterColumns_restartStartsAtMeasurement():
+    columns = random_track()
+    filtered = TagFilter().filter_columns([columns])[0]
+    for row in (0, 40, 80):
+        np.testing.assert_allclose(filtered[row], columns.TagPosition[row])
+
+def test_filterColumns_resumeMatchesWholeLog():
+    columns = random_track()
+    expected = TagFilter().filter_columns([columns])[0]
+    tagFilter = TagFilter()
+    chunks = [tagFilter.filter_columns([columns.select(slice(i, i + 17))], resume=i > 0)[0] for i in range(0, len(columns), 17)]
+    np.testing.assert_allclose(np.concatenate(chunks), expected, atol=1e-9)
+
+def test_filterColumns_severalTags():
+    tracks = [random_track(), random_track().select(slice(0, 50)), track_columns([], np.zeros((0, 3)), [])]
+    filtered = TagFilter().filter_columns(tracks)
+    for columns, positions in zip(tracks, filtered):
+        np.testing.assert_allclose(positions, stepped(columns)[0].reshape(-1, 3), atol=1e-9)
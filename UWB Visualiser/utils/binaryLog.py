@@ -0,0 +1,207 @@
+import os
+import numpy as np
+from tagData import TagData, AnchorPosition, TagPosition, TagLogColumns
+from utils.tagDataUtils import TagDataUtils
+
+# Binary log layout (little endian):
+#   Header:       magic "UWBL", version u2, anchor slots per record u2, anchor table capacity u2, anchor table count u2
+#   Anchor table: capacity x (anchor ID 8 bytes ASCII, X f4, Y f4, Z f4), one entry per anchor ID and position
+#   Records:      timestamp in ms u4, anchor count u1, QF u1, anchor table indices u2 x slots,
+#                 meters from tag f4 x slots, tag X, Y, Z f4
+MAGIC = b"UWBL"
+VERSION = 1
+HEADER_DTYPE = np.dtype([("Magic", "S4"), ("Version", "<u2"), ("Slots", "<u2"), ("Capacity", "<u2"), ("Count", "<u2")])
+ANCHOR_DTYPE = np.dtype([("AnchorID", "S8"), ("X", "<f4"), ("Y", "<f4"), ("Z", "<f4")])
+DEFAULT_SLOTS = 4
+DEFAULT_CAPACITY = 256
+DECIMALS = 3 # Of the float32 fields, positions and ranges are in meters to the millimetre
+
+def record_dtype(slots):
+    return np.dtype([("TimeStamp", "<u4"), ("AnchorCount", "u1"), ("QF", "u1"), ("AnchorIndex", "<u2", (slots,)),
+                     ("MetersFromTag", "<f4", (slots,)), ("TagPosition", "<f4", (3,))])
+
+def header_size(capacity):
+    return HEADER_DTYPE.itemsize + (ANCHOR_DTYPE.itemsize * capacity)
+
+def anchor_keys(columns: TagLogColumns):
+    # Distinct (anchor ID index, float32 position) pairs of a columnar log and the pair of each used anchor slot
+    used = columns.AnchorIndex >= 0
+    positions = columns.AnchorPosition[used].astype(np.float32)
+    keys, inverse = np.unique(np.column_stack([columns.AnchorIndex[used], positions.view(np.int32)]), axis=0, return_inverse=True)
+    return used, keys, inverse.ravel()
+
+def float32_toFloat(values):
+    # Convert float32 values back to the logged decimals (2.1 instead of 2.0999999). The DWM1001 positions and
+    #   ranges are whole millimetres, so rounding to DECIMALS recovers them without formatting the values as text.
+    return np.round(np.asarray(values, dtype=np.float32).astype(np.float64), DECIMALS)
+
+class BinaryLogWriter():
+    # Appends fixed-width records to a new binary log, anchors are added to the header table as they appear
+    def __init__(self, path, slots=DEFAULT_SLOTS, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.slots = slots
+        self.capacity = capacity
+        self.dtype = record_dtype(slots)
+        self.anchors = {}
+        self.file = open(path, "wb")
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header[0] = (MAGIC, VERSION, slots, capacity, 0)
+        self.file.write(header.tobytes())
+        self.file.write(np.zeros(capacity, dtype=ANCHOR_DTYPE).tobytes())
+
+    def anchor_index(self, anchorID, x, y, z):
+        # Index of the anchor in the table, adding it if the ID or its position is new
+        key = (anchorID, np.float32(x), np.float32(y), np.float32(z))
+        index = self.anchors.get(key)
+        if index is None:
+            index = len(self.anchors)
+            if index >= self.capacity:
+                raise ValueError(f"Anchor table full ({self.capacity} entries)")
+            self.anchors[key] = index
+            entry = np.array([(anchorID.encode("ascii"), x, y, z)], dtype=ANCHOR_DTYPE)
+            position = self.file.tell()
+            self.file.seek(HEADER_DTYPE.itemsize + (index * ANCHOR_DTYPE.itemsize))
+            self.file.write(entry.tobytes())
+            self.file.seek(HEADER_DTYPE.fields["Count"][1])
+            self.file.write(np.uint16(len(self.anchors)).tobytes())
+            self.file.seek(position)
+        return index
+
+    def write_tagData(self, td: TagData):
+        if len(td.AnchorPositions) > self.slots:
+            raise ValueError(f"{len(td.AnchorPositions)} anchors, the log has {self.slots} slots")
+        record = np.zeros(1, dtype=self.dtype)
+        record["TimeStamp"] = round(float(td.TimeStamp) * 1000)
+        record["AnchorCount"] = len(td.AnchorPositions)
+        record["QF"] = td.TagPosition.QF
+        for slot, a in enumerate(td.AnchorPositions):
+            record["AnchorIndex"][0, slot] = self.anchor_index(a.AnchorID, a.X, a.Y, a.Z)
+            record["MetersFromTag"][0, slot] = a.MetersFromTag
+        record["TagPosition"] = (td.TagPosition.X, td.TagPosition.Y, td.TagPosition.Z)
+        self.file.write(record.tobytes())
+
+    def write_columns(self, columns: TagLogColumns):
+        # Write a whole columnar log at once
+        n, k = columns.AnchorIndex.shape
+        if k > self.slots:
+            raise ValueError(f"{k} anchors, the log has {self.slots} slots")
+        records = np.zeros(n, dtype=self.dtype)
+        records["TimeStamp"] = np.round(columns.TimeStamp * 1000)
+        records["AnchorCount"] = columns.AnchorCount
+        records["QF"] = columns.QF
+        records["TagPosition"] = columns.TagPosition
+        records["MetersFromTag"][:, :k] = np.nan_to_num(columns.MetersFromTag)
+
+        # Anchor table entries for every distinct (ID, position) in the log
+        used, keys, inverse = anchor_keys(columns)
+        tableIndex = np.array([self.anchor_index(str(columns.AnchorIDs[key[0]]), *key[1:].view(np.float32)) for key in keys], dtype=np.uint16)
+        anchorIndex = np.zeros((n, k), dtype=np.uint16)
+        anchorIndex[used] = tableIndex[inverse]
+        records["AnchorIndex"][:, :k] = anchorIndex
+        self.file.write(records.tobytes())
+
+    def write_batch(self, tagDataList):
+        # Records of a batch of samples built and written at once
+        if tagDataList:
+            self.write_columns(TagDataUtils.tagDataList_toColumns(None, tagDataList))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class BinaryLogFile():
+    # Memory-mapped binary log, the records are read without any per-row parsing
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header["Magic"][0] != MAGIC:
+            raise ValueError(f"Not a binary log: {path}")
+        if header["Version"][0] != VERSION:
+            raise ValueError(f"Unsupported binary log version {header['Version'][0]}: {path}")
+        self.slots = int(header["Slots"][0])
+        capacity = int(header["Capacity"][0])
+        count = int(header["Count"][0])
+        self.dtype = record_dtype(self.slots)
+
+        table = np.fromfile(path, dtype=ANCHOR_DTYPE, count=count, offset=HEADER_DTYPE.itemsize)
+        self.anchorIDs = np.char.decode(table["AnchorID"], "ascii")
+        self.anchorPositions = np.column_stack([float32_toFloat(table[axis]) for axis in ("X", "Y", "Z")]) if count else np.zeros((0, 3))
+        self.anchorIDList = self.anchorIDs.tolist() # As Python values for tagData
+        self.anchorPositionList = self.anchorPositions.tolist()
+
+        # Ignore a partially written record at the end of a log that is still being written
+        offset = header_size(capacity)
+        n = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=offset, shape=(n,)) if n else np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def search(self, timestamp, side="left"):
+        # Index of the first record at or after the timestamp (seconds), or after it with side="right"
+        return int(np.searchsorted(self.records["TimeStamp"], round(timestamp * 1000), side))
+
+    def to_columns(self, start=0, stop=None):
+        records = self.records[start:stop]
+        n = len(records)
+        k = int(records["AnchorCount"].max()) if n else 0
+        used = np.arange(k) < records["AnchorCount"][:, None]
+        tableIndex = records["AnchorIndex"][:, :k].astype(np.int64)
+
+        # Columns index the unique anchor IDs, the table has one entry per ID and position
+        idTable, idIndex = np.unique(self.anchorIDs, return_inverse=True)
+        anchorIndex = np.full((n, k), -1, dtype=np.int16)
+        anchorIndex[used] = idIndex[tableIndex[used]]
+        anchorPosition = np.full((n, k, 3), np.nan)
+        anchorPosition[used] = self.anchorPositions[tableIndex[used]]
+        metersFromTag = np.full((n, k), np.nan)
+        metersFromTag[used] = float32_toFloat(records["MetersFromTag"][:, :k][used])
+
+        return TagLogColumns(records["TimeStamp"] / 1000, float32_toFloat(records["TagPosition"]), records["QF"].astype(np.int16),
+                             records["AnchorCount"].copy(), idTable, anchorIndex, anchorPosition, metersFromTag)
+
+    def tagData(self, index):
+        # One record as TagData, the fields are read as Python values at once and rounded like float32_toFloat
+        timeStamp, anchorCount, qf, anchorIndex, ranges, tagPosition = self.records[index].item()
+        t = TagData()
+        t.TimeStamp = str(timeStamp / 1000)
+        t.AnchorPositions = []
+        for tableIndex, metersFromTag in zip(anchorIndex.tolist()[:anchorCount], ranges.tolist()):
+            x, y, z = self.anchorPositionList[tableIndex]
+            t.AnchorPositions.append(AnchorPosition(self.anchorIDList[tableIndex], x, y, z, round(metersFromTag, DECIMALS)))
+        x, y, z = [round(v, DECIMALS) for v in tagPosition.tolist()]
+        t.TagPosition = TagPosition(x, y, z, qf)
+        return t
+
+    def close(self):
+        # Release the memory map
+        self.records = np.zeros(0, dtype=self.dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def csv_toBinary(csvPath, binPath):
+    columns = TagDataUtils.csvFile_toColumns(None, csvPath)
+    _, keys, _ = anchor_keys(columns)
+    with BinaryLogWriter(binPath, slots=max(columns.AnchorIndex.shape[1], DEFAULT_SLOTS), capacity=len(keys)) as writer:
+        writer.write_columns(columns)
+    return len(columns)
+
+def binary_toCsv(binPath, csvPath):
+    with BinaryLogFile(binPath) as log:
+        columns = log.to_columns()
+    with open(csvPath, "w") as f:
+        for line in TagDataUtils.columns_toCsvLines(None, columns):
+            f.write(f"{line}\n")
+    return len(columns)
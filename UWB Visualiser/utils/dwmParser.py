@@ -0,0 +1,74 @@
+from tagData import TagData, AnchorPosition, TagPosition
+
+def take_lines(buffer: bytearray):
+    # Remove the complete lines from the front of a receive buffer and return them, the partial line at the
+    #   end is kept for the next read
+    end = buffer.rfind(b'\n')
+    if end < 0:
+        return []
+    lines = bytes(buffer[:end + 1]).splitlines(keepends=True)
+    del buffer[:end + 1]
+    return lines
+
+class DwmParser():
+    # Parses the DWM1001 location ("lec") lines directly from the serial bytes, for any number of anchors:
+    #   DIST,<n>,AN0,<ID>,<X>,<Y>,<Z>,<range>,...,AN<n-1>,<ID>,<X>,<Y>,<Z>,<range>,POS,<X>,<Y>,<Z>,<QF>
+    #   Lines that aren't valid telemetry are counted by reason instead of raising.
+    def __init__(self):
+        self.lines = 0
+        self.parsed = 0
+        self.ignored = 0 # Non-telemetry lines (prompts, command echoes, blank lines)
+        self.malformed = {}
+
+    def reject(self, reason):
+        self.malformed[reason] = self.malformed.get(reason, 0) + 1
+        return None
+
+    def parse(self, line: bytes, timestamp):
+        # TagData of the line, or None if it isn't a valid location line.
+        #   The line is decoded once and split as a str, float() and int() are faster on str than on bytes
+        #   and ignore the trailing "\r\n" left on the QF field.
+        self.lines += 1
+        try:
+            fields = line.decode("ascii").split(',')
+        except UnicodeDecodeError:
+            if line.startswith(b"DIST,"):
+                return self.reject("number")
+            self.ignored += 1 # Noise while the device boots
+            return None
+        if fields[0] != "DIST":
+            self.ignored += 1
+            return None
+
+        try:
+            anchorCount = int(fields[1])
+        except (ValueError, IndexError):
+            return self.reject("anchor count")
+        posIndex = 2 + (6 * anchorCount)
+        if anchorCount < 1 or len(fields) != posIndex + 5:
+            if len(fields) == posIndex:
+                return self.reject("no position")
+            return self.reject("field count")
+        if fields[posIndex] != "POS":
+            return self.reject("no position")
+
+        try:
+            anchorPositions = []
+            for i in range(2, posIndex, 6):
+                if fields[i][:2] != "AN":
+                    return self.reject("anchor label")
+                anchorPositions.append(AnchorPosition(fields[i+1], float(fields[i+2]), float(fields[i+3]), float(fields[i+4]), float(fields[i+5])))
+            tagPosition = TagPosition(float(fields[posIndex+1]), float(fields[posIndex+2]), float(fields[posIndex+3]), int(fields[posIndex+4]))
+        except ValueError:
+            return self.reject("number")
+
+        t = TagData()
+        t.TimeStamp = str(timestamp)
+        t.AnchorPositions = anchorPositions
+        t.TagPosition = tagPosition
+        self.parsed += 1
+        return t
+
+    def summary(self):
+        errors = ", ".join(f"{reason}: {count}" for reason, count in self.malformed.items())
+        return f"{self.parsed}/{self.lines} lines parsed, {self.ignored} ignored, {sum(self.malformed.values())} malformed{f' ({errors})' if errors else ''}"
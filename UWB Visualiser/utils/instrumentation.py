@@ -0,0 +1,161 @@
+import time
+import json
+import numpy as np
+
+class RollingHistogram():
+    # Durations counted in log spaced bins (about 12% wide, 1 us to 100 s) over a rolling window. Two windows
+    #   are kept and the older is dropped as the window rolls, so percentiles cover the last one to two windows.
+    LOG_MIN = -6
+    LOG_MAX = 2
+    BINS_PER_DECADE = 20
+    WINDOW = 10.0 # (s)
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.bins = (self.LOG_MAX - self.LOG_MIN) * self.BINS_PER_DECADE
+        self.counts = np.zeros((2, self.bins), dtype=np.int64)
+        self.windowStart = time.perf_counter()
+        self.total = 0
+
+    def roll(self, now):
+        if now - self.windowStart >= self.window:
+            # Drop both windows if nothing has been recorded for longer than a window
+            self.counts[0] = self.counts[1] if now - self.windowStart < 2 * self.window else 0
+            self.counts[1] = 0
+            self.windowStart = now
+
+    def record(self, durations, now=None):
+        # Count an array of durations (s)
+        durations = np.asarray(durations, dtype=np.float64)
+        if durations.size == 0:
+            return
+        self.roll(time.perf_counter() if now is None else now)
+        index = np.floor((np.log10(np.maximum(durations, 10.0 ** self.LOG_MIN)) - self.LOG_MIN) * self.BINS_PER_DECADE)
+        self.counts[1] += np.bincount(np.clip(index, 0, self.bins - 1).astype(np.int64), minlength=self.bins)
+        self.total += durations.size
+
+    def count(self):
+        return int(self.counts.sum())
+
+    def percentiles(self, quantiles=(50, 95, 99)):
+        # Durations (s) at the quantiles, taken as the geometric centre of the bin they fall in
+        counts = self.counts.sum(axis=0)
+        n = counts.sum()
+        if n == 0:
+            return [float("nan")] * len(quantiles)
+        cumulative = np.cumsum(counts)
+        index = np.searchsorted(cumulative, [q / 100 * n for q in quantiles])
+        return (10.0 ** (self.LOG_MIN + ((np.minimum(index, self.bins - 1) + 0.5) / self.BINS_PER_DECADE))).tolist()
+
+class Instrumentation():
+    # Per stage latency of the samples and per tag rates, recorded on the GUI thread once per frame.
+    #   The readers stamp each sample with time.perf_counter() when it was read and parsed, and the sample
+    #   queue when it was queued, only while the queue's timed flag is set, so disabled costs one check.
+    #     parse: read -> parsed     emit: parsed -> queued     queue: queued -> drained by the frame
+    #     draw: drained -> redraw_plot done                    total: read -> redraw_plot done
+    #   The frame stages time the whole render_tick and its parts.
+    SAMPLE_STAGES = ["parse", "emit", "queue", "draw", "total"]
+    FRAME_STAGES = ["frame", "update", "filter", "redraw"]
+    SUMMARY_TAGS = 8    # Tags listed in the stats panel, the slowest first
+    RATE_WINDOW = 5.0   # (s)
+    GAP_FACTOR = 1.5    # A sample later than this many sample intervals counts the missing samples between
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.histograms = {stage: RollingHistogram() for stage in self.SAMPLE_STAGES + self.FRAME_STAGES}
+        self.start = time.perf_counter()
+        self.rateStart = self.start
+        self.counts = {}        # Tag -> samples in the current rate window
+        self.rates = {}         # Tag -> samples per second over the last rate window
+        self.samples = {}       # Tag -> samples since reset
+        self.missed = {}        # Tag -> samples missing from gaps in the timestamps
+        self.lastTimes = {}     # Tag -> timestamp of the last sample
+        self.intervals = {}     # Tag -> average sample interval (s)
+        self.frames = 0
+
+    def record_frame(self, samples, drained, updated, filtered, painted):
+        # Record a frame from the perf_counter() times of its stages, with the (tag, TagData) samples it drained
+        self.frames += 1
+        for stage, duration in (("frame", painted - drained), ("update", updated - drained), ("filter", filtered - updated), ("redraw", painted - filtered)):
+            self.histograms[stage].record([duration], painted)
+        if not samples:
+            return
+
+        # Samples queued before timing was enabled have no stamps
+        timing = np.array([getattr(td, "Timing", (np.nan, np.nan, np.nan)) for _, td in samples], dtype=np.float64)
+        timing = timing[np.isfinite(timing).all(axis=1)]
+        if len(timing):
+            self.histograms["parse"].record(timing[:, 1] - timing[:, 0], painted)
+            self.histograms["emit"].record(timing[:, 2] - timing[:, 1], painted)
+            self.histograms["queue"].record(drained - timing[:, 2], painted)
+            self.histograms["draw"].record(np.full(len(timing), painted - drained), painted)
+            self.histograms["total"].record(painted - timing[:, 0], painted)
+
+        for tag, td in samples:
+            self.counts[tag] = self.counts.get(tag, 0) + 1
+            self.samples[tag] = self.samples.get(tag, 0) + 1
+            self.record_gap(tag, float(td.TimeStamp))
+        if painted - self.rateStart >= self.RATE_WINDOW:
+            self.rates = {tag: count / (painted - self.rateStart) for tag, count in self.counts.items()}
+            self.counts = {}
+            self.rateStart = painted
+
+    def record_gap(self, tag, timestamp):
+        last = self.lastTimes.get(tag)
+        self.lastTimes[tag] = timestamp
+        if last is None or timestamp <= last:
+            return
+        dt = timestamp - last
+        interval = self.intervals.get(tag)
+        if interval is None:
+            self.intervals[tag] = dt
+            return
+        if dt > self.GAP_FACTOR * interval:
+            self.missed[tag] = self.missed.get(tag, 0) + int(round(dt / interval)) - 1
+        else:
+            self.intervals[tag] = (0.95 * interval) + (0.05 * dt)
+
+    def snapshot(self, dropped=None):
+        # Current statistics as a dictionary, dropped is the samples per tag discarded by the sample queue
+        dropped = dropped or {}
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            p50, p95, p99 = histogram.percentiles()
+            stages[stage] = {"p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000, "count": histogram.count()}
+        tags = {}
+        for tag in sorted(set(self.samples) | set(dropped), key=str):
+            tags[str(tag)] = {"rate_hz": self.rates.get(tag, 0.0), "samples": self.samples.get(tag, 0),
+                              "missed": self.missed.get(tag, 0), "dropped": dropped.get(tag, 0)}
+        elapsed = time.perf_counter() - self.start
+        return {"elapsed_s": elapsed, "frames": self.frames, "fps": self.frames / elapsed if elapsed > 0 else 0.0, "stages": stages, "tags": tags}
+
+    def summary(self, dropped=None):
+        # Text table of the snapshot for the stats panel
+        snapshot = self.snapshot(dropped)
+        lines = [f"{snapshot['fps']:.1f} frames/s", f"{'stage':<8}{'p50':>9}{'p95':>9}{'p99':>9} ms"]
+        for stage, s in snapshot["stages"].items():
+            if s["count"]:
+                lines.append(f"{stage:<8}{s['p50_ms']:9.2f}{s['p95_ms']:9.2f}{s['p99_ms']:9.2f}")
+        lines.append(f"{'tag':<14}{'Hz':>7}{'missed':>8}{'dropped':>8}")
+        tags = sorted(snapshot["tags"].items(), key=lambda item: item[1]["rate_hz"])
+        for tag, t in tags[:self.SUMMARY_TAGS]:
+            lines.append(f"{tag[-14:]:<14}{t['rate_hz']:7.1f}{t['missed']:8d}{t['dropped']:8d}")
+        if len(tags) > self.SUMMARY_TAGS:
+            lines.append(f"... {len(tags) - self.SUMMARY_TAGS} more tags")
+        return "\n".join(lines)
+
+    def export(self, path, dropped=None):
+        # Write the snapshot and the raw histogram bins as JSON
+        snapshot = self.snapshot(dropped)
+        snapshot["histograms"] = {stage: {"log10_min": h.LOG_MIN, "bins_per_decade": h.BINS_PER_DECADE, "counts": h.counts.sum(axis=0).tolist()}
+                                  for stage, h in self.histograms.items()}
+        with open(path, "w") as f:
+            json.dump(snapshot, f, indent=2)
+
+def stamp_queued(td, now):
+    # Complete the (read, parsed, queued) times of a sample, samples without a read time (replays) were
+    #   read and parsed just before being queued
+    timing = getattr(td, "Timing", None)
+    td.Timing = (timing[0], timing[1], now) if timing else (now, now, now)
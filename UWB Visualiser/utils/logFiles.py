@@ -0,0 +1,181 @@
+import os
+import gzip
+import lzma
+import numpy as np
+from tagData import TagData, TagLogColumns
+from utils.tagDataUtils import TagDataUtils
+from utils.binaryLog import BinaryLogFile, BinaryLogWriter
+from utils.logIndex import LogIndexBuilder, load_index, write_index
+
+# Streaming access to CSV and binary logs without Qt, one row at a time so whole files are never loaded
+LOG_EXTENSIONS = (".csv", ".bin", ".csv.gz", ".csv.xz")
+COMPRESSED_OPENERS = {".gz": gzip.open, ".xz": lzma.open} # Rotated CSV segments can be compressed
+CHUNK_ROWS = 65536 # Rows per chunk of iter_columns
+
+def split_logName(path):
+    # (name, format) of a log file, e.g. logs/2025-09-28-09-58-51-5.csv.gz -> (2025-09-28-09-58-51-5, csv)
+    name = os.path.basename(path)
+    base, extension = os.path.splitext(name)
+    if extension in COMPRESSED_OPENERS:
+        base, extension = os.path.splitext(base)
+    return base, extension[1:]
+
+def open_csvLog(path):
+    # Binary file object of a CSV log, decompressing gzip and lzma segments
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(path)[1], open)
+    return opener(path, 'rb')
+
+def in_range(timestamp, start=None, end=None):
+    return (start is None or timestamp >= start) and (end is None or timestamp <= end)
+
+def iter_log(path, errors=None, start=None, end=None):
+    # Yields the (timestamp, TagData) of every valid row, from start to end (seconds) if given. Malformed CSV
+    #   rows are skipped and counted in the errors dictionary if one is given. A time range of a CSV log is
+    #   found with its index, so only the rows in the range are read.
+    if path.endswith(".bin"):
+        with BinaryLogFile(path) as log:
+            first = log.search(start) if start is not None else 0
+            last = log.search(end, "right") if end is not None else len(log)
+            for i in range(first, last):
+                tagData = log.tagData(i)
+                yield float(tagData.TimeStamp), tagData
+        return
+
+    # Compressed logs can't be indexed, their rows are all read and filtered
+    compressed = os.path.splitext(path)[1] in COMPRESSED_OPENERS
+    first, last = (0, None) if compressed or (start is None and end is None) else load_index(path).byte_range(start, end)
+    with open_csvLog(path) as csvfile:
+        csvfile.seek(first)
+        offset = first
+        for line in csvfile:
+            if last is not None and offset >= last:
+                break
+            offset += len(line)
+            row = line.decode(errors='ignore').strip().split(',')
+            if row == ['']:
+                continue
+            try:
+                timestamp = float(row[0])
+                if in_range(timestamp, start, end):
+                    yield timestamp, TagDataUtils.csv_toTagData(None, row)
+            except (ValueError, IndexError) as e:
+                if errors is not None:
+                    reason = type(e).__name__
+                    errors[reason] = errors.get(reason, 0) + 1
+
+def load_columns(path, start=None, end=None):
+    # Log as NumPy columns for the vectorised processing, the rows from start to end (seconds) if given
+    if path.endswith(".bin"):
+        with BinaryLogFile(path) as log:
+            first = log.search(start) if start is not None else 0
+            last = log.search(end, "right") if end is not None else len(log)
+            return log.to_columns(first, last)
+    if start is None and end is None and os.path.splitext(path)[1] not in COMPRESSED_OPENERS:
+        return TagDataUtils.csvFile_toColumns(None, path)
+
+    if os.path.splitext(path)[1] in COMPRESSED_OPENERS:
+        with open_csvLog(path) as csvfile:
+            lines = csvfile.read().decode(errors='ignore').splitlines()
+    else:
+        first, last = load_index(path).byte_range(start, end)
+        with open(path, 'rb') as csvfile:
+            csvfile.seek(first)
+            lines = csvfile.read(last - first).decode(errors='ignore').splitlines()
+    return lines_inRange(lines, start, end)
+
+def iter_columns(path, start=None, end=None, chunkRows=CHUNK_ROWS):
+    # Yields the log as NumPy columns of up to chunkRows rows, from start to end (seconds) if given, so the
+    #   vectorised processing doesn't load whole files. Each chunk has its own anchor ID table.
+    if path.endswith(".bin"):
+        with BinaryLogFile(path) as log:
+            first = log.search(start) if start is not None else 0
+            last = log.search(end, "right") if end is not None else len(log)
+            for i in range(first, last, chunkRows):
+                yield log.to_columns(i, min(i + chunkRows, last))
+        return
+
+    compressed = os.path.splitext(path)[1] in COMPRESSED_OPENERS
+    first, last = (0, None) if compressed or (start is None and end is None) else load_index(path).byte_range(start, end)
+    with open_csvLog(path) as csvfile:
+        csvfile.seek(first)
+        offset = first
+        lines = []
+        for line in csvfile:
+            if last is not None and offset >= last:
+                break
+            offset += len(line)
+            lines.append(line.decode(errors='ignore').rstrip())
+            if len(lines) == chunkRows:
+                columns = lines_inRange(lines, start, end)
+                if len(columns):
+                    yield columns
+                lines = []
+        if lines:
+            columns = lines_inRange(lines, start, end)
+            if len(columns):
+                yield columns
+
+def lines_inRange(lines, start=None, end=None):
+    # Columns of the CSV lines with a timestamp from start to end (seconds)
+    columns = TagDataUtils.lines_toColumns(None, lines)
+    if start is None and end is None:
+        return columns
+    keep = np.ones(len(columns), dtype=bool)
+    if start is not None:
+        keep &= columns.TimeStamp >= start
+    if end is not None:
+        keep &= columns.TimeStamp <= end
+    return columns.select(keep)
+
+def comPort_fromFilename(path):
+    # COM port number at the end of the log filename (YYYY-MM-DD-HH-MM-SS-ComPort.csv), None if missing
+    name, _ = split_logName(path)
+    comPort = name[name.rfind('-')+1:]
+    return comPort if comPort.isdigit() else None
+
+class CsvLogWriter():
+    # Writes a CSV log and indexes the rows as they are written, the index sidecar is saved on close
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w")
+        self.index = LogIndexBuilder()
+
+    def write_line(self, line, timestamp):
+        # Text mode writes the platform's line ending
+        self.file.write(f"{line}\n")
+        self.index.add(timestamp, len(line.encode()) + len(os.linesep))
+
+    def write_tagData(self, td: TagData):
+        self.write_line(TagDataUtils.tagData_ToCSV(None, td), float(td.TimeStamp))
+
+    def write_batch(self, tagDataList):
+        # Rows formatted and written with one call
+        lines = [TagDataUtils.tagData_ToCSV(None, td) for td in tagDataList]
+        self.file.write("".join(f"{line}\n" for line in lines))
+        for line, td in zip(lines, tagDataList):
+            self.index.add(float(td.TimeStamp), len(line.encode()) + len(os.linesep))
+
+    def write_columns(self, columns: TagLogColumns):
+        for line, timestamp in zip(TagDataUtils.columns_toCsvLines(None, columns), columns.TimeStamp.tolist()):
+            self.write_line(line, timestamp)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.close()
+        write_index(self.path, self.index.index())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def open_logWriter(path):
+    # Writer for the log format given by the file extension
+    if path.endswith(".bin"):
+        return BinaryLogWriter(path)
+    return CsvLogWriter(path)
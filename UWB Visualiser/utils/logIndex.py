@@ -0,0 +1,132 @@
+import os
+from array import array
+import numpy as np
+
+# Time index of a CSV log, kept next to the log in a sidecar file (<log>.csv.idx) so a replay can seek and a
+#   time range can be read without scanning the rows before it. Binary logs have fixed-width records with
+#   the timestamps in them, so they are searched directly and don't need an index.
+#   Sidecar layout (little endian):
+#     Header: magic "UWBI", version u2, rows u8, log size in bytes u8, log mtime in ns i8
+#     Rows:   timestamp f8 x rows, then byte offset u8 x rows
+#   The index is stale, and rebuilt from the log, when the log's size or modification time doesn't match.
+MAGIC = b"UWBI"
+VERSION = 1
+SUFFIX = ".idx"
+HEADER_DTYPE = np.dtype([("Magic", "S4"), ("Version", "<u2"), ("Rows", "<u8"), ("Size", "<u8"), ("MTime", "<i8")])
+
+class LogIndex():
+    def __init__(self, timestamps, offsets, size):
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.size = size # Bytes of the log that are indexed
+        # Logs aren't always in time order, so rows are found with the running maximum (from the start) and
+        #   minimum (from the end) of the timestamps, which are sorted and never skip a row in the range
+        self.lower = np.maximum.accumulate(self.timestamps) if len(self.timestamps) else self.timestamps
+        self.upper = np.minimum.accumulate(self.timestamps[::-1])[::-1] if len(self.timestamps) else self.timestamps
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def search(self, timestamp):
+        # Index of the first row at or after the timestamp (seconds), len() if there isn't one
+        return int(np.searchsorted(self.lower, timestamp, "left"))
+
+    def offset(self, row):
+        # Byte offset of a row, the end of the indexed log past the last row
+        return int(self.offsets[row]) if row < len(self.offsets) else self.size
+
+    def byte_range(self, start=None, end=None):
+        # (first, last) byte offsets of the rows that may be from start to end (seconds), the rows
+        #   outside the range are only included where the log goes back in time
+        first = self.search(start) if start is not None else 0
+        last = int(np.searchsorted(self.upper, end, "right")) if end is not None else len(self)
+        return self.offset(first), self.offset(max(first, last))
+
+def index_path(path):
+    return path + SUFFIX
+
+def log_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def read_index(path):
+    # Index of the log from its sidecar, None if there isn't one or it is stale
+    try:
+        size, mtime = log_stat(path)
+        with open(index_path(path), "rb") as f:
+            header = np.frombuffer(f.read(HEADER_DTYPE.itemsize), dtype=HEADER_DTYPE)
+            if len(header) != 1 or header["Magic"][0] != MAGIC or header["Version"][0] != VERSION:
+                return None
+            if int(header["Size"][0]) != size or int(header["MTime"][0]) != mtime:
+                return None
+            rows = int(header["Rows"][0])
+            timestamps = np.fromfile(f, dtype="<f8", count=rows)
+            offsets = np.fromfile(f, dtype="<u8", count=rows)
+    except (OSError, ValueError):
+        return None
+    if len(timestamps) != rows or len(offsets) != rows:
+        return None
+    return LogIndex(timestamps, offsets.astype(np.int64), size)
+
+def write_index(path, index: LogIndex):
+    # Write the sidecar of a closed log, written to a temporary file first so readers never see part of it.
+    #   Logs in read-only directories just aren't indexed on disk.
+    size, mtime = log_stat(path)
+    if size != index.size:
+        return False
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (MAGIC, VERSION, len(index), size, mtime)
+    temporary = index_path(path) + ".tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(header.tobytes())
+            f.write(index.timestamps.astype("<f8").tobytes())
+            f.write(index.offsets.astype("<u8").tobytes())
+        os.replace(temporary, index_path(path))
+    except OSError as e:
+        print(f"Index Exception: {e}")
+        return False
+    return True
+
+def build_index(path):
+    # Index every row with a timestamp by scanning the log, the size is taken before the scan so rows
+    #   appended while scanning (a log still being written) aren't indexed
+    size, _ = log_stat(path)
+    timestamps = array("d")
+    offsets = array("q")
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if offset + len(line) > size:
+                break
+            try:
+                timestamps.append(float(line.split(b',', 1)[0]))
+                offsets.append(offset)
+            except ValueError:
+                pass # Malformed rows and blank lines
+            offset += len(line)
+    return LogIndex(np.array(timestamps, dtype=np.float64), np.array(offsets, dtype=np.int64), offset)
+
+def load_index(path):
+    # Index of a CSV log, built and saved on first use or when the log has changed
+    index = read_index(path)
+    if index is None:
+        index = build_index(path)
+        write_index(path, index)
+    return index
+
+class LogIndexBuilder():
+    # Indexes the rows of a CSV log as they are written, so a new log has its sidecar as soon as it is closed
+    def __init__(self):
+        self.timestamps = array("d")
+        self.offsets = array("q")
+        self.size = 0
+
+    def add(self, timestamp, length):
+        # A row of length bytes (including the line ending) written at the end of the log
+        self.timestamps.append(timestamp)
+        self.offsets.append(self.size)
+        self.size += length
+
+    def index(self):
+        return LogIndex(np.array(self.timestamps, dtype=np.float64), np.array(self.offsets, dtype=np.int64), self.size)
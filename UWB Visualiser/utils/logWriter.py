@@ -0,0 +1,205 @@
+import os
+import time
+import queue
+import shutil
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from utils.logFiles import open_logWriter, COMPRESSED_OPENERS
+from utils.logIndex import index_path
+
+COMPRESSIONS = {"gzip": ".gz", "lzma": ".xz"}
+
+@dataclass(frozen=True)
+class LogPolicy:
+    flushInterval: float = 1.0      # Seconds between flushes of the written rows to the OS
+    fsync: bool = False             # Also fsync at every flush, so the rows survive a power loss
+    rotateSize: int = None          # Start a new segment when the segment reaches this many bytes
+    rotateInterval: float = None    # or has been written for this many seconds
+    compression: str = None         # "gzip" or "lzma" to compress the CSV segments once they are closed (binary logs are memory mapped)
+
+class RotatingLog():
+    # The log of one port, written as segments named like any other log (YYYY-MM-DD-HH-MM-SS-<port>.<format>)
+    #   with the time each segment was started, so every segment can be replayed or processed on its own.
+    #   The timestamps in the rows carry on from the start of the session. When a write fails the segment is
+    #   closed and the next batch starts a new one, retrying every RETRY_TIME while segments can't be opened.
+    RETRY_TIME = 5.0
+
+    def __init__(self, directory, port, logFormat, policy: LogPolicy, compressor=None):
+        self.directory = directory
+        self.port = port
+        self.logFormat = logFormat
+        self.policy = policy
+        self.compressor = compressor # Executor the closed segments are compressed on
+        self.writer = None
+        self.segments = []
+        self.rows = 0
+        self.dropped = 0
+        self.retryTime = 0.0 # time.monotonic() from which a new segment is opened after a failure
+        self.open_segment()
+
+    def open_segment(self):
+        # Segments started within the same second are named with the next free second
+        start = datetime.now()
+        for seconds in range(60):
+            path = os.path.join(self.directory, f"{(start + timedelta(seconds=seconds)).strftime('%Y-%m-%d-%H-%M-%S')}-{self.port}.{self.logFormat}")
+            if path not in self.segments and not os.path.exists(path):
+                break
+        self.writer = open_logWriter(path)
+        self.segments.append(path)
+        self.segmentStart = time.monotonic()
+
+    def write_batch(self, tagDataList):
+        if self.writer is None:
+            if time.monotonic() < self.retryTime:
+                self.dropped += len(tagDataList)
+                return
+            try:
+                self.open_segment()
+            except OSError as e:
+                print(f"Logging Exception: {e}, retrying in {self.RETRY_TIME:.0f}s")
+                self.retryTime = time.monotonic() + self.RETRY_TIME
+                self.dropped += len(tagDataList)
+                return
+        try:
+            self.writer.write_batch(tagDataList)
+            self.rows += len(tagDataList)
+        except (OSError, ValueError) as e:
+            # Disk full, anchor table full, etc. The batch is dropped and the next batch starts a new segment
+            print(f"Logging Exception: {e}, starting a new segment")
+            self.dropped += len(tagDataList)
+            self.close_segment()
+            return
+        if self.rotation_due():
+            self.close_segment() # The next batch starts the new segment
+
+    def rotation_due(self):
+        if self.policy.rotateSize is not None and self.writer.file.tell() >= self.policy.rotateSize:
+            return True
+        return self.policy.rotateInterval is not None and time.monotonic() - self.segmentStart >= self.policy.rotateInterval
+
+    def flush(self):
+        if self.writer is None:
+            return
+        try:
+            self.writer.flush()
+            if self.policy.fsync:
+                os.fsync(self.writer.file.fileno())
+        except OSError as e:
+            print(f"Logging Exception: {e}")
+
+    def close_segment(self):
+        if self.writer is None:
+            return
+        writer, self.writer = self.writer, None
+        try:
+            writer.close()
+        except OSError as e:
+            print(f"Logging Exception: {e}")
+            return
+        if self.policy.compression and self.compressor is not None and writer.path.endswith(".csv"):
+            self.compressor.submit(compress_segment, writer.path, self.policy.compression)
+
+    def close(self):
+        self.close_segment()
+        dropped = f", {self.dropped} rows dropped" if self.dropped else ""
+        print(f"Logged {self.rows} rows from {self.port} in {len(self.segments)} segment{'' if len(self.segments) == 1 else 's'}{dropped}")
+
+def compress_segment(path, compression):
+    # Compress a closed segment next to it, then remove the segment and its index (compressed logs are read whole)
+    output = path + COMPRESSIONS[compression]
+    try:
+        with open(path, 'rb') as source, COMPRESSED_OPENERS[COMPRESSIONS[compression]](output, 'wb') as target:
+            shutil.copyfileobj(source, target, 1 << 20)
+        os.remove(path)
+        if os.path.exists(index_path(path)):
+            os.remove(index_path(path))
+    except OSError as e:
+        print(f"Compression Exception: {e}")
+
+class LogWriter(threading.Thread):
+    # Writes the logs of every port from one thread, so formatting rows and disk writes never stall the reads.
+    #   Samples are handed over through a bounded queue and written in batches of up to BATCH_SIZE rows per
+    #   log, the logs are flushed every policy.flushInterval seconds. When the disk can't keep up and the queue
+    #   is full, samples are dropped (and counted) rather than blocking the reader.
+    QUEUE_SIZE = 50000
+    BATCH_SIZE = 2000
+
+    def __init__(self, policy: LogPolicy = LogPolicy()):
+        super().__init__(name="LogWriter", daemon=True)
+        if policy.compression is not None and policy.compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {policy.compression}")
+        self.policy = policy
+        self.queue = queue.Queue(self.QUEUE_SIZE)
+        self.compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LogCompressor") if policy.compression else None
+        self.logs = set() # Logs opened and not yet closed, only used by the writer thread
+
+    def open_log(self, directory, port, logFormat):
+        # Create the log's first segment on the caller's thread, so a log that can't be created is reported there
+        return RotatingLog(directory, port, logFormat, self.policy, self.compressor)
+
+    def write(self, log: RotatingLog, tagData):
+        # Queue a sample without blocking, False if it was dropped
+        try:
+            self.queue.put_nowait((log, tagData))
+            return True
+        except queue.Full:
+            log.dropped += 1
+            return False
+
+    def close_log(self, log: RotatingLog):
+        # The log is closed once the samples queued before it have been written
+        if self.is_alive():
+            self.queue.put((log, None))
+        else:
+            log.close()
+
+    def stop(self):
+        # Write and close every queued log, then wait for the compression of the closed segments
+        self.queue.put((None, None))
+        self.join()
+        if self.compressor is not None:
+            self.compressor.shutdown(wait=True)
+
+    def run(self):
+        lastFlush = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                items = [self.queue.get(timeout=self.policy.flushInterval)]
+            except queue.Empty:
+                items = []
+            while len(items) < self.BATCH_SIZE:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Batch the samples of each log, keeping the samples queued before a close in its log
+            batches = {}
+            for log, tagData in items:
+                if tagData is not None:
+                    batches.setdefault(log, []).append(tagData)
+                    self.logs.add(log)
+                    continue
+                if log is None:
+                    stopping = True
+                    continue
+                if log in batches:
+                    log.write_batch(batches.pop(log))
+                log.close()
+                self.logs.discard(log)
+            for log, batch in batches.items():
+                log.write_batch(batch)
+
+            now = time.monotonic()
+            if now - lastFlush >= self.policy.flushInterval:
+                for log in self.logs:
+                    log.flush()
+                lastFlush = now
+
+        # Logs that weren't closed by their port
+        for log in list(self.logs):
+            log.close()
+        self.logs.clear()
@@ -0,0 +1,149 @@
+import numpy as np
+from dataclasses import dataclass
+from tagData import TagLogColumns
+from utils.tagDataUtils import TagDataUtils
+
+@dataclass
+class MultilaterationResult:
+    # Solved position of every row of a columnar log. Rows that couldn't be solved (too few anchors)
+    #   have Valid False and NaN values.
+    TagPosition: np.ndarray  # (n, 3) X, Y, Z in meters
+    Residuals: np.ndarray    # (n, k) distance to the anchor minus the measured range, NaN for unused slots
+    RMS: np.ndarray          # (n,) root mean square of the residuals
+    DOP: np.ndarray          # (n,) dilution of precision of the anchor geometry (PDOP in 3D, HDOP in 2D)
+    Valid: np.ndarray        # (n,) bool
+    Iterations: int
+
+    def __len__(self):
+        return len(self.TagPosition)
+
+class Multilateration():
+    # Least squares tag positions from the anchor positions and ranges, solved for every row at once by
+    #   Gauss-Newton iterations on (n, 3, 3) normal equations. Works with any number of anchors, unused
+    #   slots are given zero weight.
+    #   - weighted: ranges are weighted by 1/range^2, longer UWB ranges are noisier
+    #   - robust: Huber reweighting, so a single NLOS range doesn't drag the solution
+    #   - dimensions=2: solves X and Y only with Z held at the initial height, for anchors that are
+    #     (nearly) coplanar, where Z is poorly determined
+    ITERATIONS = 20
+    TOLERANCE = 1e-4    # Stop when no row moves by more than this (m)
+    HUBER_DELTA = 0.1   # Residuals beyond this (m) are downweighted when robust
+    DAMPING = 1e-6      # Keeps the normal equations solvable with poor anchor geometry
+
+    def __init__(self, dimensions=3, weighted=False, robust=False, iterations=ITERATIONS, huberDelta=HUBER_DELTA, anchorOverrides=None):
+        if dimensions not in (2, 3):
+            raise ValueError("Dimensions must be 2 or 3")
+        self.dimensions = dimensions
+        self.weighted = weighted
+        self.robust = robust
+        self.iterations = iterations
+        self.huberDelta = huberDelta
+        self.anchorOverrides = anchorOverrides or {}
+
+    def anchor_positions(self, columns: TagLogColumns):
+        # Anchor positions of every row, with the surveyed positions in anchorOverrides replacing the logged ones
+        anchorPosition = columns.AnchorPosition
+        if self.anchorOverrides and anchorPosition.size:
+            anchorPosition = anchorPosition.copy()
+            anchorIDs = [str(a) for a in columns.AnchorIDs]
+            for anchorID, position in self.anchorOverrides.items():
+                if anchorID in anchorIDs:
+                    anchorPosition[columns.AnchorIndex == anchorIDs.index(anchorID)] = position
+        return anchorPosition
+
+    def initial_positions(self, columns: TagLogColumns, anchorPosition, used):
+        # Start from the device position, or the centroid of the anchors if it's missing
+        initial = columns.TagPosition.astype(np.float64)
+        missing = ~np.isfinite(initial).all(axis=1)
+        if np.any(missing):
+            counts = np.maximum(used[missing].sum(axis=1), 1)[:, None]
+            initial[missing] = np.where(used[missing][:, :, None], anchorPosition[missing], 0).sum(axis=1) / counts
+        return initial
+
+    def solve(self, columns: TagLogColumns, initial=None):
+        n, k = columns.MetersFromTag.shape
+        d = self.dimensions
+        anchorPosition = self.anchor_positions(columns)
+        used = (columns.AnchorIndex >= 0) & np.isfinite(columns.MetersFromTag) & np.isfinite(anchorPosition).all(axis=2)
+        ranges = np.where(used, columns.MetersFromTag, 0.0)
+        anchors = np.where(used[:, :, None], anchorPosition, 0.0)
+        position = self.initial_positions(columns, anchors, used) if initial is None else np.array(initial, dtype=np.float64)
+
+        weights = used.astype(np.float64)
+        if self.weighted:
+            weights /= np.maximum(ranges, 0.1) ** 2
+        identity = np.eye(d) * self.DAMPING
+
+        # Only the rows that haven't converged yet are iterated
+        active = np.arange(n)
+        iteration = 0
+        for iteration in range(1, self.iterations + 1):
+            delta = position[active, None, :] - anchors[active]
+            distance = np.maximum(np.linalg.norm(delta, axis=2), 1e-9)
+            residuals = distance - ranges[active]
+            w = weights[active]
+            if self.robust:
+                w = w * np.minimum(1.0, self.huberDelta / np.maximum(np.abs(residuals), 1e-12))
+
+            # Normal equations of the linearised problem: (J^T W J) step = -J^T W r
+            J = delta[:, :, :d] / distance[:, :, None]
+            JW = J * w[:, :, None]
+            JWt = JW.transpose(0, 2, 1)
+            normal = (JWt @ J) + identity
+            step = np.linalg.solve(normal, -(JWt @ residuals[:, :, None]))[:, :, 0]
+            position[active, :d] += step
+            active = active[np.abs(step).max(axis=1) >= self.TOLERANCE]
+            if len(active) == 0:
+                break
+
+        delta = position[:, None, :] - anchors
+        distance = np.linalg.norm(delta, axis=2)
+        residuals = np.where(used, distance - ranges, np.nan)
+        anchorCount = used.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rms = np.sqrt(np.nansum(residuals ** 2, axis=1) / anchorCount)
+        dop = geometry_dop(delta[:, :, :d], distance, used)
+
+        valid = (anchorCount >= d) & np.isfinite(position).all(axis=1)
+        position[~valid] = np.nan
+        rms[~valid] = np.nan
+        return MultilaterationResult(position, residuals, rms, dop, valid, iteration)
+
+    def solve_tagData(self, tagDataList):
+        # Solve a batch of live samples
+        return self.solve(TagDataUtils.tagDataList_toColumns(None, tagDataList))
+
+    def resolve_columns(self, columns: TagLogColumns):
+        # Copy of the columns with the solved tag positions (where valid) and corrected anchor positions
+        result = self.solve(columns)
+        tagPosition = np.where(result.Valid[:, None], result.TagPosition, columns.TagPosition)
+        resolved = TagLogColumns(columns.TimeStamp, np.round(tagPosition, 2), columns.QF, columns.AnchorCount, columns.AnchorIDs,
+                                 columns.AnchorIndex, self.anchor_positions(columns), columns.MetersFromTag)
+        return resolved, result
+
+def geometry_dop(delta, distance, used):
+    # Geometry only DOP of each row, from the unweighted unit vectors of the (n, k, d) offsets from the anchors
+    #   at the (n, k) distances, for the (n, k) anchors used. NaN where the anchors can't fix a position.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        J = np.where(used[:, :, None], delta / np.maximum(distance, 1e-9)[:, :, None], 0.0)
+        normal = J.transpose(0, 2, 1) @ J
+        determinant = np.linalg.det(normal)
+        conditioned = np.abs(determinant) > 1e-12
+        dop = np.full(len(delta), np.nan)
+        if np.any(conditioned):
+            dop[conditioned] = np.sqrt(np.trace(np.linalg.inv(normal[conditioned]), axis1=1, axis2=2))
+    return dop
+
+def load_anchorSurvey(path):
+    # Surveyed anchor positions from a CSV file of ID,X,Y,Z rows
+    survey = {}
+    with open(path, 'r', newline='') as csvfile:
+        for line in csvfile:
+            row = line.strip().split(',')
+            if len(row) != 4:
+                continue
+            try:
+                survey[row[0]] = tuple(float(v) for v in row[1:])
+            except ValueError:
+                continue # Header row
+    return survey
@@ -1,4 +1,5 @@
-from tagData import TagData, AnchorPosition, TagPosition
+import numpy as np
+from tagData import TagData, AnchorPosition, TagPosition, TagLogColumns
 
 class TagDataUtils():
     def serial_toTagData(self, row):
@@ -45,4 +46,144 @@ class TagDataUtils():
             anchorPositions += f"{ap.AnchorID},{ap.X},{ap.Y},{ap.Z},{ap.MetersFromTag},"
         
         csvLine = f"{td.TimeStamp},{len(td.AnchorPositions)},{anchorPositions}{td.TagPosition.X},{td.TagPosition.Y},{td.TagPosition.Z},{td.TagPosition.QF}"
-        return csvLine
\ No newline at end of file
+        return csvLine
+
+    def csvFile_toColumns(self, path):
+        # Load a whole CSV log into NumPy columns
+        with open(path, 'r', newline='') as csvfile:
+            return TagDataUtils.lines_toColumns(self, csvfile.read().splitlines())
+
+    def lines_toColumns(self, lines):
+        # Lines are grouped by their number of fields (anchor count) and each group is parsed by NumPy in one call.
+        #   Row layout: timestamp, anchor count, (ID, X, Y, Z, range) per anchor, tag X, Y, Z, QF
+        groups = {}
+        skipped = 0
+        for i, line in enumerate(lines):
+            commas = line.count(',')
+            if commas < 10 or (commas - 5) % 5 != 0:
+                skipped += 1
+                continue
+            group = groups.setdefault((commas - 5) // 5, ([], []))
+            group[0].append(i)
+            group[1].append(line)
+
+        parsed = []
+        for anchorCount, (lineNumbers, groupLines) in groups.items():
+            dtype = columns_dtype(anchorCount)
+            try:
+                data = np.loadtxt(groupLines, delimiter=',', dtype=dtype, ndmin=1)
+            except ValueError:
+                # Drop the lines with fields that loadtxt can't convert (a float QF or anchor count as well as
+                #   text in a number) and parse the rest
+                numeric = [(j, int if dtype[j].kind == "i" else float) for j in range(len(dtype)) if dtype[j].kind != "U"]
+                valid = []
+                for lineNumber, line in zip(lineNumbers, groupLines):
+                    fields = line.split(',')
+                    try:
+                        for j, convert in numeric:
+                            convert(fields[j])
+                        valid.append((lineNumber, line))
+                    except ValueError:
+                        skipped += 1
+                lineNumbers = [v[0] for v in valid]
+                data = np.loadtxt([v[1] for v in valid], delimiter=',', dtype=dtype, ndmin=1)
+            valid = data["AnchorCount"] == anchorCount
+            skipped += int(np.count_nonzero(~valid))
+            parsed.append((anchorCount, np.asarray(lineNumbers, dtype=np.int64)[valid], data[valid]))
+
+        if skipped:
+            print(f"Skipped {skipped} malformed rows")
+
+        n = sum(len(p[1]) for p in parsed)
+        k = max((p[0] for p in parsed), default=0)
+        lineNumbers = np.empty(n, dtype=np.int64)
+        timeStamp = np.empty(n)
+        tagPosition = np.empty((n, 3))
+        qf = np.empty(n, dtype=np.int16)
+        anchorCount = np.empty(n, dtype=np.uint8)
+        anchorIDs = np.full((n, k), "", dtype="U16")
+        anchorPosition = np.full((n, k, 3), np.nan)
+        metersFromTag = np.full((n, k), np.nan)
+
+        start = 0
+        for count, numbers, data in parsed:
+            end = start + len(data)
+            lineNumbers[start:end] = numbers
+            timeStamp[start:end] = data["TimeStamp"]
+            anchorCount[start:end] = count
+            for i in range(count):
+                anchorIDs[start:end, i] = data[f"AnchorID{i}"]
+                anchorPosition[start:end, i, 0] = data[f"X{i}"]
+                anchorPosition[start:end, i, 1] = data[f"Y{i}"]
+                anchorPosition[start:end, i, 2] = data[f"Z{i}"]
+                metersFromTag[start:end, i] = data[f"MetersFromTag{i}"]
+            tagPosition[start:end, 0] = data["X"]
+            tagPosition[start:end, 1] = data["Y"]
+            tagPosition[start:end, 2] = data["Z"]
+            qf[start:end] = data["QF"]
+            start = end
+
+        # Restore the original row order and build the anchor ID table
+        order = np.argsort(lineNumbers, kind="stable")
+        anchorIDs = anchorIDs[order]
+        used = anchorIDs != ""
+        idTable, inverse = np.unique(anchorIDs[used], return_inverse=True)
+        anchorIndex = np.full((n, k), -1, dtype=np.int16)
+        anchorIndex[used] = inverse
+
+        return TagLogColumns(timeStamp[order], tagPosition[order], qf[order], anchorCount[order], idTable, anchorIndex, anchorPosition[order], metersFromTag[order])
+
+    def tagDataList_toColumns(self, tagDataList):
+        # Columnar form of a list of TagData (e.g. a batch of live samples)
+        n = len(tagDataList)
+        k = max((len(td.AnchorPositions) for td in tagDataList), default=0)
+        timeStamp = np.array([float(td.TimeStamp) for td in tagDataList])
+        tagPosition = np.array([(td.TagPosition.X, td.TagPosition.Y, td.TagPosition.Z) for td in tagDataList], dtype=np.float64).reshape(n, 3)
+        qf = np.array([td.TagPosition.QF for td in tagDataList], dtype=np.int16)
+        anchorCount = np.array([len(td.AnchorPositions) for td in tagDataList], dtype=np.uint8)
+        anchorIDs = np.full((n, k), "", dtype="U16")
+        anchorPosition = np.full((n, k, 3), np.nan)
+        metersFromTag = np.full((n, k), np.nan)
+        for i, td in enumerate(tagDataList):
+            for slot, ap in enumerate(td.AnchorPositions):
+                anchorIDs[i, slot] = ap.AnchorID
+                anchorPosition[i, slot] = (ap.X, ap.Y, ap.Z)
+                metersFromTag[i, slot] = ap.MetersFromTag
+
+        used = anchorIDs != ""
+        idTable, inverse = np.unique(anchorIDs[used], return_inverse=True)
+        anchorIndex = np.full((n, k), -1, dtype=np.int16)
+        anchorIndex[used] = inverse
+        return TagLogColumns(timeStamp, tagPosition, qf, anchorCount, idTable, anchorIndex, anchorPosition, metersFromTag)
+
+    def columns_toTagData(self, columns: TagLogColumns, index):
+        # Build the TagData of a single row of a columnar log
+        t = TagData()
+        t.TimeStamp = str(float(columns.TimeStamp[index]))
+        t.AnchorPositions = []
+        for slot in range(columns.AnchorCount[index]):
+            x, y, z = columns.AnchorPosition[index, slot].tolist()
+            t.AnchorPositions.append(AnchorPosition(str(columns.AnchorIDs[columns.AnchorIndex[index, slot]]), x, y, z, float(columns.MetersFromTag[index, slot])))
+        x, y, z = columns.TagPosition[index].tolist()
+        t.TagPosition = TagPosition(x, y, z, int(columns.QF[index]))
+        return t
+
+    def columns_toCsvLines(self, columns: TagLogColumns):
+        # CSV log lines (same format as tagData_ToCSV) of every row of a columnar log
+        anchorIDs = columns.AnchorIDs.tolist()
+        rows = zip(columns.TimeStamp.tolist(), columns.AnchorCount.tolist(), columns.AnchorIndex.tolist(), columns.AnchorPosition.tolist(),
+                   columns.MetersFromTag.tolist(), columns.TagPosition.tolist(), columns.QF.tolist())
+        for timeStamp, anchorCount, anchorIndex, anchorPosition, metersFromTag, tagPosition, qf in rows:
+            anchorPositions = ""
+            for slot in range(anchorCount):
+                x, y, z = anchorPosition[slot]
+                anchorPositions += f"{anchorIDs[anchorIndex[slot]]},{x},{y},{z},{metersFromTag[slot]},"
+            yield f"{timeStamp},{anchorCount},{anchorPositions}{tagPosition[0]},{tagPosition[1]},{tagPosition[2]},{qf}"
+
+def columns_dtype(anchorCount):
+    # Structured dtype of a CSV row with the given number of anchors
+    dtype = [("TimeStamp", "f8"), ("AnchorCount", "i4")]
+    for i in range(anchorCount):
+        dtype += [(f"AnchorID{i}", "U16"), (f"X{i}", "f8"), (f"Y{i}", "f8"), (f"Z{i}", "f8"), (f"MetersFromTag{i}", "f8")]
+    dtype += [("X", "f8"), ("Y", "f8"), ("Z", "f8"), ("QF", "i4")]
+    return np.dtype(dtype)
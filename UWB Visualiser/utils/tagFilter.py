@@ -0,0 +1,212 @@
+import time
+import numpy as np
+from tagData import TagData, TagPosition, TagLogColumns
+
+class TagFilter():
+    # Constant velocity Kalman filter for every tag at once. The states are held in NumPy arrays with one
+    #   slot per tag and each batch of samples is applied in rounds, one sample per tag per round.
+    #   The X, Y and Z axes share the same motion model and measurement noise, so their covariances are
+    #   identical and a single 2x2 (position, velocity) covariance is kept per tag.
+    #   Measurements are weighted by QF: the expected error grows as the QF drops, so a low QF sample only
+    #   nudges the estimate instead of jumping the marker.
+    MEASUREMENT_NOISE = 0.05    # Standard deviation of a QF 100 position (m)
+    MIN_QF = 5                  # QF below this is treated as this (1 m standard deviation)
+    ACCELERATION_NOISE = 0.5    # Process noise spectral density (m^2/s^3)
+    INITIAL_VELOCITY = 1.0      # Standard deviation of the velocity of a new track (m/s)
+    RESET_GAP = 2.0             # Restart a track after this long without samples, or when time goes backwards (s)
+    MAX_EXTRAPOLATION = 0.3     # Furthest the display position is carried forward past the last sample (s)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.slots = {}
+        self.position = np.zeros((0, 3))
+        self.velocity = np.zeros((0, 3))
+        self.covariance = np.zeros((0, 2, 2))
+        self.lastTime = np.zeros(0)         # Sample time of the last update (s)
+        self.lastWallTime = np.zeros(0)     # time.perf_counter() of the last update
+        self.timeScale = np.ones(0)         # Sample seconds per wall second (the replay speed)
+
+    def slot(self, key):
+        # Slot of the tag, adding a new one if it hasn't been seen before
+        if key not in self.slots:
+            self.slots[key] = len(self.slots)
+            self.position = np.vstack([self.position, np.zeros(3)])
+            self.velocity = np.vstack([self.velocity, np.zeros(3)])
+            self.covariance = np.concatenate([self.covariance, np.zeros((1, 2, 2))])
+            self.lastTime = np.append(self.lastTime, -np.inf)
+            self.lastWallTime = np.append(self.lastWallTime, 0.0)
+            self.timeScale = np.append(self.timeScale, 1.0)
+        return self.slots[key]
+
+    def measurement_variance(self, qf):
+        sigma = self.MEASUREMENT_NOISE * 100 / np.clip(qf, self.MIN_QF, 100)
+        return sigma ** 2
+
+    def step(self, slots, timestamps, measurements, qf):
+        # Predict the given slots forward to the sample times and correct them with the measurements
+        variance = self.measurement_variance(qf)
+        dt = timestamps - self.lastTime[slots]
+        restart = ~(dt >= 0) | (dt > self.RESET_GAP)
+        dt = np.where(restart, 0.0, dt)
+
+        # Predict: x = F x, P = F P F^T + Q with F = [[1, dt], [0, 1]]
+        position = self.position[slots] + (self.velocity[slots] * dt[:, None])
+        velocity = self.velocity[slots]
+        P = self.covariance[slots]
+        q = self.ACCELERATION_NOISE
+        p00 = P[:, 0, 0] + (2 * dt * P[:, 0, 1]) + (dt * dt * P[:, 1, 1]) + (q * dt ** 3 / 3)
+        p01 = P[:, 0, 1] + (dt * P[:, 1, 1]) + (q * dt ** 2 / 2)
+        p11 = P[:, 1, 1] + (q * dt)
+
+        # New or restarted tracks start at the measurement, stationary
+        position[restart] = measurements[restart]
+        velocity[restart] = 0.0
+        p00 = np.where(restart, variance, p00)
+        p01 = np.where(restart, 0.0, p01)
+        p11 = np.where(restart, self.INITIAL_VELOCITY ** 2, p11)
+
+        # Correct with the position measurement
+        innovation = measurements - position
+        gainPosition = p00 / (p00 + variance)
+        gainVelocity = p01 / (p00 + variance)
+        self.position[slots] = position + (gainPosition[:, None] * innovation)
+        self.velocity[slots] = velocity + (gainVelocity[:, None] * innovation)
+        self.covariance[slots, 0, 0] = (1 - gainPosition) * p00
+        self.covariance[slots, 0, 1] = (1 - gainPosition) * p01
+        self.covariance[slots, 1, 0] = (1 - gainPosition) * p01
+        self.covariance[slots, 1, 1] = p11 - (gainVelocity * p01)
+        self.lastTime[slots] = timestamps
+
+    def update_samples(self, samples):
+        # Apply a batch of (key, TagData) samples, oldest first, e.g. the SampleQueue of a frame
+        tracks = {}
+        for key, td in samples:
+            tracks.setdefault(self.slot(key), []).append(td)
+        if not tracks:
+            return
+
+        # Round r applies the r-th sample of every tag that has one
+        previousTime = self.lastTime.copy()
+        for r in range(max(len(t) for t in tracks.values())):
+            batch = [(slot, t[r]) for slot, t in tracks.items() if r < len(t)]
+            slots = np.array([b[0] for b in batch])
+            timestamps = np.array([float(b[1].TimeStamp) for b in batch])
+            measurements = np.array([(b[1].TagPosition.X, b[1].TagPosition.Y, b[1].TagPosition.Z) for b in batch])
+            qf = np.array([b[1].TagPosition.QF for b in batch], dtype=np.float64)
+            self.step(slots, timestamps, measurements, qf)
+
+        # Estimate the replay speed, so the extrapolation between samples follows the sample clock
+        now = time.perf_counter()
+        slots = np.array(list(tracks.keys()))
+        wallElapsed = now - self.lastWallTime[slots]
+        sampleElapsed = self.lastTime[slots] - previousTime[slots]
+        measured = (wallElapsed > 0.005) & (wallElapsed < self.RESET_GAP) & (sampleElapsed > 0)
+        scale = np.clip(sampleElapsed / np.maximum(wallElapsed, 1e-9), 0.0, 100.0)
+        self.timeScale[slots] = np.where(measured, (0.8 * self.timeScale[slots]) + (0.2 * scale), self.timeScale[slots])
+        self.lastWallTime[slots] = now
+
+    def positions(self, now=None, extrapolate=True):
+        # Filtered position of every tag, carried forward from the last sample to now (time.perf_counter())
+        position = self.position
+        if extrapolate and len(position):
+            now = time.perf_counter() if now is None else now
+            elapsed = np.clip(now - self.lastWallTime, 0.0, self.MAX_EXTRAPOLATION) * self.timeScale
+            position = position + (self.velocity * elapsed[:, None])
+        return {key: position[slot] for key, slot in self.slots.items()}
+
+    def extrapolating(self, now=None):
+        # True while a moving tag's display position is still being carried forward
+        now = time.perf_counter() if now is None else now
+        moving = np.linalg.norm(self.velocity, axis=1) > 0.01
+        return bool(np.any(moving & ((now - self.lastWallTime) < self.MAX_EXTRAPOLATION)))
+
+    def filtered_tagData(self, td: TagData, position):
+        # Copy of the sample with the filtered position
+        t = TagData()
+        t.TimeStamp = td.TimeStamp
+        t.AnchorPositions = td.AnchorPositions
+        x, y, z = np.round(position, 2).tolist()
+        t.TagPosition = TagPosition(x, y, z, td.TagPosition.QF)
+        return t
+
+    def gains(self, timestamps, qf, last=-np.inf, covariance=(0.0, 0.0, 0.0)):
+        # Kalman gains of every row of a log. The covariance doesn't depend on the measured positions,
+        #   only on the sample times and QF, so it is run on its own as a scalar recursion.
+        #   last and covariance are the time and (p00, p01, p11) of the update before the first row.
+        variance = self.measurement_variance(np.asarray(qf, dtype=np.float64)).tolist()
+        q = self.ACCELERATION_NOISE
+        n = len(variance)
+        dts = [0.0] * n
+        restarts = [False] * n
+        gainPosition = [0.0] * n
+        gainVelocity = [0.0] * n
+        p00, p01, p11 = covariance
+        for i, t in enumerate(timestamps.tolist()):
+            dt = t - last
+            last = t
+            r = variance[i]
+            if not (0 <= dt <= self.RESET_GAP):
+                restarts[i] = True
+                p00, p01, p11 = r, 0.0, self.INITIAL_VELOCITY ** 2
+            else:
+                dts[i] = dt
+                p00, p01, p11 = p00 + (2 * dt * p01) + (dt * dt * p11) + (q * dt ** 3 / 3), p01 + (dt * p11) + (q * dt ** 2 / 2), p11 + (q * dt)
+            k0 = p00 / (p00 + r)
+            k1 = p01 / (p00 + r)
+            gainPosition[i], gainVelocity[i] = k0, k1
+            p00, p01, p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - (k1 * p01)
+        return np.array(dts), np.array(restarts, dtype=bool), np.array(gainPosition), np.array(gainVelocity), (p00, p01, p11)
+
+    def filter_columns(self, columnsList, resume=False):
+        # Offline pass over logs (one per tag), returning the filtered (n, 3) positions of each log.
+        #   With the gains known, each state is an affine function of the previous one,
+        #   x[i] = A[i] x[i-1] + b[i], which is solved for all rows at once by a prefix scan
+        #   (log2(n) batched 2x2 matrix products) instead of stepping the rows one at a time.
+        #   With resume the tracks carry on from the previous call, so a log can be filtered in chunks.
+        if not resume:
+            self.reset()
+        filtered = []
+        for i, columns in enumerate(columnsList):
+            slot = self.slot(i)
+            n = len(columns)
+            if n == 0:
+                filtered.append(np.empty((0, 3)))
+                continue
+            P = self.covariance[slot]
+            dt, restart, k0, k1, covariance = self.gains(columns.TimeStamp, columns.QF, self.lastTime[slot], (P[0, 0], P[0, 1], P[1, 1]))
+
+            # x = (I - K H) F x + K z, a restart sets the state to (z, 0)
+            A = np.empty((n, 2, 2))
+            A[:, 0, 0] = 1 - k0
+            A[:, 0, 1] = (1 - k0) * dt
+            A[:, 1, 0] = -k1
+            A[:, 1, 1] = 1 - (k1 * dt)
+            A[restart] = 0.0
+            z = columns.TagPosition.astype(np.float64)
+            b = np.empty((n, 2, 3))
+            b[:, 0] = np.where(restart[:, None], z, k0[:, None] * z)
+            b[:, 1] = np.where(restart[:, None], 0.0, k1[:, None] * z)
+
+            # Inclusive prefix scan, with the state before the first row folded into b[0] (zero on a restart)
+            #   b ends up holding the states
+            b[0] += A[0] @ np.stack([self.position[slot], self.velocity[slot]])
+            shift = 1
+            while shift < n:
+                b[shift:] = (A[shift:] @ b[:-shift]) + b[shift:]
+                A[shift:] = A[shift:] @ A[:-shift]
+                shift *= 2
+
+            self.position[slot] = b[-1, 0]
+            self.velocity[slot] = b[-1, 1]
+            self.covariance[slot] = [[covariance[0], covariance[1]], [covariance[1], covariance[2]]]
+            self.lastTime[slot] = columns.TimeStamp[-1]
+            filtered.append(b[:, 0])
+        return filtered
+
+    def filter_log(self, columns: TagLogColumns, resume=False):
+        # Copy of the columns with the filtered tag positions, resume carries on from the previous chunk of the log
+        position = self.filter_columns([columns], resume)[0]
+        return TagLogColumns(columns.TimeStamp, np.round(position, 2), columns.QF, columns.AnchorCount, columns.AnchorIDs,
+                             columns.AnchorIndex, columns.AnchorPosition, columns.MetersFromTag)
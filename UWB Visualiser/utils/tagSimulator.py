@@ -0,0 +1,118 @@
+import numpy as np
+from tagData import TagLogColumns
+
+# Anchor layout of the sample logs, so simulated tags line up with the default floorplan
+DEFAULT_ANCHORS = {"4B05": (2.07, 6.9, 2.01), "1584": (2.78, 9.35, 2.38), "DBA4": (0.52, 5.3, 2.12), "D196": (4.89, 9.6, 2.38)}
+TRAJECTORIES = ("circle", "figure8", "line", "random")
+
+class TagSimulator():
+    # Synthetic DWM1001 samples for any number of tags moving over an anchor layout. The trajectories are
+    #   functions of time, so any batch of timestamps is generated for every tag at once.
+    #   - Ranges are the true distances plus Gaussian noise, and each range drops out independently.
+    #   - Like the DWM1001, the position uses the (up to) four nearest anchors with a range, and a sample is
+    #     only reported with at least three.
+    #   - The reported position error grows with the range noise and the missing anchors, and QF falls with it.
+    SPEED = 0.8             # Average tag speed (m/s)
+    HEIGHT = 1.0            # Tag height (m)
+    RANGE_NOISE = 0.05      # Standard deviation of the range error (m)
+    DROPOUT = 0.02          # Probability that a range is missing
+    SAMPLE_DROPOUT = 0.01   # Probability that a whole sample is missing
+    MAX_ANCHORS = 4
+    MIN_ANCHORS = 3
+
+    def __init__(self, tags=4, anchors=None, trajectory="circle", speed=SPEED, rangeNoise=RANGE_NOISE, dropout=DROPOUT,
+                 sampleDropout=SAMPLE_DROPOUT, seed=None):
+        if trajectory not in TRAJECTORIES:
+            raise ValueError(f"Unknown trajectory: {trajectory}")
+        anchors = anchors or DEFAULT_ANCHORS
+        if len(anchors) < self.MIN_ANCHORS:
+            raise ValueError(f"At least {self.MIN_ANCHORS} anchors are needed")
+        self.tags = tags
+        self.trajectory = trajectory
+        self.rangeNoise = rangeNoise
+        self.dropout = dropout
+        self.sampleDropout = sampleDropout
+        self.anchorIDs = np.array(list(anchors.keys()))
+        self.anchorPositions = np.array(list(anchors.values()), dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+
+        # Each tag moves around its own centre within the area covered by the anchors
+        low = self.anchorPositions[:, :2].min(axis=0)
+        high = self.anchorPositions[:, :2].max(axis=0)
+        extent = np.maximum(high - low, 1.0)
+        self.low = low
+        self.high = low + extent
+        self.radius = extent.min() * self.rng.uniform(0.15, 0.4, tags)
+        self.centre = low + (extent / 2) + ((extent / 2 - self.radius[:, None]) * self.rng.uniform(-1, 1, (tags, 2)))
+        self.angularSpeed = speed * self.rng.uniform(0.7, 1.3, tags) / self.radius
+        self.phase = self.rng.uniform(0, 2 * np.pi, (tags, 2))
+        self.direction = self.rng.uniform(0, 2 * np.pi, tags)
+        self.frequencies = self.rng.uniform(0.3, 1.0, (tags, 2, 2)) # Two incommensurate frequencies per axis
+
+    def positions(self, timestamps):
+        # True (n, tags, 3) positions of every tag at the timestamps
+        t = np.asarray(timestamps, dtype=np.float64)[:, None]
+        a = (self.angularSpeed * t) + self.phase[:, 0]
+        if self.trajectory == "circle":
+            offset = np.stack([np.cos(a), np.sin(a)], axis=2)
+        elif self.trajectory == "figure8":
+            offset = np.stack([np.sin(a), np.sin(2 * a) / 2], axis=2)
+        elif self.trajectory == "line":
+            # Back and forth along a line through the centre at constant speed
+            along = (2 / np.pi) * np.arcsin(np.sin(a))
+            offset = along[:, :, None] * np.stack([np.cos(self.direction), np.sin(self.direction)], axis=1)
+        else:
+            # Smooth wandering from the sum of two sine waves on each axis
+            f = self.frequencies * self.angularSpeed[:, None, None]
+            offset = (0.6 * np.sin((f[:, :, 0] * t[:, :, None]) + self.phase)) + (0.4 * np.sin((f[:, :, 1] * t[:, :, None]) + self.phase[:, ::-1]))
+        xy = np.clip(self.centre + (self.radius[:, None] * offset), self.low, self.high)
+        return np.concatenate([xy, np.full(xy.shape[:2] + (1,), self.HEIGHT)], axis=2)
+
+    def sample(self, timestamps):
+        # Simulated samples at the timestamps, as a list of TagLogColumns (one per tag)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        n, m = len(timestamps), len(self.anchorPositions)
+        k = min(self.MAX_ANCHORS, m)
+        true = self.positions(timestamps)
+        distance = np.linalg.norm(true[:, :, None, :] - self.anchorPositions, axis=3)
+        ranges = np.maximum(distance + self.rng.normal(0, self.rangeNoise, distance.shape), 0.0)
+
+        # The nearest anchors that have a range, missing ranges sort last
+        available = self.rng.random(distance.shape) >= self.dropout
+        nearest = np.argsort(np.where(available, distance, np.inf), axis=2)[:, :, :k]
+        anchorCount = np.minimum(available.sum(axis=2), k)
+        used = np.arange(k) < anchorCount[:, :, None]
+        reported = (anchorCount >= self.MIN_ANCHORS) & (self.rng.random((n, self.tags)) >= self.sampleDropout)
+
+        # Position error of the device solution, larger with fewer anchors
+        missing = k - anchorCount
+        sigma = self.rangeNoise * (1 + missing) / np.sqrt(np.maximum(anchorCount, 1))
+        error = self.rng.normal(0, 1, true.shape) * sigma[:, :, None]
+        error[:, :, 2] *= 2 # Z is poorly determined by anchors mounted at similar heights
+        qf = np.clip(np.round(100 - (200 * np.linalg.norm(error[:, :, :2], axis=2)) - (10 * missing)), 0, 100)
+
+        columnsList = []
+        for tag in range(self.tags):
+            rows = np.flatnonzero(reported[:, tag])
+            anchorIndex = np.where(used[rows, tag], nearest[rows, tag], -1).astype(np.int16)
+            slots = np.maximum(anchorIndex, 0)
+            anchorPosition = np.where(used[rows, tag][:, :, None], self.anchorPositions[slots], np.nan)
+            metersFromTag = np.where(used[rows, tag], np.round(np.take_along_axis(ranges[rows, tag], slots, axis=1), 2), np.nan)
+            columnsList.append(TagLogColumns(np.round(timestamps[rows], 3), np.round(true[rows, tag] + error[rows, tag], 2),
+                                             qf[rows, tag].astype(np.int16), anchorCount[rows, tag].astype(np.uint8), self.anchorIDs,
+                                             anchorIndex, anchorPosition, metersFromTag))
+        return columnsList
+
+def dist_lines(columns: TagLogColumns):
+    # DWM1001 location lines ("lec" output) of every row of a columnar log
+    anchorIDs = columns.AnchorIDs.tolist()
+    rows = zip(columns.AnchorCount.tolist(), columns.AnchorIndex.tolist(), columns.AnchorPosition.tolist(),
+               columns.MetersFromTag.tolist(), columns.TagPosition.tolist(), columns.QF.tolist())
+    lines = []
+    for anchorCount, anchorIndex, anchorPosition, metersFromTag, tagPosition, qf in rows:
+        anchors = ""
+        for slot in range(anchorCount):
+            x, y, z = anchorPosition[slot]
+            anchors += f"AN{slot},{anchorIDs[anchorIndex[slot]]},{x:.2f},{y:.2f},{z:.2f},{metersFromTag[slot]:.2f},"
+        lines.append(f"DIST,{anchorCount},{anchors}POS,{tagPosition[0]:.2f},{tagPosition[1]:.2f},{tagPosition[2]:.2f},{qf}\r\n".encode("ascii"))
+    return lines